@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Admission control for /api/match (per process).
+
+Each engine call is CPU-bound and holds the GIL, so beyond a couple of
+concurrent matches a worker only time-slices them and every request gets slower.
+Without a limit, a spike therefore queued requests until gunicorn's 120 s timeout
+killed them. Here at most MATCH_CONCURRENCY matches run at once. Others wait in a
+bounded queue for at most MATCH_QUEUE_TIMEOUT seconds. A request is turned away
+at once with 503 and Retry-After when the queue is full, or when its wait runs out.
+
+Lanes by subscription tier: a free slot goes to the oldest b2b waiter, then
+premium, then free. The last MATCH_QUEUE_RESERVED queue places are for paid lanes,
+so a free-tier flood cannot lock paid users out. The app has no login yet, so a
+request's lane comes from its X-Api-Key: a key issued to a user's email and signed
+with LANE_KEY_SECRET (issue_key, `python admission.py key <email>`), then that
+user's users.subscription_tier. A typed-in email proves nothing and gets the free
+lane; without LANE_KEY_SECRET every request is free.
+
+The queue lives in request threads, so a worker needs more than MATCH_CONCURRENCY +
+MATCH_QUEUE threads (gunicorn.conf.py sizes its default from these).
+Counters are served at GET /api/admission.
+"""
+
+import base64
+import hashlib
+import hmac
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Deque, Dict, Iterator, Optional, Tuple
+
+# Dispatch order: a free slot goes to the first non-empty lane
+LANES = ('b2b', 'premium', 'free')
+CONCURRENCY = int(os.environ.get("MATCH_CONCURRENCY", 2))
+QUEUE_SIZE = int(os.environ.get("MATCH_QUEUE", 6))
+QUEUE_RESERVED = int(os.environ.get("MATCH_QUEUE_RESERVED", 2))
+QUEUE_TIMEOUT = float(os.environ.get("MATCH_QUEUE_TIMEOUT", 5))
+TIER_TTL = 60.0
+MAX_RETRY_AFTER = 30
+LANE_KEY_SECRET = os.environ.get("LANE_KEY_SECRET", "")
+
+
+class Overloaded(Exception):
+    """No slot for this request: answer 503 with Retry-After."""
+
+    def __init__(self, lane: str, reason: str, retry_after: int):
+        super().__init__(f"{lane} lane {reason}")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, concurrency: int = CONCURRENCY, queue_size: int = QUEUE_SIZE,
+                 reserved: int = QUEUE_RESERVED, timeout: float = QUEUE_TIMEOUT):
+        self.concurrency = max(1, concurrency)
+        self.queue_size = max(0, queue_size)
+        self.reserved = min(max(0, reserved), self.queue_size)
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._running = 0
+        self._queues: Dict[str, Deque[object]] = {lane: deque() for lane in LANES}
+        self._counts: Dict[str, Counter] = {lane: Counter() for lane in LANES}
+        self._service = 0.25   # EWMA of seconds a match holds its slot; sizes Retry-After
+        self._wait = 0.0       # EWMA of seconds admitted requests waited
+
+    def _waiting(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _ahead(self, lane: str) -> bool:
+        """Someone in this lane or a higher one is already waiting."""
+        for name in LANES:
+            if self._queues[name]:
+                return True
+            if name == lane:
+                return False
+        return False
+
+    def _head(self) -> Optional[object]:
+        for name in LANES:
+            if self._queues[name]:
+                return self._queues[name][0]
+        return None
+
+    def _retry_after(self) -> int:
+        drain = (self._waiting() + 1) * self._service / self.concurrency
+        return max(1, min(MAX_RETRY_AFTER, math.ceil(drain)))
+
+    def acquire(self, lane: str) -> float:
+        """Wait for a slot; returns the admission time. Raises Overloaded."""
+        lane = lane if lane in self._queues else 'free'
+        counts = self._counts[lane]
+        arrived = time.monotonic()
+        with self._cond:
+            if self._running < self.concurrency and not self._ahead(lane):
+                self._running += 1
+                counts['admitted'] += 1
+                return arrived
+            room = self.queue_size - (self.reserved if lane == 'free' else 0)
+            if self._waiting() >= room:
+                counts['rejected_full'] += 1
+                raise Overloaded(lane, 'queue full', self._retry_after())
+            token = object()
+            queue = self._queues[lane]
+            queue.append(token)
+            counts['queued'] += 1
+            deadline = arrived + self.timeout
+            while True:
+                if self._running < self.concurrency and self._head() is token:
+                    queue.popleft()
+                    self._running += 1
+                    counts['admitted'] += 1
+                    now = time.monotonic()
+                    self._wait += 0.1 * ((now - arrived) - self._wait)
+                    self._cond.notify_all()  # the next head may fit too
+                    return now
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    queue.remove(token)
+                    counts['rejected_timeout'] += 1
+                    self._cond.notify_all()
+                    raise Overloaded(lane, 'wait timed out', self._retry_after())
+                self._cond.wait(remaining)
+
+    def release(self, admitted: float) -> None:
+        with self._cond:
+            self._running -= 1
+            self._service += 0.1 * ((time.monotonic() - admitted) - self._service)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, lane: str) -> Iterator[None]:
+        admitted = self.acquire(lane)
+        try:
+            yield
+        finally:
+            self.release(admitted)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "concurrency": self.concurrency,
+                "running": self._running,
+                "queue_size": self.queue_size,
+                "queue_reserved_for_paid": self.reserved,
+                "queue_timeout_s": self.timeout,
+                "queued_now": {lane: len(q) for lane, q in self._queues.items()},
+                "avg_service_ms": round(self._service * 1000, 1),
+                "avg_wait_ms": round(self._wait * 1000, 1),
+                "lanes": {lane: dict(c) for lane, c in self._counts.items()},
+            }
+
+
+# =============================================================================
+# LANE KEYS AND TIER LOOKUP
+# =============================================================================
+
+def _signature(email: str, secret: str) -> str:
+    return hmac.new(secret.encode(), email.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def issue_key(email: str, secret: Optional[str] = None) -> str:
+    """The X-Api-Key for a user: their email and its HMAC under LANE_KEY_SECRET."""
+    secret = secret if secret is not None else LANE_KEY_SECRET
+    if not secret:
+        raise ValueError("LANE_KEY_SECRET is not set")
+    email = email.strip().lower()
+    encoded = base64.urlsafe_b64encode(email.encode()).decode().rstrip('=')
+    return f"{encoded}.{_signature(email, secret)}"
+
+
+def key_email(key: Optional[str], secret: Optional[str] = None) -> Optional[str]:
+    """The email a valid key was issued to; None for a missing, malformed or forged key."""
+    secret = secret if secret is not None else LANE_KEY_SECRET
+    encoded, sep, signature = (key or '').strip().rpartition('.')
+    if not secret or not sep:
+        return None
+    try:
+        email = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return email if hmac.compare_digest(signature, _signature(email, secret)) else None
+
+
+_tiers: Dict[str, Tuple[str, float]] = {}
+_tiers_lock = threading.Lock()
+
+
+def lane_for(db_path: str, key: Optional[str], secret: Optional[str] = None) -> str:
+    """
+    Lane for a request's X-Api-Key: the tier of the user it was issued to (active paid
+    subscription), else 'free'. Tiers are cached TIER_TTL s.
+    """
+    email = key_email(key, secret)
+    if not email:
+        return 'free'
+    now = time.monotonic()
+    with _tiers_lock:
+        hit = _tiers.get(email)
+        if hit and hit[1] > now:
+            return hit[0]
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute("""
+            SELECT subscription_tier FROM users
+            WHERE lower(email) = ? AND (subscription_expires IS NULL OR subscription_expires > ?)
+        """, (email, datetime.now().isoformat(sep=' ', timespec='seconds'))).fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    finally:
+        conn.close()
+    lane = row[0] if row and row[0] in LANES else 'free'
+    with _tiers_lock:
+        if len(_tiers) > 10_000:
+            _tiers.clear()
+        _tiers[email] = (lane, now + TIER_TTL)
+    return lane
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) == 3 and sys.argv[1] == 'key':
+        try:
+            print(issue_key(sys.argv[2]))
+        except ValueError as e:
+            sys.exit(str(e))
+    else:
+        sys.exit("usage: LANE_KEY_SECRET=... python admission.py key <email>")
@@ -5,10 +5,15 @@ Serves the questionnaire UI and /api/match using the Python matching engine.
 """
 
 import os
+import hmac
 import json
+import time
+from datetime import datetime
+from itertools import chain
 from pathlib import Path
+from typing import List, Optional, Set, Tuple
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, abort
 
 # Set DB path before importing engine (engine uses it at init)
 BASE_DIR = Path(__file__).resolve().parent
@@ -25,6 +30,7 @@ def _ensure_db():
             conn = sqlite3.connect(DB_PATH)
             conn.executescript(schema_path.read_text())
             conn.commit()
+            conn.execute("PRAGMA journal_mode = WAL")  # readers never wait on a catalog swap
             conn.close()
         # Seed from batch JSONs (batches 11–20 + BATCH_*/FIRST_100) when DB is empty
         try:
@@ -35,17 +41,66 @@ def _ensure_db():
         except Exception:
             pass
     else:
-        # DB exists but may be empty (e.g. schema has no INSERTs); seed if empty
+        # DB exists but may be from an older schema.sql, or empty; migrate, then seed if empty
         try:
+            from migrations import ensure_migrated
+            ensure_migrated(DB_PATH)
             from load_batches import load_all_batches
             load_all_batches(DB_PATH)
         except Exception:
             pass
 
-from engine import FundingMatchEngine, UserProfile, Match
+from engine import FundingMatchEngine, UserProfile
+from catalog import get_catalog
+from geo import county_key, region_key
+from cursors import CursorStore, RankedRun, encode_cursor, decode_cursor
+from static_assets import LONG_CACHE, StaticAssets
+from serialize import Projection, iter_match_response, source_to_json
+from deadlines import start_sweeper, list_upcoming
+from catalog_reload import start_watcher
+from preload import memory_report
+from admission import AdmissionController, Overloaded, lane_for
+from singleflight import SingleFlight
+from intake import SessionStore
+from rurality import lookup as zip_lookup
+from reasons import language
+from profiling import get_profile, profile_stats, profiled, sampled, slowest_profiles
+from export_catalog import INDEX_NAME, export_in_background
+from jobs import PRIORITY_LOW, enqueue, job_status, queue_stats, start_worker_thread
+from job_handlers import profile_to_json
+from saved_profiles import profile_matches, save_profile
+from reports import submit_report, report_status, find_report, iter_report_html, request_key
+from reports import MAX_MATCHES as REPORT_MATCHES
 
 app = Flask(__name__, static_folder=BASE_DIR, static_url_path="")
 
+# Precompressed front-end assets (python static_assets.py); unbuilt files fall back to plain static
+_assets = StaticAssets()
+_send_static_file = app.view_functions["static"]
+
+
+def _static(filename):
+    return _assets.response(filename, request) or _send_static_file(filename=filename)
+
+
+app.view_functions["static"] = _static
+
+# Ranked runs for /api/match?cursor= (match_runs table, so any worker serves later pages; 15 min TTL)
+_cursors = CursorStore(DB_PATH, ttl=float(os.environ.get("MATCH_CURSOR_TTL", 900)))
+
+# Questionnaires in progress (POST /api/match/session): candidates narrowed step by step
+# (intake_sessions table, so any worker serves the next step)
+_sessions = SessionStore(DB_PATH)
+
+# Concurrency limit and priority wait queue in front of the engine (per process)
+_admission = AdmissionController()
+
+# Identical profiles submitted while one is being ranked share that ranking (per process)
+_rankings = SingleFlight()
+
+# One engine per catalog snapshot, shared by requests; with a catalog it opens no connection
+_engine = None
+
 # Amount range mapping from form (amount: micro/small/medium/large)
 AMOUNT_MAP = {
     "micro": (0, 5_000),
@@ -57,7 +112,20 @@ AMOUNT_MAP = {
 
 def _get_engine():
     _ensure_db()
-    return FundingMatchEngine(DB_PATH)
+    # Queues one deadline_sweep job per interval across all workers (the job worker runs it)
+    start_sweeper(DB_PATH, float(os.environ.get("DEADLINE_SWEEP_INTERVAL", 3600)))
+    # Snapshot rebuilds happen on the watcher thread; it also queues a reload when batch files change
+    start_watcher(DB_PATH, float(os.environ.get("CATALOG_WATCH_INTERVAL", 5)),
+                  watch_files=os.environ.get("CATALOG_WATCH_FILES", "1") != "0")
+    # Only start.sh sets JOB_WORKER=external: it supervises `python jobs.py worker` on the same disk
+    if os.environ.get("JOB_WORKER") != "external":
+        start_worker_thread(DB_PATH)
+    global _engine
+    catalog = get_catalog(DB_PATH)
+    engine = _engine
+    if engine is None or engine.catalog is not catalog:
+        engine = _engine = FundingMatchEngine(DB_PATH, catalog=catalog)
+    return engine
 
 
 def form_to_profile(data: dict) -> UserProfile:
@@ -66,7 +134,8 @@ def form_to_profile(data: dict) -> UserProfile:
     ids = data.get("id") or data.get("identity") or []
     if not isinstance(ids, list):
         ids = [ids] if ids else []
-    identity_factors = [str(x).capitalize() for x in ids if x]
+    # Sorted and deduplicated so checkbox order does not change the profile (or its hash)
+    identity_factors = sorted({str(x).capitalize() for x in ids if x})
 
     amount_key = (data.get("amount") or "medium").lower()
     funding_min, funding_max = AMOUNT_MAP.get(amount_key, (5_000, 100_000))
@@ -74,9 +143,12 @@ def form_to_profile(data: dict) -> UserProfile:
     state = (data.get("state") or "").strip().upper()[:2]
     city = (data.get("city") or "").strip()
     zip_code = (data.get("zip") or "").strip()
-    # Rural heuristic: many small towns / non-metro state list
+    # Rural from the ZIP's RUCA code (rurality.py); without one, the mostly non-metro states
+    zip_info = zip_lookup(zip_code)
+    rural = zip_info.rural if zip_info is not None else None
     rural_states = {"WV", "VT", "ME", "MT", "WY", "SD", "ND", "AK"}
-    hidden = {"rural_status": state in rural_states or len(zip_code) == 5}
+    hidden = {"rural_status": rural if rural is not None else state in rural_states}
+    location = {"city": city, "state": state, "zip": zip_code or "00000"}
 
     story = (data.get("story") or data.get("vision") or "")[:500]
     vision = (data.get("vision") or data.get("project_vision") or "")[:500]
@@ -95,7 +167,7 @@ def form_to_profile(data: dict) -> UserProfile:
     return UserProfile(
         user_id=1,
         profile_id=1,
-        location={"city": city, "state": state, "zip": zip_code or "00000"},
+        location=location,
         age=35,
         project_type="business",
         project_field=project_field,
@@ -120,59 +192,575 @@ def form_to_profile(data: dict) -> UserProfile:
     )
 
 
-def match_to_json(m: Match) -> dict:
-    """Full report payload so user knows what to apply for, how, and where."""
-    s = m.source
-    return {
-        "source": {
-            "source_id": s.source_id,
-            "source_name": s.source_name,
-            "provider_name": s.provider_name,
-            "source_type": s.source_type,
-            "min_amount": s.min_amount,
-            "max_amount": s.max_amount,
-            "deadline": s.deadline.isoformat() if s.deadline else None,
-            "deadline_type": s.deadline_type,
-            "application_url": getattr(s, "application_url", None),
-            "requirements_text": (s.requirements_text or "").strip(),
-        },
-        "overall_score": round(m.overall_score, 1),
-        "eligibility_score": round(m.eligibility_score, 1),
-        "success_probability": round(m.success_probability, 1),
-        "fit_score": round(m.fit_score, 1),
-        "match_reasons": m.match_reasons,
-        "eligibility_gaps": m.eligibility_gaps or [],
-        "competitive_advantages": m.competitive_advantages or [],
-    }
-
-
 @app.route("/")
 def index():
-    return send_from_directory(BASE_DIR, "FUNDING_FINDER_FUN.html")
+    return (_assets.response("FUNDING_FINDER_FUN.html", request)
+            or send_from_directory(BASE_DIR, "FUNDING_FINDER_FUN.html"))
+
+
+@app.route("/assets/<path:fingerprinted>")
+def fingerprinted_asset(fingerprinted):
+    """Content-addressed copies (current or previous build): cached for a year, never revalidated."""
+    found = _assets.for_fingerprint(fingerprinted)
+    if found is None:
+        abort(404)
+    name, entry = found
+    return _assets.response(name, request, immutable=True, entry=entry)
+
+
+def _form_data() -> dict:
+    """Questionnaire from a JSON body or a form post."""
+    if request.is_json:
+        return request.get_json()
+    data = dict(request.form)
+    # Checkboxes: id or identity can have multiple values
+    data["id"] = request.form.getlist("id") or request.form.getlist("identity") or []
+    return data
+
+
+def _match_response(matches, catalog, projection: Projection, **meta) -> Response:
+    """Streamed JSON body: pre-rendered source fragments + per-match scores."""
+    body = iter_match_response(matches, catalog, projection, **meta)
+    # Head and first match rendered here: an error in them is a 500, not a truncated 200
+    first = [next(body), next(body)]
+    return Response(chain(first, body), mimetype="application/json")
+
+
+def _match_page(engine, run: RankedRun, token: str, offset: int, limit: int,
+                projection: Projection, **meta) -> Response:
+    """One page of a stored run; only the sources on the page are re-scored."""
+    page_ids = run.source_ids[offset:offset + limit]
+    matches = engine.rescore(run.profile, page_ids, run.now)
+    end = offset + len(page_ids)
+    return _match_response(
+        matches, engine.catalog, projection,
+        count=len(matches),
+        total=run.total,
+        next_cursor=encode_cursor(token, end) if end < run.total else None,
+        **meta,
+    )
+
+
+def _rank_run(engine, profile: UserProfile, limit: int, lane: str = "free",
+              among: Optional[Set[int]] = None) -> Tuple[RankedRun, str, dict]:
+    """
+    Rank the catalog for profile and store the full ranked order for ?cursor= paging.
+    A run that fits on one page of limit is decided by the bound-pruned top_ids;
+    otherwise every viable source is ranked once here, so later pages are a slice
+    of the stored order. Also returns the scoring stats (scored / pruned sources).
+    among: an intake session's narrowed candidates (intake.py).
+    """
+    now = datetime.now()
+    stats: dict = {}
+    ranked = engine.top_ids(profile, limit, now, stats, among)
+    if stats["total"] > len(ranked):
+        ranked = engine.rank_ids(profile, now)
+        stats.update(scored=stats["candidates"], pruned=0)
+    run = RankedRun(
+        catalog_version=engine.catalog.version,
+        profile=profile,
+        now=now,
+        source_ids=[sid for sid, _ in ranked],
+        created=time.time(),
+        lane=lane,
+        total=stats["total"],
+    )
+    return run, _cursors.put(run), {"scored": stats["scored"], "pruned": stats["pruned"]}
+
+
+def _rank_first_page(engine, profile: UserProfile, limit: int, projection: Projection,
+                     lane: str = "free") -> Response:
+    """Rank the catalog for profile, store the run for ?cursor= paging, return page one."""
+    run, token, scoring = _rank_run(engine, profile, limit, lane)
+    return _match_page(engine, run, token, 0, limit, projection, **scoring)
+
+
+def _coalesced_first_page(engine, profile: UserProfile, limit: int, projection: Projection,
+                          lane: str, among: Optional[Set[int]] = None) -> Response:
+    """
+    Page one for profile, ranked once per burst: requests with the same normalized
+    profile and catalog version that arrive while a ranking runs wait for it and
+    share its run and cursor token. Only the ranking request takes an admission
+    slot; the others re-score their page (at most 200 sources) from the stored order.
+    """
+    def rank():
+        with _admission.slot(lane):
+            return _rank_run(engine, profile, limit, lane, among)
+
+    (run, token, scoring), shared = _rankings.do(request_key(profile, engine.catalog.version), rank)
+    response = _match_page(engine, run, token, 0, limit, projection, **scoring)
+    if shared:
+        response.headers["X-Coalesced"] = "1"
+    return response
+
+
+def _profile_trigger():
+    """'admin' or 'sampled' when this match should run under the profiler (profiling.py), else None."""
+    if request.headers.get("X-Profile") == "1" and _is_admin():
+        return "admin"
+    if sampled():
+        return "sampled"
+    return None
+
+
+def _profile_label(profile: UserProfile) -> str:
+    lo, hi = profile.funding_needed
+    ids = ",".join(profile.identity_factors) or "-"
+    return (f"/api/match state={profile.location.get('state') or '-'} amount={lo:g}-{hi:g} "
+            f"ids={ids} stage={(profile.project_stage or '-')[:40]}")
 
 
-@app.route("/api/match", methods=["POST"])
+@app.route("/api/match", methods=["GET", "POST"])
 def api_match():
+    """
+    POST a questionnaire to rank the catalog; the response carries the first page and
+    next_cursor. GET/POST /api/match?cursor=... serves later pages of the same run.
+    ?fields= projects the response, ?compact=1 leaves out requirements_text, ?lang= (or
+    Accept-Language) picks the language of the explanations.
+    Engine work runs under admission control (admission.py): 503 + Retry-After when saturated.
+    Identical concurrent submissions are ranked once (X-Coalesced: 1 on the others).
+    """
     try:
-        if request.is_json:
-            data = request.get_json()
-        else:
-            data = dict(request.form)
-            # Checkboxes: id or identity can have multiple values
-            data["id"] = request.form.getlist("id") or request.form.getlist("identity") or []
+        limit = max(1, min(200, int(request.args.get("limit", 50))))
+        projection = Projection.parse(request.args.get("fields"), request.args.get("compact") == "1",
+                                      language(request.args.get("lang") or request.headers.get("Accept-Language")))
+        cursor = request.args.get("cursor")
+        if cursor:
+            token, offset = decode_cursor(cursor)
+            run = _cursors.get(token)
+            engine = _get_engine()
+            if run is None or run.catalog_version != engine.catalog.version:
+                return jsonify({"ok": False, "error": "cursor expired; submit the form again"}), 410
+            with _admission.slot(run.lane):
+                return _match_page(engine, run, token, offset, limit, projection)
 
+        if request.method != "POST":
+            return jsonify({"ok": False, "error": "POST a profile or pass ?cursor="}), 400
+        data = _form_data()
         profile = form_to_profile(data)
         engine = _get_engine()
-        matches = engine.match(profile, max_results=50)
+        lane = lane_for(DB_PATH, request.headers.get("X-Api-Key"))
+        trigger = _profile_trigger()
+        if trigger is None:
+            return _coalesced_first_page(engine, profile, limit, projection, lane)
+        # A profiled request always does its own ranking
+        with _admission.slot(lane):
+            response, profile_id = profiled(
+                DB_PATH, _profile_label(profile), trigger,
+                lambda: _rank_first_page(engine, profile, limit, projection, lane),
+            )
+        response.headers["X-Profile-Id"] = str(profile_id)
+        return response
+    except Overloaded as e:
+        response = jsonify({"ok": False, "error": "server busy; retry shortly", "lane": e.lane,
+                            "reason": e.reason, "retry_after": e.retry_after})
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, 503
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+def _step_answers() -> dict:
+    """This step's answers; a form post without identity checkboxes has not answered id yet."""
+    data = _form_data()
+    if "identity" in data and "id" not in data:
+        data["id"] = data.pop("identity")
+    if not request.is_json and not data.get("id"):
+        data.pop("id", None)
+    return data
+
+
+@app.route("/api/match/session", methods=["POST"])
+@app.route("/api/match/session/<token>", methods=["POST"])
+def api_match_session(token=None):
+    """
+    Progressive matching (intake.py): POST each questionnaire step's answers as they
+    are given; the first call (no token) opens a session. Returns the candidates still
+    in play. Once state, amount and identities are known, the profile's scores are
+    prepared while the user finishes the form.
+    """
+    try:
+        engine = _get_engine()
+        token = token or _sessions.create()
+        session = _sessions.get(token)
+        if session is None:
+            return jsonify({"ok": False, "error": "session expired; submit to /api/match"}), 404
+        answers = _step_answers()
+        with session.lock:
+            profile = form_to_profile({**session.answers, **answers})
+            session.update(engine, profile, answers)
+            _sessions.save(token, session)
+            prewarmed = False
+            if session.narrowed:
+                try:
+                    with _admission.slot(lane_for(DB_PATH, request.headers.get("X-Api-Key"))):
+                        prewarmed = session.prewarm(engine, profile, datetime.now())
+                except Overloaded:
+                    pass  # only a head start; the submit builds what is missing
+            return jsonify({"ok": True, "session": token, "candidates": session.candidates(engine),
+                            "narrowed_by": list(session.applied), "prewarmed": prewarmed})
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.route("/api/match/session/<token>/submit", methods=["POST"])
+def api_match_session_submit(token):
+    """
+    Last step: merge the final answers and rank only the session's surviving
+    candidates. Same response (and ?limit= / ?fields= / ?lang=) as /api/match.
+    """
+    try:
+        limit = max(1, min(200, int(request.args.get("limit", 50))))
+        projection = Projection.parse(request.args.get("fields"), request.args.get("compact") == "1",
+                                      language(request.args.get("lang") or request.headers.get("Accept-Language")))
+        engine = _get_engine()
+        session = _sessions.pop(token)
+        if session is None:
+            return jsonify({"ok": False, "error": "session expired; submit to /api/match"}), 404
+        answers = _step_answers()
+        with session.lock:
+            profile = form_to_profile({**session.answers, **answers})
+            session.update(engine, profile, answers)
+        lane = lane_for(DB_PATH, request.headers.get("X-Api-Key"))
+        return _coalesced_first_page(engine, profile, limit, projection, lane, session.survivors)
+    except Overloaded as e:
+        response = jsonify({"ok": False, "error": "server busy; retry shortly", "lane": e.lane,
+                            "reason": e.reason, "retry_after": e.retry_after})
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, 503
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.route("/api/match/batch", methods=["POST"])
+def api_match_batch():
+    """
+    Rank several questionnaires as one background job:
+    {"profiles": [{...form...}, ...], "max_results": 50} -> 202 {"job_id": N}; poll /api/jobs/<id>.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        forms = data.get("profiles") or []
+        if not isinstance(forms, list) or not forms:
+            return jsonify({"ok": False, "error": "profiles must be a non-empty list"}), 400
+        if len(forms) > 500:
+            return jsonify({"ok": False, "error": "at most 500 profiles per batch"}), 400
+        _get_engine()
+        job_id = enqueue(DB_PATH, "match_batch", {
+            "profiles": [profile_to_json(form_to_profile(f)) for f in forms],
+            "max_results": max(1, min(200, int(data.get("max_results", 50)))),
+            "now": datetime.now().isoformat(),
+        }, priority=PRIORITY_LOW)
+        return jsonify({"ok": True, "job_id": job_id, "status_url": f"/api/jobs/{job_id}"}), 202
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.route("/api/profiles", methods=["POST"])
+def api_profiles():
+    """
+    Save a questionnaire for match alerts: the form plus "email" (and optional "top_k").
+    Its first ranking runs as a job -> 202 {"profile_id", "job_id"}; later catalog loads
+    re-match it incrementally.
+    """
+    try:
+        data = _form_data()
+        _get_engine()
+        profile_id = save_profile(DB_PATH, data.get("email"), form_to_profile(data),
+                                  int(data.get("top_k") or 50), data.get("name"))
+        job_id = enqueue(DB_PATH, "rematch", {"profile_id": profile_id})
+        return jsonify({"ok": True, "profile_id": profile_id, "job_id": job_id,
+                        "matches_url": f"/api/profiles/{profile_id}/matches"}), 202
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.route("/api/profiles/<int:profile_id>/matches")
+def api_profile_matches(profile_id):
+    """A saved profile's stored matches, best first (empty until its first ranking job ran); ?lang= as /api/match."""
+    _ensure_db()
+    try:
+        matches = profile_matches(DB_PATH, profile_id,
+                                  language(request.args.get("lang") or request.headers.get("Accept-Language")))
+        if matches is None:
+            return jsonify({"ok": False, "error": "profile not found"}), 404
+        return jsonify({"ok": True, "profile_id": profile_id, "matches": matches})
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.route("/api/admission")
+def api_admission():
+    """Match admission counters (running, queued and admitted / rejected per lane) and ranking coalescing."""
+    return jsonify({"ok": True, "admission": _admission.stats(), "coalescing": _rankings.stats()})
+
+
+@app.route("/api/jobs")
+def api_jobs():
+    """Queue depth: {kind: {status: count}}."""
+    _ensure_db()
+    try:
+        return jsonify({"ok": True, "jobs": queue_stats(DB_PATH)})
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.route("/api/jobs/<int:job_id>")
+def api_job(job_id):
+    _ensure_db()
+    try:
+        job = job_status(DB_PATH, job_id)
+        if job is None:
+            return jsonify({"ok": False, "error": "job not found"}), 404
+        return jsonify({"ok": True, "job": job})
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+def _is_admin() -> bool:
+    token = os.environ.get("ADMIN_TOKEN")
+    return bool(token) and hmac.compare_digest(request.headers.get("X-Admin-Token", ""), token)
+
+
+def _admin_denied():
+    """None for a request carrying X-Admin-Token = $ADMIN_TOKEN; admin routes 404 when it is unset."""
+    if not os.environ.get("ADMIN_TOKEN"):
+        abort(404)
+    if not _is_admin():
+        return jsonify({"ok": False, "error": "invalid admin token"}), 403
+    return None
+
+
+@app.route("/api/admin/reload", methods=["POST"])
+def api_admin_reload():
+    """
+    Rebuild the catalog from the batch files and swap it in without downtime
+    (catalog_reload.py). Needs X-Admin-Token = $ADMIN_TOKEN; ?force=1 accepts a much
+    smaller catalog. 202 {"job_id": N}; poll /api/jobs/<id>.
+    """
+    denied = _admin_denied()
+    if denied:
+        return denied
+    try:
+        _ensure_db()
+        job_id = enqueue(DB_PATH, "load_batches", {
+            "reload": True,
+            "force": request.args.get("force") == "1",
+        }, max_attempts=1)
+        return jsonify({"ok": True, "job_id": job_id, "status_url": f"/api/jobs/{job_id}"}), 202
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.route("/api/admin/memory")
+def api_admin_memory():
+    """
+    Shared vs private memory (KiB, from /proc smaps_rollup) of the gunicorn master and
+    every worker; "current" marks the worker that answered. Needs X-Admin-Token.
+    """
+    denied = _admin_denied()
+    if denied:
+        return denied
+    processes = memory_report()
+    if not processes:
+        return jsonify({"ok": False, "error": "memory report needs /proc (Linux)"}), 501
+    return jsonify({"ok": True, "processes": processes})
+
+
+@app.route("/api/admin/profiles")
+def api_admin_profiles():
+    """Stored /api/match profiles, slowest first (?limit=20). Needs X-Admin-Token."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    try:
+        limit = max(1, min(200, int(request.args.get("limit", 20))))
+        return jsonify({"ok": True, "profiles": slowest_profiles(DB_PATH, limit)})
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.route("/api/admin/profiles/<int:profile_id>")
+def api_admin_profile(profile_id):
+    """One profile's summary: top functions and engine layers (ms)."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    found = get_profile(DB_PATH, profile_id)
+    if found is None:
+        return jsonify({"ok": False, "error": "profile not found"}), 404
+    return jsonify({"ok": True, "profile": found})
+
+
+@app.route("/api/admin/profiles/<int:profile_id>.prof")
+def api_admin_profile_download(profile_id):
+    """Raw pstats data: python -m pstats profile-<id>.prof, or snakeviz."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    data = profile_stats(DB_PATH, profile_id)
+    if data is None:
+        abort(404)
+    return Response(data, mimetype="application/octet-stream", headers={
+        "Content-Disposition": f"attachment; filename=profile-{profile_id}.prof",
+    })
+
+
+@app.route("/api/reports", methods=["POST"])
+def api_reports():
+    """
+    Queue a funding report. POST the questionnaire, or ?cursor= (from /api/match) to
+    report on that match run. Rendering happens on the job worker; poll
+    /api/reports/<id> for the download URL.
+    """
+    try:
+        cursor = request.args.get("cursor")
+        if cursor:
+            token, _ = decode_cursor(cursor)
+            run = _cursors.get(token)
+            engine = _get_engine()
+            if run is None or run.catalog_version != engine.catalog.version:
+                return jsonify({"ok": False, "error": "cursor expired; submit the form again"}), 410
+            queued = submit_report(DB_PATH, run.profile, run.now, run.source_ids[:REPORT_MATCHES])
+        else:
+            _get_engine()
+            queued = submit_report(DB_PATH, form_to_profile(_form_data()))
+        return jsonify(_report_json(queued)), 202 if queued["status"] != "ready" else 200
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.route("/api/reports/<int:report_id>")
+def api_report(report_id):
+    try:
+        status = report_status(DB_PATH, report_id)
+        if status is None:
+            return jsonify({"ok": False, "error": "report not found"}), 404
+        return jsonify(_report_json(status))
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+def _report_json(report: dict) -> dict:
+    out = {"ok": True}
+    out.update(report)
+    out["url"] = f"/reports/{report['content_hash']}.html" if report["status"] == "ready" else None
+    return out
+
+
+@app.route("/reports/<content_hash>.html")
+def report_html(content_hash):
+    """Rendered reports are immutable under their content hash: streamed from the DB, never re-rendered."""
+    headers = {"ETag": f'"{content_hash}"', "Cache-Control": LONG_CACHE}
+    if request.if_none_match.contains(content_hash):
+        return Response(status=304, headers=headers)
+    found = find_report(DB_PATH, content_hash)
+    if found is None:
+        abort(404)
+    headers["Content-Length"] = str(found["content_length"])
+    return Response(iter_report_html(DB_PATH, found["report_id"]), mimetype="text/html", headers=headers)
+
+
+@app.route("/api/sources")
+def api_sources():
+    """
+    Browse active sources (quality order, paged). Filters:
+    ?min=&max= amount overlap, ?state=TN (includes nationwide), ?region=ARC, ?county=OH:Cuyahoga
+    """
+    _ensure_db()
+    try:
+        catalog = get_catalog(DB_PATH)
+        lo = float(request.args.get("min", 0))
+        hi = float(request.args.get("max", 1_000_000_000))
+        limit = max(1, min(200, int(request.args.get("limit", 50))))
+        offset = max(0, int(request.args.get("offset", 0)))
+        ids = catalog.amount_index.overlapping(lo, hi, include_unknown=False)
+        geo = catalog.geo_index
+        state = request.args.get("state")
+        if state:
+            ids &= geo.eligible_ids(state) or frozenset()
+        if request.args.get("region"):
+            ids &= geo.ids(region_key(request.args["region"].strip().upper()))
+        if request.args.get("county"):
+            st, _, county = request.args["county"].partition(":")
+            ids &= geo.ids(county_key(st.strip().upper(), county.strip().upper().replace(" ", "_")))
+        page = catalog.in_rank_order(ids)[offset:offset + limit]
         return jsonify({
             "ok": True,
-            "matches": [match_to_json(m) for m in matches],
-            "count": len(matches),
+            "sources": [source_to_json(s) for s in page],
+            "total": len(ids),
         })
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
+@app.route("/api/sources/<int:source_id>")
+def api_source(source_id):
+    """One active source with every field (requirements_text for compact match results)."""
+    _ensure_db()
+    source = get_catalog(DB_PATH).by_id.get(source_id)
+    if source is None:
+        return jsonify({"ok": False, "error": "source not found"}), 404
+    return jsonify({"ok": True, "source": source_to_json(source)})
+
+
+@app.route("/api/deadlines")
+def api_deadlines():
+    """Upcoming deadlines, soonest first (materialized by the deadline sweeper)."""
+    _ensure_db()
+    try:
+        limit = max(1, min(500, int(request.args.get("limit", 50))))
+        items = list_upcoming(DB_PATH, limit=limit)
+        return jsonify({"ok": True, "deadlines": items, "count": len(items)})
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.route("/api/catalog-index")
+def api_catalog_index():
+    """
+    Where the browser matcher (catalog_matcher.js) fetches the compiled catalog index.
+    When the published index is older than the live catalog it is rebuilt in the
+    background and clients fall back to /api/match meanwhile.
+    """
+    try:
+        version = _get_engine().catalog.version
+        entry = _assets.manifest().get(INDEX_NAME)
+        if entry is None or entry.get("catalog_version") != version:
+            export_in_background(DB_PATH, on_done=_assets.reload)
+            return jsonify({"ok": False, "error": "catalog index is being rebuilt"}), 503
+        return jsonify({"ok": True, "url": _assets.url_for(INDEX_NAME), "catalog_version": version})
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
+@app.route("/api/zip/<zip_code>")
+def api_zip(zip_code):
+    """
+    Rural status of a ZIP from the RUCA table (rurality.py), for the browser matcher,
+    which has no table of its own. rural is null for a ZIP the table lacks; both
+    form_to_profile and catalog_matcher.js then use their state list.
+    """
+    zip_info = zip_lookup(zip_code)
+    return jsonify({"ok": True, "zip": zip_code, "rural": zip_info.rural if zip_info is not None else None})
+
+
 @app.route("/api/health")
 def health():
     # Fast response so Railway healthcheck passes; DB init happens on first /api/match
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+FUNDING FINDER - CATALOG SNAPSHOT
+In-memory snapshot of active funding sources, shared by every request in a process.
+
+The engine used to run SELECT * and rebuild FundingSource objects on every match.
+The snapshot is built once, refreshed incrementally when the database changes
+(only new or updated rows are re-read), and carries the indexes the engine and
+browse APIs consult instead of scanning.
+"""
+
+import bisect
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, time
+from typing import Dict, List, Optional, Set, Tuple
+
+from engine import FundingSource, source_from_row
+from geo import ALL_KEY, GeoIndex, state_key
+
+
+class _IntervalNode:
+    __slots__ = ('center', 'by_min', 'by_max', 'left', 'right')
+
+
+def _build_interval_tree(intervals: List[Tuple[float, float, int]]) -> Optional[_IntervalNode]:
+    """Centered interval tree over (lo, hi, source_id)."""
+    if not intervals:
+        return None
+    points = sorted(p for lo, hi, _ in intervals for p in (lo, hi))
+    center = points[len(points) // 2]
+    left = [iv for iv in intervals if iv[1] < center]
+    right = [iv for iv in intervals if iv[0] > center]
+    here = [iv for iv in intervals if iv[0] <= center <= iv[1]]
+    node = _IntervalNode()
+    node.center = center
+    node.by_min = sorted((lo, sid) for lo, _, sid in here)
+    node.by_max = sorted(((hi, sid) for _, hi, sid in here), reverse=True)
+    node.left = _build_interval_tree(left)
+    node.right = _build_interval_tree(right)
+    return node
+
+
+class AmountIndex:
+    """
+    Interval index over [min_amount, max_amount].
+    overlapping(lo, hi) = intervals containing lo (tree stab) + intervals starting inside
+    (lo, hi] (bisect on sorted starts): O(log n + k) instead of a scan.
+    Sources with no parsed amount (max_amount 0) are kept in `unknown` and never pruned.
+    """
+
+    def __init__(self, sources: List[FundingSource]):
+        intervals = []
+        self.unknown: Set[int] = set()
+        for s in sources:
+            lo, hi = s.min_amount or 0.0, s.max_amount or 0.0
+            if hi <= 0:
+                self.unknown.add(s.source_id)
+                continue
+            intervals.append((min(lo, hi), max(lo, hi), s.source_id))
+        self._starts = sorted((lo, sid) for lo, _, sid in intervals)
+        self._root = _build_interval_tree(intervals)
+
+    def _stab(self, x: float, out: Set[int]) -> None:
+        node = self._root
+        while node is not None:
+            if x < node.center:
+                for lo, sid in node.by_min:
+                    if lo > x:
+                        break
+                    out.add(sid)
+                node = node.left
+            elif x > node.center:
+                for hi, sid in node.by_max:
+                    if hi < x:
+                        break
+                    out.add(sid)
+                node = node.right
+            else:
+                out.update(sid for _, sid in node.by_min)
+                return
+
+    @staticmethod
+    def overlaps(source: FundingSource, lo: float, hi: float) -> bool:
+        """overlapping() for a single source: no parsed amount, or a range intersecting [lo, hi]."""
+        s_lo, s_hi = source.min_amount or 0.0, source.max_amount or 0.0
+        if s_hi <= 0:
+            return True
+        if lo > hi:
+            lo, hi = hi, lo
+        return min(s_lo, s_hi) <= hi and max(s_lo, s_hi) >= lo
+
+    def overlapping(self, lo: float, hi: float, include_unknown: bool = True) -> Set[int]:
+        """Source ids whose amount range intersects [lo, hi]."""
+        if lo > hi:
+            lo, hi = hi, lo
+        out: Set[int] = set()
+        self._stab(lo, out)
+        start = bisect.bisect_right(self._starts, (lo, float('inf')))
+        end = bisect.bisect_right(self._starts, (hi, float('inf')))
+        out.update(sid for _, sid in self._starts[start:end])
+        if include_unknown:
+            out |= self.unknown
+        return out
+
+
+class CatalogSnapshot:
+    """
+    View of the active catalog. Its sources and indexes never change; refreshing
+    produces a new snapshot. The memo caches (fragments, required_identities, the
+    geo index's decoded id sets, segments.py's cache keyed by snapshot) fill in on
+    first use with values derived only from that data, so sharing one is safe.
+    """
+
+    def __init__(self, sources: List[FundingSource], stamps: Dict[int, str],
+                 geo_keys: Optional[Dict[int, List[str]]] = None):
+        self.sources = sources                      # ordered by quality_score DESC
+        self.by_id = {s.source_id: s for s in sources}
+        self.rank = {s.source_id: i for i, s in enumerate(sources)}
+        self.stamps = stamps                        # source_id -> updated_at
+        # Deadline index: (deadline, source_id) ascending; rolling sources are not listed
+        self.deadline_index: List[Tuple[datetime, int]] = sorted(
+            (s.deadline, s.source_id) for s in sources if s.deadline
+        )
+        self.amount_index = AmountIndex(sources)
+        self.geo_keys = _geo_keys(sources, geo_keys or {})  # source_id -> geo keys
+        self.geo_index = GeoIndex(self.geo_keys, [s.source_id for s in sources])
+        # Per-snapshot render caches (serialize.py: pre-rendered source JSON per projection)
+        self.fragments: "OrderedDict[Tuple[str, ...], Dict[int, str]]" = OrderedDict()
+        # source_id -> identities the source is restricted to (engine._required_identities)
+        self.required_identities: Dict[int, List[str]] = {}
+        digest = hashlib.sha1()
+        for s in sources:
+            digest.update(f"{s.source_id}:{stamps.get(s.source_id, '')};".encode())
+        self.version = digest.hexdigest()[:16]
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def in_rank_order(self, ids) -> List[FundingSource]:
+        """Sources for ids, in catalog (quality) order."""
+        return [self.by_id[sid] for sid in sorted(ids, key=self.rank.__getitem__)]
+
+    def expired_ids(self, now: datetime) -> Set[int]:
+        """One-time sources whose deadline day is over (engine.is_expired; active until the sweeper runs)."""
+        end = bisect.bisect_left(self.deadline_index, (datetime.combine(now.date(), time.min), -1))
+        return {
+            sid for _, sid in self.deadline_index[:end]
+            if self.by_id[sid].deadline_type == 'one-time'
+        }
+
+    def upcoming(self, now: datetime, limit: int = 50) -> List[FundingSource]:
+        """Sources with a deadline at or after now, soonest first."""
+        start = bisect.bisect_left(self.deadline_index, (now, -1))
+        return [self.by_id[sid] for _, sid in self.deadline_index[start:start + limit]]
+
+
+def _geo_keys(sources: List[FundingSource], stored: Dict[int, List[str]]) -> Dict[int, List[str]]:
+    """Ingested geo keys per source; fall back to eligible_states for rows loaded without them."""
+    out = {}
+    for s in sources:
+        keys = stored.get(s.source_id)
+        if not keys:
+            states = [str(x).upper() for x in s.eligible_states or []]
+            keys = [ALL_KEY] if not states or 'ALL' in states else [state_key(x) for x in states]
+        out[s.source_id] = keys
+    return out
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+class _CatalogHandle:
+    """Owns the connection used to detect changes and the current snapshot for one DB."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.conn: Optional[sqlite3.Connection] = _connect(db_path)
+        self.lock = threading.Lock()
+        self.data_version: Optional[int] = None
+        self.snapshot: Optional[CatalogSnapshot] = None
+        # Set by prewarm_catalog's caller (the watcher): requests keep the current snapshot
+        # and the watcher thread builds the next one, so no request pays for a rebuild
+        self.background = False
+
+    def _conn(self) -> sqlite3.Connection:
+        if self.conn is None:
+            self.conn = _connect(self.db_path)  # released before a fork (preload.py)
+        return self.conn
+
+    def current(self) -> CatalogSnapshot:
+        with self.lock:
+            if self.background and self.snapshot is not None:
+                return self.snapshot
+            # PRAGMA data_version changes whenever another connection commits
+            dv = self._conn().execute("PRAGMA data_version").fetchone()[0]
+            if self.snapshot is None or dv != self.data_version:
+                self.snapshot = self._refresh(self.snapshot)
+                self.data_version = dv
+            return self.snapshot
+
+    def prewarm(self) -> CatalogSnapshot:
+        """Build the next snapshot outside the lock (own connection), then install it."""
+        with self.lock:
+            dv = self._conn().execute("PRAGMA data_version").fetchone()[0]
+            old = self.snapshot
+            if old is not None and dv == self.data_version:
+                return old
+        conn = _connect(self.db_path)
+        try:
+            new = self._refresh(old, conn)
+        finally:
+            conn.close()
+        with self.lock:
+            # A commit during the build leaves dv behind, so the next call picks it up
+            self.snapshot, self.data_version = new, dv
+            return new
+
+    def install(self, snapshot: CatalogSnapshot) -> None:
+        """Adopt a snapshot built elsewhere; the next current() only checks its stamps."""
+        with self.lock:
+            self.snapshot, self.data_version = snapshot, None
+
+    def refresh(self) -> CatalogSnapshot:
+        with self.lock:
+            self.snapshot = self._refresh(self.snapshot)
+            self.data_version = self._conn().execute("PRAGMA data_version").fetchone()[0]
+            return self.snapshot
+
+    def _refresh(self, old: Optional[CatalogSnapshot],
+                 conn: Optional[sqlite3.Connection] = None) -> CatalogSnapshot:
+        """Re-read only rows that are new or whose updated_at changed since the old snapshot."""
+        conn = conn or self._conn()
+        order = conn.execute("""
+            SELECT source_id, updated_at FROM funding_sources
+            WHERE active = 1
+            ORDER BY quality_score DESC
+        """).fetchall()
+        stamps = {r['source_id']: r['updated_at'] or '' for r in order}
+        if old is not None:
+            stale = [sid for sid, st in stamps.items()
+                     if sid not in old.by_id or old.stamps.get(sid) != st]
+            if not stale and [r['source_id'] for r in order] == [s.source_id for s in old.sources]:
+                return old
+            by_id = dict(old.by_id)
+            # Geography rows are written with their source row, so unchanged sources keep theirs
+            fresh = set(stale)
+            geo = {sid: old.geo_keys[sid] for sid in stamps
+                   if sid not in fresh and sid in old.geo_keys}
+        else:
+            stale = list(stamps)
+            by_id = {}
+            geo = {}
+        for i in range(0, len(stale), 500):
+            chunk = stale[i:i + 500]
+            marks = ','.join('?' * len(chunk))
+            for row in conn.execute(
+                f"SELECT * FROM funding_sources WHERE source_id IN ({marks})", chunk
+            ):
+                by_id[row['source_id']] = source_from_row(row)
+        geo.update(self._load_geography(conn, None if old is None else stale))
+        sources = [by_id[r['source_id']] for r in order if r['source_id'] in by_id]
+        return CatalogSnapshot(sources, stamps, geo)
+
+    @staticmethod
+    def _load_geography(conn: sqlite3.Connection,
+                        source_ids: Optional[List[int]] = None) -> Dict[int, List[str]]:
+        """Stored geo keys for source_ids (every source if None)."""
+        keys: Dict[int, List[str]] = {}
+        if source_ids is None:
+            queries = [("SELECT source_id, geo_key FROM source_geography", ())]
+        else:
+            queries = [
+                (f"SELECT source_id, geo_key FROM source_geography "
+                 f"WHERE source_id IN ({','.join('?' * len(chunk))})", chunk)
+                for chunk in (source_ids[i:i + 500] for i in range(0, len(source_ids), 500))
+            ]
+        try:
+            for sql, params in queries:
+                for sid, key in conn.execute(sql, params):
+                    keys.setdefault(sid, []).append(key)
+        except sqlite3.OperationalError:
+            pass  # DB created before source_geography existed
+        return keys
+
+
+_handles: Dict[str, _CatalogHandle] = {}
+_handles_lock = threading.Lock()
+
+
+def _handle(db_path: str) -> _CatalogHandle:
+    with _handles_lock:
+        h = _handles.get(db_path)
+        if h is None:
+            h = _handles[db_path] = _CatalogHandle(db_path)
+        return h
+
+
+def get_catalog(db_path: str) -> CatalogSnapshot:
+    """Current snapshot for db_path; refreshed incrementally if the DB changed."""
+    return _handle(db_path).current()
+
+
+def refresh_catalog(db_path: str) -> CatalogSnapshot:
+    """Force an incremental refresh (e.g. right after the deadline sweeper ran)."""
+    return _handle(db_path).refresh()
+
+
+def prewarm_catalog(db_path: str) -> CatalogSnapshot:
+    """
+    Rebuild the snapshot in the calling (background) thread if the DB changed, and from
+    then on serve requests the current snapshot without checking: the caller polls this.
+    """
+    h = _handle(db_path)
+    h.background = True
+    return h.prewarm()
+
+
+def install_catalog(db_path: str, snapshot: CatalogSnapshot) -> None:
+    """Serve a snapshot built from a copy of the same rows (catalog_reload swap)."""
+    _handle(db_path).install(snapshot)
+
+
+def release_connections() -> None:
+    """
+    Close every handle's connection, keeping the snapshots (before fork: a SQLite
+    connection must not be used in two processes). Each reopens on next use, and since
+    data_version is per connection, that first use re-checks stamps.
+    """
+    with _handles_lock:
+        for h in _handles.values():
+            with h.lock:
+                if h.conn is not None:
+                    h.conn.close()
+                    h.conn = None
+                h.data_version = None
+
+
+def build_snapshot(db_path: str) -> CatalogSnapshot:
+    """A fresh snapshot of db_path, without keeping a handle (staged databases)."""
+    h = _CatalogHandle(db_path)
+    try:
+        return h.refresh()
+    finally:
+        h.conn.close()
@@ -0,0 +1,378 @@
+/*
+ * FUNDING FINDER - CLIENT-SIDE MATCHER
+ * Matches a questionnaire against the compiled catalog index (export_catalog.py)
+ * with the same five scoring layers as engine.py, so anonymous users never hit
+ * /api/match. Keep in step with engine.py and form_to_profile in app.py.
+ *
+ *   const index = await FundingCatalog.load();          // fetches /api/catalog-index
+ *   const rural = await FundingCatalog.ruralForZip(zip); // fetches /api/zip/<zip>
+ *   const matches = FundingCatalog.match(index, new FormData(form), { rural });
+ */
+(function (root) {
+  'use strict';
+
+  const AMOUNT_MAP = { micro: [0, 5000], small: [5000, 25000], medium: [25000, 100000], large: [100000, 1000000] };
+  const RURAL_STATES = ['WV', 'VT', 'ME', 'MT', 'WY', 'SD', 'ND', 'AK'];
+  const STAGE_MAP = {
+    concept: "Just an idea I can't stop thinking about",
+    planning: "I've been planning this for a while",
+    launched: "I've started but need help to grow",
+    growing: "I'm already doing this and want to expand",
+  };
+  const STOPWORDS = new Set(['the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by']);
+  const HERITAGE = ['irish', 'italian', 'asian', 'hispanic', 'latino', 'appalachian', 'tribal', 'indigenous'];
+  const COMMUNITY = ['church', 'religious', 'fraternal', 'union', 'tribal', 'civic'];
+  const COMPLEXITY_PENALTY = { simple: 0, moderate: 20, complex: 40, very_complex: 60 };
+  const CAPACITY_MULTIPLIER = {
+    'A few hours per week': 2.0, 'Very limited time': 3.0, '10-20 hours per week': 1.0, 'Full-time (40+ hours)': 0.5,
+  };
+  const URGENCY_DAYS = {
+    'As soon as possible (emergency)': 30, 'Within 3 months': 90, 'Within 6 months': 180,
+    'Within a year': 365, 'No rush, just exploring': 9999,
+  };
+  const STAGE_TYPES = {
+    "Just an idea I can't stop thinking about": ['grant', 'contest', 'microloan'],
+    "I've been planning this for a while": ['grant', 'loan', 'contest'],
+    "I've started but need help to grow": ['loan', 'grant', 'angel'],
+    "I'm already doing this and want to expand": ['loan', 'grant', 'angel'],
+  };
+  const TYPES = { u8: Uint8Array, u16: Uint16Array, u32: Uint32Array, f64: Float64Array };
+  const DAY_MS = 86400000;
+
+  // ---------------------------------------------------------------------------
+  // INDEX DECODING
+  // ---------------------------------------------------------------------------
+
+  function decode(buffer) {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(view.getUint8(0), view.getUint8(1), view.getUint8(2), view.getUint8(3));
+    if (magic !== 'FFCI') throw new Error('not a catalog index');
+    const headLen = view.getUint32(8, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 12, headLen)));
+    const base = 12 + headLen + ((8 - ((12 + headLen) % 8)) % 8);
+    const col = {};
+    for (const [name, c] of Object.entries(header.columns)) {
+      col[name] = new TYPES[c.type](buffer, base + c.offset, c.length);
+    }
+    const bit = {};
+    header.features.forEach((f, i) => { bit[f] = i; });
+    const keywordId = new Map(header.vocab.keywords.map((k, i) => [k, i]));
+    const stateBit = new Map(header.vocab.states.map((s, i) => [s, i]));
+    const ptypeBit = new Map(header.vocab.project_types.map((s, i) => [s, i]));
+    const utf8 = new TextDecoder();
+    function str(name, i) {
+      const off = col[name + '_off'];
+      return utf8.decode(col[name + '_utf8'].subarray(off[i], off[i + 1]));
+    }
+    return { header, col, bit, keywordId, stateBit, ptypeBit, str, count: header.count };
+  }
+
+  function has(ix, i, feature) {
+    const b = ix.bit[feature];
+    return ((ix.col.features[i * ix.header.feature_words + (b >> 5)] >>> (b & 31)) & 1) === 1;
+  }
+
+  // ---------------------------------------------------------------------------
+  // PROFILE (mirror of form_to_profile)
+  // ---------------------------------------------------------------------------
+
+  function capitalize(s) { s = String(s); return s.charAt(0).toUpperCase() + s.slice(1).toLowerCase(); }
+
+  function profileFromForm(fd, rural) {
+    const get = (k) => (fd.get(k) || '');
+    let ids = fd.getAll('id');
+    if (!ids.length) ids = fd.getAll('identity');
+    const identity = ids.filter(Boolean).map(capitalize);
+    const amount = (get('amount') || 'medium').toLowerCase();
+    const [fmin, fmax] = AMOUNT_MAP[amount] || [5000, 100000];
+    const state = get('state').trim().toUpperCase().slice(0, 2);
+    const zip = get('zip').trim();
+    const story = (get('story') || get('vision')).slice(0, 500);
+    const vision = (get('vision') || get('project_vision')).slice(0, 500);
+    return {
+      state: state,
+      projectType: 'business',
+      projectField: (vision || story || 'general business startup').toLowerCase().slice(0, 200),
+      projectDescription: vision || story || 'General business or project',
+      projectStage: STAGE_MAP[get('stage').toLowerCase()] || "I've been planning this for a while",
+      fundingNeeded: [fmin, fmax],
+      educationLevel: get('edu') || 'Some college',
+      experienceYears: 2,
+      identity: identity,
+      heritage: '',
+      obstacles: story ? story.slice(0, 300) : '',
+      communityTies: '',
+      uniqueStory: story ? story.slice(0, 300) : '',
+      // The server's ZIP lookup (ruralForZip); the state list when it has none, as in app.py
+      rural: typeof rural === 'boolean' ? rural : RURAL_STATES.includes(state),
+      advantages: story ? ['Strong personal story'] : [],
+      urgency: get('time') || 'Within 6 months',
+      timeCapacity: get('cap') || '10-20 hours per week',
+    };
+  }
+
+  function extractKeywords(text) {
+    const words = text.toLowerCase().match(/[\p{L}\p{N}\p{M}_]+/gu) || [];
+    return words.filter((w) => !STOPWORDS.has(w) && [...w].length > 3);
+  }
+
+  // ---------------------------------------------------------------------------
+  // SCORING LAYERS (engine.py)
+  // ---------------------------------------------------------------------------
+
+  function scoreEligibility(ix, i, p, ctx) {
+    const c = ix.col;
+    let score = 100.0;
+    if (!has(ix, i, 'states_all') && !ctx.inState(i)) score -= 100;
+    if (!has(ix, i, 'ptypes_all')) {
+      const b = ix.ptypeBit.get(p.projectType);
+      if (b === undefined || !((c.project_types[i] >>> b) & 1)) score -= 50;
+    }
+    if (!has(ix, i, 'fields_all')) {
+      const proj = p.projectField.toLowerCase() + ' ' + p.projectDescription.toLowerCase();
+      let match = false;
+      for (let k = c.fields_off[i]; k < c.fields_off[i + 1] && !match; k++) {
+        const tag = ix.header.vocab.fields[c.fields_ids[k]];
+        match = proj.includes(tag) || proj.includes(tag.split('_').join(' '));
+      }
+      if (!match) score -= 10;
+    }
+    const [umin, umax] = p.fundingNeeded;
+    if (c.max_amount[i] < umin || c.min_amount[i] > umax) score -= 20;
+    score += hiddenBoost(ix, i, p);
+    return Math.max(0, Math.min(100, score));
+  }
+
+  function hiddenBoost(ix, i, p) {
+    const req = (f) => has(ix, i, 'req:' + f);
+    const ids = p.identity;
+    let boost = 0;
+    if (ids.includes('woman') || req('women')) { if (req('women') || req('woman-owned')) boost += 25; }
+    if (ids.includes('veteran')) { if (req('veteran') || req('military')) boost += 30; }
+    if (ids.includes('minority') || ids.includes('person of color')) {
+      if (req('minority') || req('diverse') || req('underrepresented')) boost += 25;
+    }
+    if (ids.includes('disability')) { if (req('disability') || req('accessible')) boost += 20; }
+    if (ids.includes('lgbtq')) { if (req('lgbtq') || req('pride')) boost += 20; }
+    const heritage = p.heritage.toLowerCase();
+    HERITAGE.forEach((k) => { if (heritage.includes(k) && req(k)) boost += 15; });
+    const obstacles = p.obstacles.toLowerCase();
+    if (['poor', 'poverty', 'homeless', 'foster'].some((k) => obstacles.includes(k))) {
+      if (has(ix, i, 'req:hardship')) boost += 20;
+    }
+    const ties = p.communityTies.toLowerCase();
+    COMMUNITY.forEach((k) => { if (ties.includes(k) && req(k)) boost += 15; });
+    if (p.rural && req('rural')) boost += 30;
+    if (ids.includes('first-generation') && has(ix, i, 'req:first_gen')) boost += 15;
+    return Math.min(50, boost);
+  }
+
+  function scoreSuccess(ix, i, p) {
+    let score = 50.0;
+    const rate = ix.col.success_rate[i];
+    if (rate) score = rate * 100;
+    const n = p.advantages.length;
+    if (n >= 3) score += 20;
+    else if (n >= 2) score += 10;
+    if (p.uniqueStory && [...p.uniqueStory].length > 100) score += 10;
+    if (p.experienceYears >= 5) score += 10;
+    if (has(ix, i, 'fields_edu_research')) {
+      const edu = p.educationLevel.toLowerCase();
+      if (edu.includes('bachelor') || edu.includes('master')) score += 10;
+    }
+    if (p.identity.length >= 2) score += 15;
+    return Math.min(100, score);
+  }
+
+  function complexityOf(ix, i) { return ix.header.vocab.complexities[ix.col.complexity[i]]; }
+
+  function scoreEffort(ix, i, p) {
+    let score = 100.0;
+    const penalty = COMPLEXITY_PENALTY[complexityOf(ix, i)];
+    const mult = CAPACITY_MULTIPLIER[p.timeCapacity];
+    score -= (penalty === undefined ? 20 : penalty) * (mult === undefined ? 1.0 : mult);
+    const hours = ix.col.estimated_hours[i];
+    if (hours) {
+      if (hours > 40 && p.timeCapacity === 'Very limited time') score -= 30;
+      else if (hours < 5) score += 10;
+    }
+    return Math.max(0, Math.min(100, score));
+  }
+
+  function scoreTimeline(ix, i, p, nowMs) {
+    let score = 100.0;
+    const deadline = ix.col.deadline_ms[i];
+    if (deadline < 0) return 100;
+    const days = Math.floor((deadline - nowMs) / DAY_MS);
+    const threshold = URGENCY_DAYS[p.urgency] === undefined ? 180 : URGENCY_DAYS[p.urgency];
+    const cx = complexityOf(ix, i);
+    if (days < 0) return 0;
+    else if (days < 30 && (cx === 'complex' || cx === 'very_complex')) score -= 50;
+    else if (days > threshold) score -= 20;
+    return Math.max(0, score);
+  }
+
+  function scoreFit(ix, i, p, ctx) {
+    let score = 50.0;
+    const c = ix.col;
+    let overlap = 0;
+    for (let k = c.keywords_off[i]; k < c.keywords_off[i + 1]; k++) {
+      if (ctx.keywordIds.has(c.keywords_ids[k])) overlap++;
+    }
+    score += Math.min(30, overlap * 5);
+    const preferred = STAGE_TYPES[p.projectStage] || [];
+    if (preferred.includes(ix.header.vocab.source_types[c.source_type[i]])) score += 15;
+    return Math.min(100, score);
+  }
+
+  // ---------------------------------------------------------------------------
+  // EXPLANATIONS
+  // ---------------------------------------------------------------------------
+
+  // One decimal, ties to even, like the server's '%.1f'
+  function round1(x) {
+    const r = x * 10, f = Math.floor(r), d = r - f;
+    return (d > 0.5 || (d === 0.5 && f % 2 === 1) ? f + 1 : f) / 10;
+  }
+
+  function money(x) { return Number(x).toLocaleString('en-US', { maximumFractionDigits: 0 }); }
+
+  function reasonsFor(ix, i, p, eligibility, success) {
+    const reasons = [];
+    const c = ix.col;
+    if (eligibility >= 80) reasons.push('You meet all major eligibility requirements for ' + ix.str('name', i));
+    if (success >= 70) reasons.push('You have strong competitive advantages for this opportunity');
+    if (p.identity.includes('woman') && has(ix, i, 'req:women')) reasons.push('Women-owned business program match');
+    if (p.identity.includes('veteran') && has(ix, i, 'req:veteran')) reasons.push('Veteran-specific funding opportunity');
+    if (p.rural && has(ix, i, 'req:rural')) reasons.push('Rural location qualifies you for this program');
+    const umin = p.fundingNeeded[0];
+    if (c.min_amount[i] <= umin && umin <= c.max_amount[i]) {
+      reasons.push('Funding amount (' + money(c.min_amount[i]) + ' - ' + money(c.max_amount[i]) + ') matches your needs');
+    }
+    return reasons;
+  }
+
+  function gapsFor(ix, i, p) {
+    const gaps = [];
+    if (has(ix, i, 'req:business plan') && !p.advantages.some((a) => a.toLowerCase().includes('plan'))) {
+      gaps.push('Business plan required - not mentioned in your profile');
+    }
+    if (has(ix, i, 'req:financial statements')) gaps.push('Financial statements may be required');
+    if (has(ix, i, 'req:letters')) gaps.push('Letters of support/recommendation needed');
+    return gaps;
+  }
+
+  function advantagesFor(p) {
+    const adv = p.advantages.slice(0, 3);
+    if (p.identity.length >= 2) adv.push('Multiple diversity factors strengthen your application');
+    if (p.obstacles && [...p.obstacles].length > 50) adv.push('Compelling personal story of overcoming obstacles');
+    if (p.experienceYears >= 10) adv.push(p.experienceYears + ' years of experience in your field');
+    return adv.slice(0, 5);
+  }
+
+  // ---------------------------------------------------------------------------
+  // MATCH
+  // ---------------------------------------------------------------------------
+
+  function requiredOk(ix, i, userIds) {
+    const mask = ix.col.required_identities[i];
+    if (!mask) return true;
+    return ix.header.required_identities.some((rid, b) => ((mask >>> b) & 1) &&
+      (userIds.includes(rid) || (rid === 'minority' && userIds.includes('person of color'))));
+  }
+
+  function match(ix, formData, options) {
+    options = options || {};
+    const p = profileFromForm(formData, options.rural);
+    const c = ix.col;
+    const now = options.now || new Date();
+    // Naive local wall clock in ms, the same frame as deadline_ms
+    const nowMs = now.getTime() - now.getTimezoneOffset() * 60000;
+    // One-time sources stay open through their deadline day (engine.is_expired)
+    const today = nowMs - (nowMs % DAY_MS);
+    const stateBit = ix.stateBit.get(p.state);
+    const inState = (i) => stateBit !== undefined &&
+      ((stateBit < 32 ? c.states_lo[i] >>> stateBit : c.states_hi[i] >>> (stateBit - 32)) & 1) === 1;
+    const knownState = ix.header.state_codes.includes(p.state);
+    const keywordIds = new Set();
+    extractKeywords(p.projectDescription.toLowerCase()).forEach((w) => {
+      const id = ix.keywordId.get(w);
+      if (id !== undefined) keywordIds.add(id);
+    });
+    const ctx = { inState, keywordIds };
+    const userIds = p.identity.map((x) => String(x).toLowerCase().trim());
+    const [umin, umax] = p.fundingNeeded;
+    const oneTime = ix.header.vocab.deadline_types.indexOf('one-time');
+    const matches = [];
+    for (let i = 0; i < ix.count; i++) {
+      // Same pruning as the catalog indexes: amount overlap, state, expiry
+      let lo = c.min_amount[i], hi = c.max_amount[i];
+      if (hi > 0) {
+        if (lo > hi) { const t = lo; lo = hi; hi = t; }
+        if (hi < umin || lo > umax) continue;
+      }
+      if (knownState && !has(ix, i, 'states_all') && !inState(i)) continue;
+      if (c.deadline_type[i] === oneTime && c.deadline_ms[i] >= 0 && c.deadline_ms[i] < today) continue;
+      if (!requiredOk(ix, i, userIds)) continue;
+
+      const eligibility = scoreEligibility(ix, i, p, ctx);
+      const success = scoreSuccess(ix, i, p);
+      const effort = scoreEffort(ix, i, p);
+      const timeline = scoreTimeline(ix, i, p, nowMs);
+      const fit = scoreFit(ix, i, p, ctx);
+      const overall = eligibility * 0.35 + success * 0.25 + fit * 0.20 + timeline * 0.10 + effort * 0.10;
+      if (overall < 15) continue;
+      matches.push({ i, overall, eligibility, success, fit });
+    }
+    matches.sort((a, b) => b.overall - a.overall);
+    const limit = options.limit || 50;
+    return matches.slice(0, limit).map((m) => ({
+      source: {
+        source_id: c.source_id[m.i],
+        source_name: ix.str('name', m.i),
+        provider_name: ix.str('provider', m.i),
+        source_type: ix.header.vocab.source_types[c.source_type[m.i]],
+        min_amount: c.min_amount[m.i],
+        max_amount: c.max_amount[m.i],
+        deadline: c.deadline_ms[m.i] >= 0 ? new Date(c.deadline_ms[m.i]).toISOString().slice(0, 19) : null,
+        deadline_type: ix.header.vocab.deadline_types[c.deadline_type[m.i]],
+        application_url: ix.str('url', m.i) || null,
+        requirements_text: ix.str('requirements', m.i),
+      },
+      overall_score: round1(m.overall),
+      eligibility_score: round1(m.eligibility),
+      success_probability: round1(m.success),
+      fit_score: round1(m.fit),
+      match_reasons: reasonsFor(ix, m.i, p, m.eligibility, m.success),
+      eligibility_gaps: gapsFor(ix, m.i, p),
+      competitive_advantages: advantagesFor(p),
+    }));
+  }
+
+  async function load(endpoint) {
+    const meta = await (await fetch(endpoint || '/api/catalog-index')).json();
+    if (!meta.ok) throw new Error(meta.error || 'catalog index unavailable');
+    // Fingerprinted URL: cached by the browser for a year, served gzip/brotli
+    const res = await fetch(meta.url);
+    if (!res.ok) throw new Error('catalog index unavailable');
+    const index = decode(await res.arrayBuffer());
+    if (index.header.catalog_version !== meta.catalog_version) throw new Error('catalog index is stale');
+    return index;
+  }
+
+  // Rural status of a ZIP from the server's RUCA table; null when unknown or unreachable
+  async function ruralForZip(zip, endpoint) {
+    zip = String(zip || '').trim().slice(0, 5);
+    if (!/^\d{5}$/.test(zip)) return null;
+    try {
+      const data = await (await fetch((endpoint || '/api/zip/') + zip)).json();
+      return typeof data.rural === 'boolean' ? data.rural : null;
+    } catch (err) {
+      return null;
+    }
+  }
+
+  const api = { load, decode, match, profileFromForm, ruralForZip };
+  if (typeof module !== 'undefined' && module.exports) module.exports = api;
+  else root.FundingCatalog = api;
+})(typeof window !== 'undefined' ? window : this);
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Hot catalog reload (blue/green).
+
+Changing sources used to mean deleting data/funding_finder.db and restarting.
+reload_catalog() instead:
+    1. builds a complete new catalog in a staged file next to the DB (a unique
+       <db>.*.next per reload) from schema.sql and the batch files, expired
+       sources already swept. One reload runs at a time per DB across processes
+       (an flock on <db>.reload.lock); a second waits, then builds its own.
+       Sources keep their live source_id: a staged source takes the id of the
+       live one it shares batch records with (same file, index and name), else
+       of a live one with the same name; only new sources get new ids. Sources
+       imported from SQL dumps (foreign_catalog.py) or partner feeds
+       (`python load_batches.py <db> feed.ndjson`, which reloads with feeds=) are
+       not in the batch files and are copied over with their provenance, unless
+       this build staged a file of the same name. A source whose row and
+       geography did not change keeps its updated_at, so other processes
+       re-read only what changed;
+    2. validates it (source count against the live catalog, names and providers
+       set, geography for every source, a smoke match through the engine) and
+       raises ReloadError, leaving the live catalog alone, if anything fails;
+    3. swaps it in: the catalog tables are replaced from the staged file in one
+       transaction, so readers see the old catalog or the new one, never a mix.
+       The live DB is in WAL mode, so readers keep reading the old catalog during
+       the copy; other writers (cursors, sessions, jobs) wait for it. Users, jobs
+       and reports share the DB file and are not touched;
+    4. hands the snapshot it validated to this process's catalog, so no request
+       here rebuilds it. Other processes rebuild in their watcher thread.
+
+Requests already running hold the snapshot they started with and finish on it.
+
+Triggers: POST /api/admin/reload (header X-Admin-Token = $ADMIN_TOKEN), the
+load_batches job with {"reload": true}, a change to the batch files (the
+watcher compares their names, sizes and mtimes with the last build every
+CATALOG_WATCH_INTERVAL seconds), or
+    python catalog_reload.py [path/to/funding_finder.db] [--force]
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from catalog import build_snapshot, install_catalog, prewarm_catalog
+from deadlines import DEADLINE_DDL, materialize_upcoming, sweep_expired
+from engine import FundingMatchEngine, UserProfile
+from load_batches import (GEOGRAPHY_DDL, PROVENANCE_DDL, SOURCE_COLUMNS, Progress, batch_candidates,
+                          find_batch_files, load_all_batches)
+from migrations import analyze, migrate
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Replaced as a unit by the swap; everything else in the DB file is left alone
+CATALOG_TABLES = ('funding_sources', 'source_geography', 'source_provenance', 'upcoming_deadlines')
+# A staged catalog with fewer active sources than this share of the live one needs force=True
+MIN_KEEP = float(os.environ.get("RELOAD_MIN_KEEP", 0.9))
+# Provenance from outside the batch files (batch_candidates' names): SQL dumps and partner feeds
+IMPORTED_PROVENANCE = ("NOT (batch_file GLOB 'batch_*.json' OR batch_file GLOB 'BATCH_*_SOURCES.json'"
+                       " OR batch_file = 'FIRST_100_SOURCES.json')")
+
+# Same definition as schema.sql; repeated here so DBs created before it existed pick it up
+BUILDS_DDL = """
+CREATE TABLE IF NOT EXISTS catalog_builds (
+    build_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fingerprint TEXT NOT NULL,
+    sources INTEGER,
+    checks TEXT,
+    built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+
+class ReloadError(RuntimeError):
+    """The staged catalog failed validation; the live catalog was not changed."""
+
+    def __init__(self, message: str, checks: Dict[str, int]):
+        super().__init__(message)
+        self.checks = checks
+
+
+def batch_fingerprint() -> str:
+    """Names, sizes and mtimes of the batch files (stat only, cheap enough to poll)."""
+    digest = hashlib.sha1()
+    for p in batch_candidates():
+        st = p.stat()
+        digest.update(f"{p.name}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return digest.hexdigest()[:16]
+
+
+# =============================================================================
+# BUILD, VALIDATE, SWAP
+# =============================================================================
+
+def _columns(conn: sqlite3.Connection, schema: str, table: str) -> List[str]:
+    return [r[1] for r in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _id_map(conn: sqlite3.Connection) -> Dict[int, int]:
+    """Staged source_id -> the live source_id of the same source (staged DB as main, live as 'live')."""
+    mapping: Dict[int, int] = {}
+    taken = set()
+    # Shared batch records first, the live source sharing the most of them wins
+    pairs = conn.execute("""
+        SELECT s.source_id, l.source_id, count(*) AS n
+        FROM main.source_provenance s
+        JOIN live.source_provenance l
+          ON l.batch_file = s.batch_file AND l.record_index = s.record_index
+         AND lower(trim(l.source_name)) IS lower(trim(s.source_name))
+        GROUP BY s.source_id, l.source_id
+        ORDER BY n DESC, s.source_id, l.source_id
+    """)
+    for sid, lid, _ in pairs:
+        if sid not in mapping and lid not in taken:
+            mapping[sid] = lid
+            taken.add(lid)
+    # Then the name, as foreign_catalog.py matches imported rows
+    by_name: Dict[str, List[int]] = {}
+    for lid, name in conn.execute("SELECT source_id, source_name FROM live.funding_sources ORDER BY source_id"):
+        if lid not in taken:
+            by_name.setdefault((name or '').strip().lower(), []).append(lid)
+    for sid, name in conn.execute("SELECT source_id, source_name FROM main.funding_sources ORDER BY source_id"):
+        ids = by_name.get((name or '').strip().lower())
+        if sid not in mapping and ids:
+            mapping[sid] = ids.pop(0)
+    return mapping
+
+
+def _keep_live_ids(conn: sqlite3.Connection) -> Dict[str, int]:
+    """
+    Renumber the staged sources to their live ids (new ones after the live maximum), then
+    copy the live sources imported from SQL dumps or feeds that no staged source took
+    over, and that imported provenance for every source kept. Files staged in this
+    build replace their live provenance instead. Returns counts.
+    """
+    mapping = _id_map(conn)
+    top = conn.execute("""
+        SELECT max(coalesce((SELECT max(source_id) FROM live.funding_sources), 0),
+                   coalesce((SELECT seq FROM live.sqlite_sequence WHERE name = 'funding_sources'), 0))
+    """).fetchone()[0]
+    staged = [sid for (sid,) in conn.execute("SELECT source_id FROM main.funding_sources ORDER BY source_id")]
+    new_ids = {}
+    for sid in staged:
+        if sid in mapping:
+            new_ids[sid] = mapping[sid]
+        else:
+            top += 1
+            new_ids[sid] = top
+    conn.execute("CREATE TEMP TABLE id_map (old INTEGER PRIMARY KEY, new INTEGER NOT NULL)")
+    conn.executemany("INSERT INTO temp.id_map VALUES (?, ?)", new_ids.items())
+    for table in ('funding_sources', 'source_geography', 'source_provenance'):
+        # Through negative ids, so no row takes an id another still holds
+        conn.execute(f"UPDATE main.{table} SET source_id = -source_id")
+        conn.execute(f"UPDATE main.{table} SET source_id = (SELECT new FROM temp.id_map WHERE old = -source_id)")
+    conn.execute("DROP TABLE temp.id_map")
+
+    kept = set(new_ids.values())
+    conn.execute("CREATE TEMP TABLE staged_files AS SELECT DISTINCT batch_file FROM main.source_provenance")
+    imported = f"{IMPORTED_PROVENANCE} AND batch_file NOT IN (SELECT batch_file FROM temp.staged_files)"
+    carried = [lid for (lid,) in conn.execute(f"""
+        SELECT DISTINCT source_id FROM live.source_provenance WHERE {imported} ORDER BY source_id
+    """) if lid not in kept]
+    conn.execute("CREATE TEMP TABLE carried (source_id INTEGER PRIMARY KEY)")
+    conn.executemany("INSERT INTO temp.carried VALUES (?)", ((lid,) for lid in carried))
+    live_cols = set(_columns(conn, 'live', 'funding_sources'))
+    cols = ', '.join(c for c in _columns(conn, 'main', 'funding_sources') if c in live_cols)
+    conn.execute(f"""
+        INSERT INTO main.funding_sources ({cols})
+        SELECT {cols} FROM live.funding_sources WHERE source_id IN (SELECT source_id FROM temp.carried)
+    """)
+    conn.execute("""
+        INSERT INTO main.source_geography (source_id, geo_key)
+        SELECT source_id, geo_key FROM live.source_geography
+        WHERE source_id IN (SELECT source_id FROM temp.carried)
+    """)
+    conn.execute("DROP TABLE temp.carried")
+    conn.execute(f"""
+        INSERT INTO main.source_provenance
+            (source_id, batch_file, record_index, source_name, provider_name, application_url, similarity)
+        SELECT source_id, batch_file, record_index, source_name, provider_name, application_url, similarity
+        FROM live.source_provenance
+        WHERE {imported} AND source_id IN (SELECT source_id FROM main.funding_sources)
+    """)
+    conn.execute("DROP TABLE temp.staged_files")
+    return {"kept_ids": len(mapping), "new_ids": len(staged) - len(mapping), "carried": len(carried)}
+
+
+def _keep_stamps(conn: sqlite3.Connection) -> None:
+    """Live created_at for every kept source; live updated_at when its row and geography are unchanged."""
+    live_cols = set(_columns(conn, 'live', 'funding_sources'))
+    same = ' AND '.join(f"f.{c} IS l.{c}" for c in SOURCE_COLUMNS if c in live_cols)
+    geo = ("(SELECT group_concat(geo_key) FROM (SELECT geo_key FROM {0}.source_geography "
+           "WHERE source_id = f.source_id ORDER BY geo_key))")
+    conn.execute(f"""
+        UPDATE main.funding_sources AS f
+        SET created_at = l.created_at,
+            updated_at = CASE WHEN {same} AND {geo.format('main')} IS {geo.format('live')}
+                              THEN l.updated_at ELSE f.updated_at END
+        FROM live.funding_sources AS l
+        WHERE l.source_id = f.source_id
+    """)
+
+
+def _has_catalog(db_path: Optional[str]) -> bool:
+    if not db_path or not os.path.exists(db_path):
+        return False
+    conn = sqlite3.connect(db_path)
+    try:
+        names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    finally:
+        conn.close()
+    return {'funding_sources', 'source_provenance', 'source_geography'} <= names
+
+
+def build_staging(staging_path: str, now: Optional[datetime] = None,
+                  live_path: Optional[str] = None, feeds: Sequence[Path] = (),
+                  progress: Optional[Progress] = None) -> Dict[str, int]:
+    """
+    A new database at staging_path: schema.sql, every batch file and feeds, expired
+    sources swept. With live_path, sources keep their live ids and dump- or
+    feed-imported sources are copied over. Returns {"loaded"} plus _keep_live_ids's counts.
+    """
+    _remove(staging_path)  # mkstemp's empty placeholder
+    conn = sqlite3.connect(staging_path)
+    try:
+        conn.executescript((BASE_DIR / 'schema.sql').read_text())
+        conn.commit()
+    finally:
+        conn.close()
+    loaded = load_all_batches(staging_path, find_batch_files() + [Path(p) for p in feeds], progress)
+    now = now or datetime.now()
+    live = _has_catalog(live_path)
+    counts = {"loaded": loaded}
+    conn = sqlite3.connect(staging_path)
+    try:
+        if live:
+            conn.execute("ATTACH DATABASE ? AS live", (live_path,))
+            counts.update(_keep_live_ids(conn))
+        conn.executescript(DEADLINE_DDL)
+        sweep_expired(conn, now)
+        materialize_upcoming(conn, now)
+        if live:
+            _keep_stamps(conn)
+        conn.commit()
+        if live:
+            conn.execute("DETACH DATABASE live")
+    finally:
+        conn.close()
+    return counts
+
+
+def _smoke_profile() -> UserProfile:
+    # A broad profile (same as test_database.py) every sane catalog has matches for
+    return UserProfile(
+        0, 0,
+        {"city": "Nashville", "state": "TN", "zip": "37201"},
+        35, "business", "tech", "AI tools for underserved communities",
+        "I've been planning this for a while", (10000, 50000),
+        "Some college", 2, [], "Under 50K", "Under 650",
+        ["Woman", "Veteran"], "", "Poverty", "", "",
+        {"rural_status": True}, {}, ["Community focus"],
+        "Within 6 months", "10-20 hrs/week",
+    )
+
+
+def _count(db_path: str, sql: str) -> int:
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql).fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0  # live DB without a catalog yet
+    finally:
+        conn.close()
+
+
+def validate(staging_path: str, live_path: str, snapshot, force: bool = False) -> Dict[str, int]:
+    """Sanity checks on the staged catalog. Returns them, or raises ReloadError listing failures."""
+    active = "SELECT count(*) FROM funding_sources WHERE active = 1"
+    engine = FundingMatchEngine(staging_path, catalog=snapshot)
+    try:
+        matches = len(engine.rank_ids(_smoke_profile()))
+    finally:
+        engine.close()
+    checks = {
+        "sources": _count(staging_path, active),
+        "live_sources": _count(live_path, active),
+        "unnamed": _count(staging_path, """
+            SELECT count(*) FROM funding_sources
+            WHERE trim(coalesce(source_name, '')) = '' OR trim(coalesce(provider_name, '')) = ''
+        """),
+        "without_geography": _count(staging_path, """
+            SELECT count(*) FROM funding_sources f
+            WHERE NOT EXISTS (SELECT 1 FROM source_geography g WHERE g.source_id = f.source_id)
+        """),
+        "snapshot_sources": len(snapshot),
+        "smoke_matches": matches,
+    }
+    failures: List[str] = []
+    if checks["sources"] == 0:
+        failures.append("staged catalog is empty")
+    elif checks["sources"] < checks["live_sources"] * MIN_KEEP and not force:
+        failures.append(f"staged catalog has {checks['sources']} active sources, live has "
+                        f"{checks['live_sources']} (below {MIN_KEEP:.0%}; reload with force to accept)")
+    if checks["unnamed"]:
+        failures.append(f"{checks['unnamed']} sources without a name or provider")
+    if checks["without_geography"]:
+        failures.append(f"{checks['without_geography']} sources without geography keys")
+    if checks["snapshot_sources"] != checks["sources"]:
+        failures.append("snapshot does not match the staged rows")
+    if checks["sources"] and not matches:
+        failures.append("smoke match returned nothing")
+    if failures:
+        raise ReloadError("; ".join(failures), checks)
+    return checks
+
+
+def swap_catalog(db_path: str, staging_path: str, fingerprint: str, checks: Dict[str, int]) -> None:
+    """Replace the live catalog tables with the staged ones in one transaction."""
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")  # readers keep the old catalog while this copies
+        migrate(conn)  # generated columns are not copied; the live table computes its own
+        conn.executescript(GEOGRAPHY_DDL)
+        conn.executescript(PROVENANCE_DDL)
+        conn.executescript(DEADLINE_DDL)
+        conn.executescript(BUILDS_DDL)
+        conn.execute("ATTACH DATABASE ? AS staged", (staging_path,))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table in reversed(CATALOG_TABLES):
+                conn.execute(f"DELETE FROM main.{table}")
+            for table in CATALOG_TABLES:
+                # Columns both sides have: a live DB from an older schema.sql keeps its layout
+                live = set(_columns(conn, 'main', table))
+                cols = ', '.join(c for c in _columns(conn, 'staged', table) if c in live)
+                conn.execute(f"INSERT INTO main.{table} ({cols}) SELECT {cols} FROM staged.{table}")
+            conn.execute(
+                "INSERT INTO catalog_builds (fingerprint, sources, checks) VALUES (?, ?, ?)",
+                (fingerprint, checks["sources"], json.dumps(checks)),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("DETACH DATABASE staged")
+        analyze(conn)
+    finally:
+        conn.close()
+
+
+def _remove(path: str) -> None:
+    for p in (path, path + '-journal', path + '-wal', path + '-shm'):
+        if os.path.exists(p):
+            os.unlink(p)
+
+
+@contextmanager
+def _reload_lock(db_path: str):
+    """One reload at a time per DB, across threads and processes (flock)."""
+    with open(str(db_path) + '.reload.lock', 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def reload_catalog(db_path: str, force: bool = False, feeds: Sequence[Path] = (),
+                   progress: Optional[Progress] = None) -> dict:
+    """
+    Build, validate and swap in a new catalog from the batch files and feeds (see the
+    module docstring); progress as in load_batches.load_all_batches.
+    """
+    with _reload_lock(db_path):
+        started = time.perf_counter()
+        # A unique staging file next to the DB (same disk, so the ATTACH copy is local)
+        fd, staging = tempfile.mkstemp(prefix=os.path.basename(db_path) + '.', suffix='.next',
+                                       dir=os.path.dirname(os.path.abspath(db_path)))
+        os.close(fd)
+        fingerprint = batch_fingerprint()
+        try:
+            staged = build_staging(staging, live_path=db_path, feeds=feeds, progress=progress)
+            snapshot = build_snapshot(staging)
+            checks = validate(staging, db_path, snapshot, force)
+            swap_catalog(db_path, staging, fingerprint, checks)
+        finally:
+            _remove(staging)
+        # Same rows and updated_at stamps as the live tables now hold
+        install_catalog(db_path, snapshot)
+        return {"loaded": staged.pop("loaded"), "ids": staged, "fingerprint": fingerprint, "checks": checks,
+                "seconds": round(time.perf_counter() - started, 2)}
+
+
+# =============================================================================
+# WATCHER
+# =============================================================================
+
+def check_batch_files(db_path: str) -> Optional[int]:
+    """
+    Queue a reload when the batch files differ from the last build's. Returns the job id.
+    Each fingerprint is queued once, so a set of files that fails validation is not
+    retried until the files change again.
+    """
+    from jobs import enqueue
+    fingerprint = batch_fingerprint()
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.executescript(BUILDS_DDL)
+        last = conn.execute("SELECT fingerprint FROM catalog_builds ORDER BY build_id DESC LIMIT 1").fetchone()
+        if last is None:
+            # Seeded at startup (app._ensure_db / start.sh) from the files as they are now
+            conn.execute("""
+                INSERT INTO catalog_builds (fingerprint, sources)
+                SELECT ?, count(*) FROM funding_sources WHERE active = 1
+            """, (fingerprint,))
+            conn.commit()
+            return None
+        if last[0] == fingerprint:
+            return None
+    finally:
+        conn.close()
+    # Every worker's watcher sees the change; the key lets exactly one of them queue it
+    return enqueue(db_path, 'load_batches', {"reload": True, "fingerprint": fingerprint},
+                   max_attempts=1, key=f"reload:{fingerprint}")
+
+
+_watcher_started = set()
+_watcher_lock = threading.Lock()
+
+
+def start_watcher(db_path: str, interval_seconds: float = 5.0, watch_files: bool = True) -> None:
+    """
+    Start the catalog watcher for db_path once per process (daemon thread). Each tick it
+    rebuilds this process's snapshot if another process changed the catalog (requests
+    keep the old one meanwhile) and, with watch_files, queues a reload when batch files change.
+    """
+    with _watcher_lock:
+        if db_path in _watcher_started:
+            return
+        _watcher_started.add(db_path)
+
+    def loop():
+        while True:
+            try:
+                prewarm_catalog(db_path)
+                if watch_files:
+                    check_batch_files(db_path)
+            except Exception:
+                pass  # next tick retries; never take the web worker down
+            time.sleep(interval_seconds)
+
+    threading.Thread(target=loop, name="catalog-watcher", daemon=True).start()
+
+
+if __name__ == '__main__':
+    import sys
+    args = [a for a in sys.argv[1:] if a != '--force']
+    db_path = args[0] if args else str(BASE_DIR / 'data' / 'funding_finder.db')
+    try:
+        result = reload_catalog(db_path, force='--force' in sys.argv)
+    except ReloadError as e:
+        sys.exit(f"reload rejected, live catalog unchanged: {e}")
+    print(f"swapped in {result['checks']['sources']} sources "
+          f"(was {result['checks']['live_sources']}) in {result['seconds']}s")
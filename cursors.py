@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Result cursors for paginated /api/match.
+
+The first page of a match run ranks the catalog once; the full ranked list of
+viable source ids is stored under an opaque token tied to the catalog version. Later
+pages slice the stored list and re-score only the sources on that page with the same
+profile and the same "now", so page 2 is consistent with page 1 and costs a lookup
+instead of another full engine pass.
+
+Runs are kept in the app's SQLite database (match_runs) so a later page can reach
+any gunicorn worker; each process also keeps the runs it touched in a small LRU.
+Rows older than the TTL are deleted as new runs are stored.
+"""
+
+import json
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from engine import UserProfile
+from job_handlers import profile_from_json, profile_to_json
+
+# Same definition as schema.sql; repeated here so DBs created before it existed pick it up
+RUNS_DDL = """
+CREATE TABLE IF NOT EXISTS match_runs (
+    token TEXT PRIMARY KEY,
+    catalog_version TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    now TIMESTAMP NOT NULL,
+    source_ids TEXT NOT NULL,
+    lane TEXT,
+    total INTEGER,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_match_runs_created ON match_runs(created);
+"""
+
+
+@dataclass
+class RankedRun:
+    """One stored match run."""
+    catalog_version: str
+    profile: UserProfile
+    now: datetime
+    source_ids: List[int]
+    created: float
+    lane: str = 'free'  # admission lane (admission.py); later pages queue in the same one
+    total: int = 0      # viable matches, len(source_ids)
+
+
+class CursorStore:
+    """
+    Ranked runs in db_path's match_runs table, with a thread-safe LRU of this
+    process's recent runs in front; entries expire after ttl seconds. Without a
+    db_path the LRU is the only copy (single-process use).
+    """
+
+    def __init__(self, db_path: Optional[str] = None, ttl: float = 900.0, max_entries: int = 2000):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._runs: "OrderedDict[str, RankedRun]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        if not self._ready:
+            # Once per store; IF NOT EXISTS makes a repeat from a racing thread harmless
+            conn.executescript(RUNS_DDL)
+            self._ready = True
+        return conn
+
+    def _remember(self, token: str, run: RankedRun) -> None:
+        with self._lock:
+            self._runs[token] = run
+            self._runs.move_to_end(token)
+            while len(self._runs) > self.max_entries:
+                self._runs.popitem(last=False)
+
+    def put(self, run: RankedRun) -> str:
+        token = secrets.token_urlsafe(12)
+        if self.db_path:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM match_runs WHERE created < ?", (time.time() - self.ttl,))
+                conn.execute("""
+                    INSERT INTO match_runs (token, catalog_version, profile, now, source_ids, lane, total, created)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (token, run.catalog_version, json.dumps(profile_to_json(run.profile)),
+                      run.now.isoformat(), json.dumps(run.source_ids), run.lane, run.total, run.created))
+                conn.commit()
+            finally:
+                conn.close()
+        self._remember(token, run)
+        return token
+
+    def get(self, token: str) -> Optional[RankedRun]:
+        with self._lock:
+            run = self._runs.get(token)
+            if run is not None:
+                self._runs.move_to_end(token)
+        if run is None:
+            run = self._load(token)
+            if run is None:
+                return None
+            self._remember(token, run)
+        if time.time() - run.created > self.ttl:
+            with self._lock:
+                self._runs.pop(token, None)
+            return None
+        return run
+
+    def _load(self, token: str) -> Optional[RankedRun]:
+        """A run stored by another process; None if there is none."""
+        if not self.db_path:
+            return None
+        conn = self._connect()
+        try:
+            row = conn.execute("""
+                SELECT catalog_version, profile, now, source_ids, lane, total, created
+                FROM match_runs WHERE token = ?
+            """, (token,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        version, profile, now, source_ids, lane, total, created = row
+        return RankedRun(
+            catalog_version=version,
+            profile=profile_from_json(json.loads(profile)),
+            now=datetime.fromisoformat(now),
+            source_ids=json.loads(source_ids),
+            created=created,
+            lane=lane or 'free',
+            total=total or 0,
+        )
+
+
+def encode_cursor(token: str, offset: int) -> str:
+    return f"{token}.{offset}"
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """(token, offset); raises ValueError for a malformed cursor."""
+    token, sep, offset = (cursor or '').rpartition('.')
+    if not sep or not token:
+        raise ValueError("malformed cursor")
+    return token, max(0, int(offset))
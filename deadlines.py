@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Deadline sweeper: deactivates expired one-time funding sources and materializes
+the upcoming-deadlines list so listings never recompute julianday per row.
+
+Deadlines are dates: a source stays open through its deadline day and expires the
+day after. The web app queues one deadline_sweep job (job_handlers.py) per
+DEADLINE_SWEEP_INTERVAL seconds (default hourly); every gunicorn worker tries, the
+job's dedupe key lets one through, and the job worker runs it. Or once from the
+command line:
+    python deadlines.py [path/to/funding_finder.db]
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from catalog import refresh_catalog
+from jobs import PRIORITY_LOW, enqueue
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Same definitions as schema.sql; repeated here so DBs created before they existed pick them up
+DEADLINE_DDL = """
+CREATE INDEX IF NOT EXISTS idx_funding_sources_active_deadline
+    ON funding_sources(application_deadline)
+    WHERE active = 1 AND application_deadline IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS upcoming_deadlines (
+    source_id INTEGER PRIMARY KEY,
+    source_name TEXT,
+    provider_name TEXT,
+    application_deadline DATE NOT NULL,
+    min_amount REAL,
+    max_amount REAL,
+    application_url TEXT,
+    refreshed_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_upcoming_deadlines_deadline
+    ON upcoming_deadlines(application_deadline);
+"""
+
+
+def _stamp(now: datetime) -> str:
+    return now.isoformat(sep=' ', timespec='seconds')
+
+
+def _today(now: datetime) -> str:
+    # application_deadline is a date ('2026-03-01'); compared as date(), a timestamp one still works
+    return now.date().isoformat()
+
+
+def sweep_expired(conn: sqlite3.Connection, now: datetime) -> int:
+    """Deactivate one-time sources whose deadline day is over. Returns rows changed."""
+    cur = conn.execute("""
+        UPDATE funding_sources
+        SET active = 0, updated_at = CURRENT_TIMESTAMP
+        WHERE active = 1
+          AND application_deadline IS NOT NULL
+          AND date(application_deadline) < ?
+          AND deadline_type = 'one-time'
+    """, (_today(now),))
+    return cur.rowcount
+
+
+def materialize_upcoming(conn: sqlite3.Connection, now: datetime) -> int:
+    """Rebuild upcoming_deadlines from active sources with a future deadline. Returns row count."""
+    conn.execute("DELETE FROM upcoming_deadlines")
+    cur = conn.execute("""
+        INSERT INTO upcoming_deadlines (
+            source_id, source_name, provider_name, application_deadline,
+            min_amount, max_amount, application_url, refreshed_at
+        )
+        SELECT source_id, source_name, provider_name, application_deadline,
+               min_amount, max_amount, COALESCE(application_url, source_url), ?
+        FROM funding_sources
+        WHERE active = 1
+          AND application_deadline IS NOT NULL
+          AND date(application_deadline) >= ?
+    """, (_stamp(now), _today(now)))
+    return cur.rowcount
+
+
+def run_sweep(db_path: str, now: Optional[datetime] = None) -> dict:
+    """Sweep expired sources, rebuild the upcoming list, then refresh the catalog snapshot."""
+    now = now or datetime.now()
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executescript(DEADLINE_DDL)
+        deactivated = sweep_expired(conn, now)
+        upcoming = materialize_upcoming(conn, now)
+        conn.commit()
+    finally:
+        conn.close()
+    # Only the deactivated rows changed, so this re-reads nothing else
+    refresh_catalog(db_path)
+    return {"deactivated": deactivated, "upcoming": upcoming}
+
+
+def list_upcoming(db_path: str, limit: int = 50, now: Optional[datetime] = None) -> List[dict]:
+    """Read the materialized list, soonest first, with days_remaining computed from one now."""
+    now = now or datetime.now()
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute("""
+            SELECT * FROM upcoming_deadlines
+            WHERE application_deadline >= ?
+            ORDER BY application_deadline ASC
+            LIMIT ?
+        """, (_today(now), limit)).fetchall()
+    except sqlite3.OperationalError:
+        return []  # sweeper has not run against this DB yet
+    finally:
+        conn.close()
+    out = []
+    for r in rows:
+        item = dict(r)
+        item["days_remaining"] = (datetime.fromisoformat(r["application_deadline"]).date() - now.date()).days
+        out.append(item)
+    return out
+
+
+_sweeper_started = set()
+_sweeper_lock = threading.Lock()
+
+
+def schedule_sweep(db_path: str, interval_seconds: float = 3600.0, now: Optional[float] = None) -> Optional[int]:
+    """Queue this interval's deadline_sweep job; None if a process already queued it."""
+    slot = int((time.time() if now is None else now) // interval_seconds)
+    return enqueue(db_path, 'deadline_sweep', {}, priority=PRIORITY_LOW,
+                   key=f"deadline_sweep:{int(interval_seconds)}:{slot}")
+
+
+def start_sweeper(db_path: str, interval_seconds: float = 3600.0) -> None:
+    """Start the thread that schedules sweeps for db_path, once per process (daemon thread)."""
+    with _sweeper_lock:
+        if db_path in _sweeper_started:
+            return
+        _sweeper_started.add(db_path)
+
+    def loop():
+        while True:
+            try:
+                schedule_sweep(db_path, interval_seconds)
+            except Exception:
+                pass  # next tick retries; never take the web worker down
+            # Wake at the start of the next slot, not interval_seconds after this process started
+            time.sleep(interval_seconds - time.time() % interval_seconds + 1)
+
+    threading.Thread(target=loop, name="deadline-sweeper", daemon=True).start()
+
+
+if __name__ == '__main__':
+    import sys
+    db_path = sys.argv[1] if len(sys.argv) > 1 else str(BASE_DIR / 'data' / 'funding_finder.db')
+    result = run_sweep(db_path)
+    print(f"Deactivated {result['deactivated']} expired sources; {result['upcoming']} upcoming deadlines.")
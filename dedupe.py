@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate detection for batch records at ingestion.
+
+The batch files overlap: the same program shows up under its own provider in one
+batch and under a placeholder ("Corporate Foundation", "Regional Foundation") in
+another, or as "Amber Grant for Women" next to "Amber Grant for Women
+Entrepreneurs". load_batches.py clusters rows before inserting and keeps one
+canonical row per cluster; every input record is kept in source_provenance.
+
+Candidates come from MinHash signatures over each row's normalized name tokens,
+bucketed by LSH bands, plus rows sharing a URL that few others use; only rows in
+a common bucket are compared. A candidate pair is a duplicate when:
+    - the name token sets are equal (state names folded to codes, plurals and
+      filler words dropped) and the two rows share a web domain or a specific
+      provider word, or one provider is only a placeholder;
+    - the name token sets are at least SIMILAR alike (Jaccard, what the MinHash
+      estimates), the rows share a web domain or a specific provider word and the
+      names do not name different states: a reworded name at the same provider; or
+    - one name's tokens are a leading prefix of the other's and both rows have
+      the same URL, which few other rows use (not a generic landing page).
+"""
+
+import hashlib
+import re
+import struct
+from array import array
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from geo import ALL_KEY, STATE_NAMES, eligible_states_value
+
+NUM_PERM = 64
+BANDS = 16                      # 16 bands x 4 rows: names at Jaccard 0.8 collide ~99.9% of the time, 0.3 ~12%
+ROWS = NUM_PERM // BANDS
+MAX_URL_SHARE = 3               # a URL used by more rows than this is a landing page, not a program
+SIMILAR = 0.8                   # name Jaccard at which the same provider's rows are one program
+_PERM = struct.Struct(f'<{NUM_PERM}I')
+_BAND = struct.Struct(f'<{ROWS + 1}I')   # band number, then its rows of the signature
+
+# Words that do not tell two programs apart
+NAME_FILLER = frozenset((
+    'a', 'an', 'and', 'by', 'for', 'fund', 'funding', 'grant', 'in', 'of', 'on', 'program',
+    'the', 'to', 'with',
+))
+# Provider words that do not identify an organization
+PROVIDER_FILLER = frozenset((
+    'and', 'association', 'community', 'corporate', 'department', 'federal', 'foundation',
+    'government', 'industry', 'local', 'national', 'of', 'office', 'organization', 'private',
+    'program', 'regional', 'religious', 'state', 'the', 'u', 's', 'us', 'various',
+))
+# State names fold to their code, except where the code is a filler word ('in': Indiana)
+_STATE_CODES = {name.replace('_', ' '): code.lower() if code.lower() not in NAME_FILLER else name.replace('_', '')
+                for name, code in STATE_NAMES.items()}
+_STATE_RE = re.compile(r'\b(' + '|'.join(sorted(_STATE_CODES, key=len, reverse=True)) + r')\b')
+_STATE_TOKENS = frozenset(_STATE_CODES.values())
+
+
+# =============================================================================
+# NORMALIZATION
+# =============================================================================
+
+def _words(text: str) -> List[str]:
+    return re.findall(r'[a-z0-9]+', (text or '').lower().replace('&', ' and '))
+
+
+def name_tokens(name: str) -> Tuple[str, ...]:
+    """Ordered distinctive words of a program name ('Michigan ... Grants' -> ('mi', ...))."""
+    text = (name or '').lower().replace('&', ' and ')
+    text = _STATE_RE.sub(lambda m: _STATE_CODES[m.group(1)], text)
+    out: List[str] = []
+    for w in re.findall(r'[a-z0-9]+', text):
+        if len(w) > 3 and w.endswith('s') and not w.endswith('ss'):
+            w = w[:-1]
+        if w not in NAME_FILLER and w not in out:
+            out.append(w)
+    return tuple(out)
+
+
+def normalize_url(url: Optional[str]) -> str:
+    """Scheme, www., query, fragment and trailing slash removed; '' when missing."""
+    u = (url or '').strip().lower().split('://')[-1].split('#')[0].split('?')[0].rstrip('/')
+    return u[4:] if u.startswith('www.') else u
+
+
+def url_domain(url: str) -> str:
+    """Last two host labels of a normalized URL ('sbir.nasa.gov/x' -> 'nasa.gov')."""
+    host = url.split('/')[0]
+    return '.'.join(host.split('.')[-2:]) if host else ''
+
+
+def provider_words(provider: Optional[str]) -> FrozenSet[str]:
+    return frozenset(w for w in _words(provider) if w not in PROVIDER_FILLER)
+
+
+# =============================================================================
+# MATCH KEYS AND MINHASH / LSH
+# =============================================================================
+
+class MatchKey:
+    """The parts of a row duplicate detection looks at. Stored per staged row by load_batches."""
+    __slots__ = ('tokens', 'shingles', 'url', 'domain', 'provider', 'placeholder')
+
+    def __init__(self, tokens: Tuple[str, ...], url: str, provider: FrozenSet[str]):
+        self.tokens = tokens
+        self.url = url
+        self.domain = url_domain(url)
+        self.shingles = frozenset(tokens)
+        self.provider = provider
+        self.placeholder = not provider
+
+    @classmethod
+    def from_row(cls, row: dict) -> 'MatchKey':
+        return cls(name_tokens(row.get('source_name')), normalize_url(row.get('application_url')),
+                   provider_words(row.get('provider_name')))
+
+    @classmethod
+    def from_columns(cls, tokens: str, url: str, provider: str) -> 'MatchKey':
+        return cls(tuple(tokens.split()), url, frozenset(provider.split()))
+
+    def columns(self) -> Tuple[str, str, str]:
+        """(tokens, url, provider) as text, the inverse of from_columns."""
+        return ' '.join(self.tokens), self.url, ' '.join(sorted(self.provider))
+
+
+def _shingle_hashes(shingle: str) -> Tuple[int, ...]:
+    # NUM_PERM independent 32-bit hashes from one digest (little-endian: the same on every platform)
+    return _PERM.unpack(hashlib.shake_128(shingle.encode('utf-8')).digest(4 * NUM_PERM))
+
+
+def minhash(shingles: Iterable[str]) -> List[int]:
+    sig: List[int] = [0xFFFFFFFF] * NUM_PERM
+    for s in shingles:
+        sig = list(map(min, sig, _shingle_hashes(s)))
+    return sig
+
+
+def band_keys(key: MatchKey) -> List[int]:
+    """
+    One signed 64-bit bucket per LSH band; rows sharing any bucket are candidates.
+    A fixed hash of the band (not hash()), so buckets agree across processes.
+    """
+    sig = minhash(key.shingles)
+    return [int.from_bytes(hashlib.blake2b(_BAND.pack(band, *sig[band * ROWS:(band + 1) * ROWS]),
+                                           digest_size=8).digest(), 'little', signed=True)
+            for band in range(BANDS)]
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def is_duplicate(a: MatchKey, b: MatchKey, url_share: int = 0) -> bool:
+    """url_share: how many rows use a's URL (only consulted when a and b share it)."""
+    if not a.tokens or not b.tokens:
+        return False
+    same_provider = bool((a.domain and a.domain == b.domain) or (a.provider & b.provider))
+    if a.shingles == b.shingles:
+        return same_provider or a.placeholder or b.placeholder
+    if same_provider and jaccard(a.shingles, b.shingles) >= SIMILAR:
+        # One program per state is common ("Ohio ... Tax Credit", "Iowa ... Tax Credit")
+        states_a, states_b = a.shingles & _STATE_TOKENS, b.shingles & _STATE_TOKENS
+        if not (states_a and states_b and states_a != states_b):
+            return True
+    short, long_ = (a, b) if len(a.tokens) < len(b.tokens) else (b, a)
+    return bool(
+        a.url and a.url == b.url
+        and url_share <= MAX_URL_SHARE
+        and long_.tokens[:len(short.tokens)] == short.tokens
+    )
+
+
+# =============================================================================
+# CLUSTERING AND MERGE
+# =============================================================================
+
+class UnionFind:
+    """Clusters over 0..n-1; the smallest index leads each cluster."""
+
+    def __init__(self, n: int = 0):
+        self.parent = array('q', range(n))
+
+    def find(self, i: int) -> int:
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i: int, j: int) -> None:
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+
+def cluster(rows: Iterable[dict]) -> List[List[int]]:
+    """
+    Groups of row indexes that describe the same program (singletons included), in
+    input order. In memory; load_batches runs the same steps over staged rows in SQLite.
+    """
+    keys = [MatchKey.from_row(r) for r in rows]
+    url_counts: Dict[str, int] = {}
+    for key in keys:
+        if key.url:
+            url_counts[key.url] = url_counts.get(key.url, 0) + 1
+
+    buckets: Dict[object, List[int]] = {}
+    for i, key in enumerate(keys):
+        for bucket in band_keys(key):
+            buckets.setdefault(bucket, []).append(i)
+        if key.url and url_counts[key.url] <= MAX_URL_SHARE:
+            buckets.setdefault(key.url, []).append(i)
+    uf = UnionFind(len(keys))
+    checked = set()
+    for members in buckets.values():
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                i, j = members[x], members[y]
+                if (i, j) not in checked:
+                    checked.add((i, j))
+                    if is_duplicate(keys[i], keys[j], url_counts.get(keys[i].url, 0)):
+                        uf.union(i, j)
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(keys)):
+        groups.setdefault(uf.find(i), []).append(i)
+    return sorted(groups.values(), key=lambda g: g[0])
+
+
+def similarity(a: dict, b: dict) -> float:
+    """Jaccard similarity of two rows' name tokens (what the MinHash estimates)."""
+    return jaccard(MatchKey.from_row(a).shingles, MatchKey.from_row(b).shingles)
+
+
+def merge_rows(rows: Sequence[dict]) -> dict:
+    """
+    One canonical row for a cluster: the highest quality_score row (earliest on ties),
+    with its gaps filled from the others, the union of their geography and the
+    longest requirements_text.
+    """
+    best = max(range(len(rows)), key=lambda i: (rows[i].get('quality_score') or 0, -i))
+    merged = dict(rows[best])
+    others = [r for i, r in enumerate(rows) if i != best]
+    for r in others:
+        if not merged.get('application_url') and r.get('application_url'):
+            merged['application_url'] = r['application_url']
+        if not merged.get('max_amount') and r.get('max_amount'):
+            for col in ('min_amount', 'max_amount', 'typical_award'):
+                merged[col] = r.get(col)
+        if len(r.get('requirements_text') or '') > len(merged.get('requirements_text') or ''):
+            merged['requirements_text'] = r['requirements_text']
+    keys = [k for r in rows for k in r.get('geo_keys') or [ALL_KEY]]
+    if ALL_KEY in keys:
+        # Nationwide in any copy: nationwide, keeping region/county tags for display
+        keys = [ALL_KEY] + [k for k in keys if k != ALL_KEY and not k.startswith('state:')]
+    merged['geo_keys'] = list(dict.fromkeys(keys))
+    merged['eligible_states'] = eligible_states_value(merged['geo_keys'])
+    return merged
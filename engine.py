@@ -15,11 +15,15 @@ It UNDERSTANDS why someone qualifies for unconventional funding sources.
 
 import json
 import sqlite3
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 import re
 
+import reasons as R
+from geo import STATE_CODES
+from reasons import Reason
+
 # =============================================================================
 # DATA STRUCTURES
 # =============================================================================
@@ -111,10 +115,55 @@ class Match:
     timeline_score: float
     fit_score: float
     
-    # Explanations
-    match_reasons: List[str]
-    eligibility_gaps: List[str]
-    competitive_advantages: List[str]
+    # Explanations: reason codes, rendered to text by reasons.explain
+    match_reasons: List[Reason]
+    eligibility_gaps: List[Reason]
+    competitive_advantages: List[Reason]
+
+# =============================================================================
+# ROW CONVERSION (shared with catalog.py)
+# =============================================================================
+
+def parse_json_list(val, all_marker: Optional[str] = None) -> List:
+    """Parse JSON array from DB; support literal 'ALL' for eligibility."""
+    if val is None or (isinstance(val, str) and val.strip() == ''):
+        return []
+    if isinstance(val, str) and all_marker and val.strip().upper() == 'ALL':
+        return [all_marker]
+    try:
+        out = json.loads(val) if isinstance(val, str) else val
+        return list(out) if out is not None else []
+    except (json.JSONDecodeError, TypeError):
+        return [val] if val else []
+
+
+def is_expired(source: FundingSource, now: datetime) -> bool:
+    """A one-time source whose deadline day is over (open through the deadline date itself)."""
+    return bool(source.deadline) and source.deadline_type == 'one-time' and source.deadline.date() < now.date()
+
+
+def source_from_row(row: sqlite3.Row) -> FundingSource:
+    """Build a FundingSource from a funding_sources row."""
+    return FundingSource(
+        source_id=row['source_id'],
+        source_name=row['source_name'],
+        source_type=row['source_type'],
+        provider_name=row['provider_name'],
+        provider_type=row['provider_type'],
+        min_amount=row['min_amount'],
+        max_amount=row['max_amount'],
+        deadline=datetime.fromisoformat(row['application_deadline']) if row['application_deadline'] else None,
+        deadline_type=row['deadline_type'],
+        eligible_states=parse_json_list(row['eligible_states'], 'ALL'),
+        eligible_project_types=parse_json_list(row['eligible_project_types']),
+        eligible_fields=parse_json_list(row['eligible_fields'], 'ALL'),
+        requirements_text=row['requirements_text'] or "",
+        application_complexity=row['application_complexity'],
+        estimated_hours=row['estimated_hours_to_complete'] or 0,
+        success_rate=row['success_rate'] or 0.1,
+        awards_last_year=row['number_awarded_last_year'] or 0,
+        application_url=(row['application_url'] or row['source_url']) or None
+    )
 
 # =============================================================================
 # MATCHING ENGINE (Mirror Protocol Logic)
@@ -128,47 +177,179 @@ class FundingMatchEngine:
     - Pattern recognition across seemingly unrelated factors
     """
     
-    def __init__(self, db_path: str):
-        self.db = sqlite3.connect(db_path)
-        self.db.row_factory = sqlite3.Row
-        
-    def match(self, profile: UserProfile, max_results: int = 50) -> List[Match]:
+    def __init__(self, db_path: str, catalog=None):
+        self.db_path = db_path
+        self._db: Optional[sqlite3.Connection] = None
+        # Optional catalog.CatalogSnapshot; without one, sources are read from the DB per match
+        self.catalog = catalog
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        """Connection for the no-catalog path, opened on first use (never, with a catalog)."""
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path)
+            self._db.row_factory = sqlite3.Row
+        return self._db
+
+    def close(self) -> None:
+        """Close the engine's database connection, if it was opened."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+        
+    def match(self, profile: UserProfile, max_results: int = 50,
+              now: Optional[datetime] = None) -> List[Match]:
+        """Top max_results matches for profile (see rank)."""
+        now = now or datetime.now()
+        if self.catalog is None:
+            return self.rank(profile, now)[:max_results]
+        # Rank on cached components, then build explanations for the top results only
+        return self.rescore(profile, [sid for sid, _ in self.top_ids(profile, max_results, now)], now)
+    
+    def rank(self, profile: UserProfile, now: Optional[datetime] = None) -> List[Match]:
         """
-        Main matching function.
+        Main matching function: every viable match, best first.
         Uses multi-layer scoring similar to Mirror Protocol's recursive checks.
         Excludes sources that require an identity the user did not select (e.g. veteran-only when not a veteran).
+        Expired one-time sources, sources whose amount range does not overlap the
+        user's and sources closed to the user's state are skipped before scoring.
         """
+        # One clock reading per request so every source is judged against the same "now"
+        now = now or datetime.now()
         
-        # Get all active funding sources
-        sources = self._get_active_sources()
-        
-        # User's selected identities (normalized lowercase for comparison)
-        user_identities = [str(x).lower().strip() for x in (profile.identity_factors or [])]
-        
-        # Score each source (skip identity-restricted sources user doesn't qualify for)
+        # Score each viable source
         matches = []
-        for source in sources:
-            required = self._source_required_identities(source)
-            if required:
-                # Source is restricted to a specific identity (e.g. veteran-only, women-only)
-                def user_has_required(rid: str) -> bool:
-                    if rid in user_identities:
-                        return True
-                    if rid == "minority" and "person of color" in user_identities:
-                        return True
-                    return False
-                if not any(user_has_required(rid) for rid in required):
-                    continue  # User didn't select that identity – don't waste their time
-            match = self._score_match(profile, source)
+        for source in self._candidates(profile, now):
+            match = self._score_match(profile, source, now)
             if match.overall_score >= 15:  # Minimum threshold – show more opportunities
                 matches.append(match)
         
         # Sort by overall score
         matches.sort(key=lambda x: x.overall_score, reverse=True)
         
-        return matches[:max_results]
+        return matches
     
-    def _score_match(self, profile: UserProfile, source: FundingSource) -> Match:
+    def rank_ids(self, profile: UserProfile, now: Optional[datetime] = None) -> List[Tuple[int, float]]:
+        """
+        (source_id, overall_score) for every viable match, best first: the same order
+        and scores as rank() without building explanations. With a catalog, scores come
+        from cached per-segment components (segments.py) plus the free-text terms.
+        """
+        now = now or datetime.now()
+        if self.catalog is None:
+            return [(m.source.source_id, m.overall_score) for m in self.rank(profile, now)]
+        from segments import rank_ids
+        return rank_ids(self, profile, now)
+
+    def top_ids(self, profile: UserProfile, k: int, now: Optional[datetime] = None,
+                stats: Optional[dict] = None, among: Optional[Set[int]] = None) -> List[Tuple[int, float]]:
+        """
+        The first k of rank_ids. With a catalog, sources whose score upper bound cannot
+        reach the k-th best are never scored (segments.top_ids); stats, if given,
+        receives candidates / scored / pruned and total (the length of rank_ids).
+        among, a superset of the profile's candidates (intake.py narrows one while the
+        questionnaire is filled in), spares walking the catalog indexes; same result.
+        """
+        now = now or datetime.now()
+        if self.catalog is None:
+            ranked = self.rank_ids(profile, now)
+            if stats is not None:
+                stats.update(candidates=len(ranked), scored=len(ranked), pruned=0, total=len(ranked))
+            return ranked[:k]
+        from segments import top_ids
+        return top_ids(self, profile, now, k, stats, among)
+    
+    def _candidates(self, profile: UserProfile, now: datetime,
+                    among: Optional[Set[int]] = None) -> List[FundingSource]:
+        """
+        Active sources worth scoring for profile, in catalog order. Skips expired
+        one-time sources, sources that require an identity the user did not select,
+        sources whose amount range does not overlap the user's and sources closed to
+        the user's state. among restricts this to those source ids.
+        """
+        # Get all active funding sources
+        if self.catalog is not None and among is not None:
+            # A few ids (incremental re-match, a narrowed intake session): test each
+            # instead of walking the indexes
+            in_state = self.catalog.geo_index.eligible_ids(profile.location.get('state', ''))
+            sources = [
+                s for s in self.catalog.in_rank_order(among & self.catalog.by_id.keys())
+                if self.catalog.amount_index.overlaps(s, *profile.funding_needed)
+                and (in_state is None or s.source_id in in_state)
+            ]
+            expired = {s.source_id for s in sources if is_expired(s, now)}
+        elif self.catalog is not None:
+            # Amount and state prune: only sources whose range overlaps the user's
+            # and that are open in the user's state are scored
+            candidates = self.catalog.amount_index.overlapping(*profile.funding_needed)
+            in_state = self.catalog.geo_index.eligible_ids(profile.location.get('state', ''))
+            if in_state is not None:
+                candidates &= in_state
+            sources = self.catalog.in_rank_order(candidates)
+            expired = self.catalog.expired_ids(now)
+        else:
+            # Same amount and state prune as the catalog indexes, in SQL
+            sources = self._get_active_sources(profile.funding_needed, profile.location.get('state', ''))
+            if among is not None:
+                sources = [s for s in sources if s.source_id in among]
+            expired = {s.source_id for s in sources if is_expired(s, now)}
+        
+        out = []
+        for source in sources:
+            if source.source_id in expired:
+                continue
+            # Source is restricted to a specific identity (e.g. veteran-only, women-only):
+            # user didn't select that identity – don't waste their time
+            if self._lacks_required_identity(profile, source):
+                continue
+            out.append(source)
+        return out
+    
+    def _lacks_required_identity(self, profile: UserProfile, source: FundingSource) -> bool:
+        """The source is restricted to identities none of which the user selected."""
+        required = self._required_identities(source)
+        if not required:
+            return False
+        # User's selected identities (normalized lowercase for comparison)
+        user_identities = [str(x).lower().strip() for x in (profile.identity_factors or [])]
+        for rid in required:
+            if rid in user_identities:
+                return False
+            if rid == "minority" and "person of color" in user_identities:
+                return False
+        return True
+    
+    def _required_identities(self, source: FundingSource) -> List[str]:
+        """_source_required_identities, kept per catalog snapshot (it only reads the source)."""
+        if self.catalog is None:
+            return self._source_required_identities(source)
+        cache = self.catalog.required_identities
+        required = cache.get(source.source_id)
+        if required is None:
+            required = cache[source.source_id] = self._source_required_identities(source)
+        return required
+    
+    def match_among(self, profile: UserProfile, source_ids: Iterable[int],
+                    now: Optional[datetime] = None) -> List[Match]:
+        """rank() limited to source_ids: same candidate filters and threshold, best first."""
+        now = now or datetime.now()
+        matches = [
+            m for m in (self._score_match(profile, s, now)
+                        for s in self._candidates(profile, now, among=set(source_ids)))
+            if m.overall_score >= 15
+        ]
+        matches.sort(key=lambda x: x.overall_score, reverse=True)
+        return matches
+    
+    def rescore(self, profile: UserProfile, source_ids: List[int], now: datetime) -> List[Match]:
+        """Score specific catalog sources in the given order (used to render later result pages)."""
+        return [
+            self._score_match(profile, self.catalog.by_id[sid], now)
+            for sid in source_ids if sid in self.catalog.by_id
+        ]
+    
+    def _score_match(self, profile: UserProfile, source: FundingSource,
+                     now: Optional[datetime] = None) -> Match:
         """
         Score a single profile-source match.
         Five-factor scoring (like Persephone's five phases):
@@ -189,7 +370,7 @@ class FundingMatchEngine:
         effort = self._score_effort(profile, source)
         
         # Layer 4: Timeline Viability
-        timeline = self._score_timeline(profile, source)
+        timeline = self._score_timeline(profile, source, now)
         
         # Layer 5: Strategic Fit
         fit = self._score_fit(profile, source)
@@ -281,6 +462,25 @@ class FundingMatchEngine:
         Check if user meets basic eligibility requirements.
         Uses pattern matching similar to 33 Voices Protocol.
         """
+        score = self._eligibility_base(profile, source)
+        if self._needs_field_match(source) and not self._field_match(profile, source):
+            score -= 10  # Light penalty so more matches show
+        return max(0, min(100, score))
+    
+    def _needs_field_match(self, source: FundingSource) -> bool:
+        ef = [str(f).lower() for f in (source.eligible_fields or [])]
+        return bool(ef) and 'all' not in ef
+    
+    def _field_match(self, profile: UserProfile, source: FundingSource) -> bool:
+        """Field eligibility: batch data uses tags (small_business, tech_startup) – match tag or tag with spaces"""
+        proj = (profile.project_field or '').lower() + ' ' + (profile.project_description or '').lower()
+        return any(
+            tag in proj or tag.replace('_', ' ') in proj
+            for tag in (str(f).lower() for f in source.eligible_fields)
+        )
+    
+    def _eligibility_base(self, profile: UserProfile, source: FundingSource) -> float:
+        """Eligibility before the free-text field check and clamping (see segments.py)."""
         score = 100.0
         
         # Geographic eligibility
@@ -293,17 +493,6 @@ class FundingMatchEngine:
             if profile.project_type not in source.eligible_project_types:
                 score -= 50  # Major penalty but not disqualifying
         
-        # Field eligibility: batch data uses tags (small_business, tech_startup) – match tag or tag with spaces
-        ef = [str(f).lower() for f in (source.eligible_fields or [])]
-        if ef and 'all' not in ef:
-            proj = (profile.project_field or '').lower() + ' ' + (profile.project_description or '').lower()
-            field_match = any(
-                tag in proj or tag.replace('_', ' ') in proj
-                for tag in ef
-            )
-            if not field_match:
-                score -= 10  # Light penalty so more matches show
-        
         # Funding amount fit (show stretch opportunities too – don't disqualify)
         user_min, user_max = profile.funding_needed
         if source.max_amount < user_min or source.min_amount > user_max:
@@ -314,7 +503,7 @@ class FundingMatchEngine:
         hidden_boost = self._check_hidden_eligibility(profile, source)
         score += hidden_boost
         
-        return max(0, min(100, score))
+        return score
     
     def _check_hidden_eligibility(self, profile: UserProfile, source: FundingSource) -> float:
         """
@@ -464,7 +653,8 @@ class FundingMatchEngine:
     # LAYER 4: TIMELINE VIABILITY
     # -------------------------------------------------------------------------
     
-    def _score_timeline(self, profile: UserProfile, source: FundingSource) -> float:
+    def _score_timeline(self, profile: UserProfile, source: FundingSource,
+                        now: Optional[datetime] = None) -> float:
         """
         Can they meet the deadline?
         """
@@ -473,7 +663,7 @@ class FundingMatchEngine:
         if not source.deadline:
             return 100  # Rolling deadline
         
-        days_until_deadline = (source.deadline - datetime.now()).days
+        days_until_deadline = (source.deadline - (now or datetime.now())).days
         
         # Urgency match
         urgency_thresholds = {
@@ -519,6 +709,12 @@ class FundingMatchEngine:
         score += min(30, overlap * 5)
         
         # Source type alignment with project stage
+        if self._stage_fits(profile, source):
+            score += 15
+        
+        return min(100, score)
+    
+    def _stage_fits(self, profile: UserProfile, source: FundingSource) -> bool:
         stage_preferences = {
             "Just an idea I can't stop thinking about": ['grant', 'contest', 'microloan'],
             "I've been planning this for a while": ['grant', 'loan', 'contest'],
@@ -527,77 +723,74 @@ class FundingMatchEngine:
         }
         
         preferred_types = stage_preferences.get(profile.project_stage, [])
-        if source.source_type in preferred_types:
-            score += 15
-        
-        return min(100, score)
+        return source.source_type in preferred_types
     
     # -------------------------------------------------------------------------
     # EXPLANATION GENERATION
     # -------------------------------------------------------------------------
     
     def _generate_match_reasons(self, profile: UserProfile, source: FundingSource, 
-                                eligibility: float, success_prob: float) -> List[str]:
-        """Generate human-readable match reasons"""
+                                eligibility: float, success_prob: float) -> List[Reason]:
+        """Match reason codes (reasons.py renders them)"""
         reasons = []
         
         if eligibility >= 80:
-            reasons.append(f"You meet all major eligibility requirements for {source.source_name}")
+            reasons.append(R.ELIGIBLE)
         
         if success_prob >= 70:
-            reasons.append("You have strong competitive advantages for this opportunity")
+            reasons.append(R.STRONG_CANDIDATE)
         
         # Specific matches
         if 'woman' in profile.identity_factors and 'women' in source.requirements_text.lower():
-            reasons.append("Women-owned business program match")
+            reasons.append(R.WOMEN_PROGRAM)
         
         if 'veteran' in profile.identity_factors and 'veteran' in source.requirements_text.lower():
-            reasons.append("Veteran-specific funding opportunity")
+            reasons.append(R.VETERAN_PROGRAM)
         
         if profile.hidden_eligibility_factors.get('rural_status') and 'rural' in source.requirements_text.lower():
-            reasons.append("Rural location qualifies you for this program")
+            reasons.append(R.RURAL_PROGRAM)
         
         # Amount match
         user_min, user_max = profile.funding_needed
         if source.min_amount <= user_min <= source.max_amount:
-            reasons.append(f"Funding amount ({source.min_amount:,.0f} - {source.max_amount:,.0f}) matches your needs")
+            reasons.append((R.AMOUNT_FITS, source.min_amount, source.max_amount))
         
         return reasons
     
-    def _identify_eligibility_gaps(self, profile: UserProfile, source: FundingSource) -> List[str]:
-        """Identify missing requirements"""
+    def _identify_eligibility_gaps(self, profile: UserProfile, source: FundingSource) -> List[Reason]:
+        """Identify missing requirements (reason codes)"""
         gaps = []
         
         # Check requirements text for common gaps
         req = source.requirements_text.lower() if source.requirements_text else ""
         
         if 'business plan' in req and not any('plan' in advantage.lower() for advantage in profile.competitive_advantages):
-            gaps.append("Business plan required - not mentioned in your profile")
+            gaps.append(R.NEEDS_BUSINESS_PLAN)
         
         if 'financial statements' in req:
-            gaps.append("Financial statements may be required")
+            gaps.append(R.NEEDS_FINANCIALS)
         
         if 'letters of support' in req or 'recommendation' in req:
-            gaps.append("Letters of support/recommendation needed")
+            gaps.append(R.NEEDS_LETTERS)
         
         return gaps
     
-    def _identify_competitive_advantages(self, profile: UserProfile, source: FundingSource) -> List[str]:
-        """Identify why they're a strong candidate"""
+    def _identify_competitive_advantages(self, profile: UserProfile, source: FundingSource) -> List[Reason]:
+        """Identify why they're a strong candidate (reason codes)"""
         advantages = []
         
         # Use AI-extracted advantages
-        advantages.extend(profile.competitive_advantages[:3])  # Top 3
+        advantages.extend((R.STATED, a) for a in profile.competitive_advantages[:3])  # Top 3
         
         # Add identity-based advantages
         if len(profile.identity_factors) >= 2:
-            advantages.append("Multiple diversity factors strengthen your application")
+            advantages.append(R.DIVERSITY)
         
         if profile.obstacles_overcome and len(profile.obstacles_overcome) > 50:
-            advantages.append("Compelling personal story of overcoming obstacles")
+            advantages.append(R.PERSONAL_STORY)
         
         if profile.experience_years >= 10:
-            advantages.append(f"{profile.experience_years} years of experience in your field")
+            advantages.append((R.EXPERIENCE, profile.experience_years))
         
         return advantages[:5]  # Top 5
     
@@ -607,48 +800,31 @@ class FundingMatchEngine:
     
     def _parse_json_list(self, val, all_marker: Optional[str] = None) -> List:
         """Parse JSON array from DB; support literal 'ALL' for eligibility."""
-        if val is None or (isinstance(val, str) and val.strip() == ''):
-            return []
-        if isinstance(val, str) and all_marker and val.strip().upper() == 'ALL':
-            return [all_marker]
-        try:
-            out = json.loads(val) if isinstance(val, str) else val
-            return list(out) if out is not None else []
-        except (json.JSONDecodeError, TypeError):
-            return [val] if val else []
+        return parse_json_list(val, all_marker)
 
-    def _get_active_sources(self) -> List[FundingSource]:
-        """Retrieve active funding sources from database"""
-        cursor = self.db.execute("""
-            SELECT * FROM funding_sources 
-            WHERE active = 1
+    def _get_active_sources(self, funding_needed: Optional[Tuple[float, float]] = None,
+                            state: str = '') -> List[FundingSource]:
+        """
+        Retrieve active funding sources from database. With funding_needed, only those
+        whose amount range overlaps it or is unknown (AmountIndex.overlapping, on the
+        amount_hi/amount_lo index); with a known state, only those open in it
+        (GeoIndex.eligible_ids).
+        """
+        where, params = ["active = 1"], []
+        if funding_needed is not None:
+            lo, hi = sorted(funding_needed)
+            where.append("(amount_hi = 0 OR (amount_hi >= ? AND amount_lo <= ?))")
+            params += [lo, hi]
+        state = (state or '').strip().upper()
+        if state in STATE_CODES:
+            where.append("(states_open = 1 OR instr(upper(eligible_states), ?) > 0)")
+            params.append(f'"{state}"')
+        cursor = self.db.execute(f"""
+            SELECT * FROM funding_sources
+            WHERE {' AND '.join(where)}
             ORDER BY quality_score DESC
-        """)
-        
-        sources = []
-        for row in cursor:
-            sources.append(FundingSource(
-                source_id=row['source_id'],
-                source_name=row['source_name'],
-                source_type=row['source_type'],
-                provider_name=row['provider_name'],
-                provider_type=row['provider_type'],
-                min_amount=row['min_amount'],
-                max_amount=row['max_amount'],
-                deadline=datetime.fromisoformat(row['application_deadline']) if row['application_deadline'] else None,
-                deadline_type=row['deadline_type'],
-                eligible_states=self._parse_json_list(row['eligible_states'], 'ALL'),
-                eligible_project_types=self._parse_json_list(row['eligible_project_types']),
-                eligible_fields=self._parse_json_list(row['eligible_fields'], 'ALL'),
-                requirements_text=row['requirements_text'] or "",
-                application_complexity=row['application_complexity'],
-                estimated_hours=row['estimated_hours_to_complete'] or 0,
-                success_rate=row['success_rate'] or 0.1,
-                awards_last_year=row['number_awarded_last_year'] or 0,
-                application_url=(row['application_url'] or row['source_url']) or None
-            ))
-        
-        return sources
+        """, params)
+        return [source_from_row(row) for row in cursor]
     
     def _extract_keywords(self, text: str) -> List[str]:
         """Extract meaningful keywords from text"""
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Export the active catalog as a compact binary index for the browser matcher
+(catalog_matcher.js), so anonymous questionnaire users can match client-side.
+
+    python export_catalog.py [path/to/funding_finder.db]
+
+Writes build/catalog_index.bin and publishes it through the static pipeline
+(fingerprinted, gzip/brotli, one-year cache); GET /api/catalog-index returns its URL.
+Files are replaced atomically, and one export runs at a time across processes
+(an flock on build/catalog_index.lock), so gunicorn workers never race each other.
+
+Layout (little-endian):
+    "FFCI"  u32 format version  u32 header length  header JSON (UTF-8)
+    then columns, each 8-byte aligned, described by header["columns"]:
+    {name: {"type": "u8|u16|u32|f64", "offset": byte offset, "length": element count}}
+
+Everything the scoring layers test about a source's text is precomputed here as
+feature bits (header["features"]), so the browser only runs the profile side of
+each check. Keywords for the fit layer are ids into header["vocab"]["keywords"].
+"""
+
+import fcntl
+import json
+import os
+import struct
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from catalog import get_catalog
+from engine import FundingMatchEngine, FundingSource
+from geo import STATE_CODES
+from static_assets import BUILD_DIR, publish_asset, write_atomic
+
+BASE_DIR = Path(__file__).resolve().parent
+INDEX_NAME = "catalog_index.bin"
+LOCK_NAME = "catalog_index.lock"
+FORMAT_VERSION = 1
+
+# Substring tests engine.py runs against requirements_text.lower() (plus list checks)
+REQ_PHRASES = [
+    'women', 'woman-owned', 'veteran', 'military', 'minority', 'diverse', 'underrepresented',
+    'disability', 'accessible', 'lgbtq', 'pride', 'rural',
+    'irish', 'italian', 'asian', 'hispanic', 'latino', 'appalachian', 'tribal', 'indigenous',
+    'church', 'religious', 'fraternal', 'union', 'civic',
+    'business plan', 'financial statements',
+]
+HARDSHIP = ['poverty', 'low-income', 'disadvantaged', 'underserved', 'second-chance']
+FEATURES = (
+    [f"req:{p}" for p in REQ_PHRASES]
+    + ['req:hardship', 'req:first_gen', 'req:letters',
+       'states_all', 'ptypes_all', 'fields_all', 'fields_edu_research']
+)
+REQUIRED_IDENTITIES = ['veteran', 'woman', 'minority', 'disability', 'lgbtq', 'first-generation']
+
+
+def _features(s: FundingSource) -> List[bool]:
+    req = (s.requirements_text or "").lower()
+    ef = [str(f).lower() for f in (s.eligible_fields or [])]
+    flags = [p in req for p in REQ_PHRASES]
+    flags += [
+        any(k in req for k in HARDSHIP),
+        'first-generation' in req or 'first gen' in req,
+        'letters of support' in req or 'recommendation' in req,
+        not s.eligible_states or 'ALL' in s.eligible_states,
+        not s.eligible_project_types or 'ALL' in s.eligible_project_types,
+        not ef or 'all' in ef,
+        'education' in ef or 'research' in ef,
+    ]
+    return flags
+
+
+class _Writer:
+    def __init__(self):
+        self.columns: Dict[str, dict] = {}
+        self.chunks: List[bytes] = []
+        self.size = 0
+
+    def add(self, name: str, typ: str, values) -> None:
+        fmt = {'u8': 'B', 'u16': 'H', 'u32': 'I', 'f64': 'd'}[typ]
+        pad = (-self.size) % 8
+        if pad:
+            self.chunks.append(b'\0' * pad)
+            self.size += pad
+        data = struct.pack(f'<{len(values)}{fmt}', *values)
+        self.columns[name] = {'type': typ, 'offset': self.size, 'length': len(values)}
+        self.chunks.append(data)
+        self.size += len(data)
+
+    def add_strings(self, name: str, values: List[str]) -> None:
+        offsets, blob = [0], bytearray()
+        for v in values:
+            blob += (v or '').encode('utf-8')
+            offsets.append(len(blob))
+        self.add(f'{name}_off', 'u32', offsets)
+        self.add(f'{name}_utf8', 'u8', bytes(blob))
+
+    def add_lists(self, name: str, lists: List[List[int]]) -> None:
+        offsets, ids = [0], []
+        for lst in lists:
+            ids.extend(lst)
+            offsets.append(len(ids))
+        self.add(f'{name}_off', 'u32', offsets)
+        self.add(f'{name}_ids', 'u16' if max(ids, default=0) < 0x10000 else 'u32', ids)
+
+
+def _vocab(values) -> Dict[str, int]:
+    return {v: i for i, v in enumerate(sorted(set(values)))}
+
+
+def build_index(db_path: str, catalog=None) -> bytes:
+    """Serialize the catalog snapshot for db_path (the current one by default)."""
+    catalog = catalog or get_catalog(db_path)
+    sources = catalog.sources
+    epoch = datetime(1970, 1, 1)
+
+    engine = FundingMatchEngine(db_path, catalog=catalog)
+    try:
+        keywords = [set(engine._extract_keywords(s.source_name.lower() + " " + (s.requirements_text or "")))
+                    for s in sources]
+        identities = [engine._source_required_identities(s) for s in sources]
+    finally:
+        engine.close()
+    fields = [[str(f).lower() for f in (s.eligible_fields or [])] for s in sources]
+    vocab = {
+        'keywords': _vocab(k for ks in keywords for k in ks),
+        'fields': _vocab(f for fs in fields for f in fs),
+        'states': _vocab(str(x) for s in sources for x in s.eligible_states if x != 'ALL'),
+        'project_types': _vocab(str(x) for s in sources for x in s.eligible_project_types if x != 'ALL'),
+        'source_types': _vocab(str(s.source_type) for s in sources),
+        'deadline_types': _vocab(str(s.deadline_type) for s in sources),
+        'complexities': _vocab(str(s.application_complexity) for s in sources),
+    }
+    if len(vocab['states']) > 64 or len(vocab['project_types']) > 32:
+        raise ValueError("state/project-type vocabulary too large for the index bitmasks")
+
+    w = _Writer()
+    n = len(sources)
+    w.add('source_id', 'u32', [s.source_id for s in sources])
+    w.add('min_amount', 'f64', [float(s.min_amount or 0) for s in sources])
+    w.add('max_amount', 'f64', [float(s.max_amount or 0) for s in sources])
+    # Naive local datetimes as ms since 1970-01-01 (same wall clock the engine uses); -1 = rolling
+    w.add('deadline_ms', 'f64', [(s.deadline - epoch).total_seconds() * 1000 if s.deadline else -1
+                                 for s in sources])
+    w.add('success_rate', 'f64', [float(s.success_rate or 0) for s in sources])
+    w.add('estimated_hours', 'f64', [float(s.estimated_hours or 0) for s in sources])
+    w.add('source_type', 'u8', [vocab['source_types'][str(s.source_type)] for s in sources])
+    w.add('deadline_type', 'u8', [vocab['deadline_types'][str(s.deadline_type)] for s in sources])
+    w.add('complexity', 'u8', [vocab['complexities'][str(s.application_complexity)] for s in sources])
+
+    states_lo, states_hi, ptypes = [], [], []
+    for s in sources:
+        mask = 0
+        for x in s.eligible_states:
+            if x != 'ALL':
+                mask |= 1 << vocab['states'][str(x)]
+        states_lo.append(mask & 0xFFFFFFFF)
+        states_hi.append(mask >> 32)
+        pmask = 0
+        for x in s.eligible_project_types:
+            if x != 'ALL':
+                pmask |= 1 << vocab['project_types'][str(x)]
+        ptypes.append(pmask)
+    w.add('states_lo', 'u32', states_lo)
+    w.add('states_hi', 'u32', states_hi)
+    w.add('project_types', 'u32', ptypes)
+
+    words = (len(FEATURES) + 31) // 32
+    feats = []
+    for s in sources:
+        bits = 0
+        for i, on in enumerate(_features(s)):
+            if on:
+                bits |= 1 << i
+        feats.extend((bits >> (32 * k)) & 0xFFFFFFFF for k in range(words))
+    w.add('features', 'u32', feats)
+
+    required = [sum(1 << i for i, ident in enumerate(REQUIRED_IDENTITIES) if ident in req)
+                for req in identities]
+    w.add('required_identities', 'u8', required)
+
+    w.add_lists('fields', [[vocab['fields'][f] for f in fs] for fs in fields])
+    w.add_lists('keywords', [sorted(vocab['keywords'][k] for k in ks) for ks in keywords])
+    w.add_strings('name', [s.source_name for s in sources])
+    w.add_strings('provider', [s.provider_name for s in sources])
+    w.add_strings('url', [s.application_url for s in sources])
+    w.add_strings('requirements', [(s.requirements_text or "").strip() for s in sources])
+
+    header = {
+        'format': FORMAT_VERSION,
+        'catalog_version': catalog.version,
+        'count': n,
+        'features': FEATURES,
+        'feature_words': words,
+        'required_identities': REQUIRED_IDENTITIES,
+        # States the server-side state prune recognizes (others are not pruned)
+        'state_codes': sorted(STATE_CODES),
+        'vocab': {k: sorted(v, key=v.get) for k, v in vocab.items()},
+        'columns': w.columns,
+    }
+    head = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    prefix = b'FFCI' + struct.pack('<II', FORMAT_VERSION, len(head)) + head
+    prefix += b'\0' * ((-len(prefix)) % 8)
+    # Column offsets are relative to the end of the (padded) prefix
+    return prefix + b''.join(w.chunks)
+
+
+def export(db_path: str, out_dir: Path = BUILD_DIR) -> dict:
+    """Write build/catalog_index.bin and publish it as a static asset. Returns its manifest entry."""
+    catalog = get_catalog(db_path)
+    path = out_dir.parent / INDEX_NAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_atomic(path, build_index(db_path, catalog))
+    # Recorded so the server can tell when the published index is stale
+    return publish_asset(path, out_dir, catalog_version=catalog.version)
+
+
+def export_in_background(db_path: str, on_done: Optional[Callable[[], None]] = None) -> bool:
+    """Re-export on a daemon thread unless one is already running in any process. Returns True if started."""
+    BUILD_DIR.mkdir(parents=True, exist_ok=True)
+    fd = os.open(BUILD_DIR / LOCK_NAME, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return False
+
+    def run():
+        try:
+            export(db_path)
+            if on_done:
+                on_done()
+        except Exception:
+            pass  # the next /api/catalog-index request retries
+        finally:
+            os.close(fd)  # releases the flock
+
+    threading.Thread(target=run, name="catalog-export", daemon=True).start()
+    return True
+
+
+if __name__ == '__main__':
+    import sys
+    db_path = sys.argv[1] if len(sys.argv) > 1 else str(BASE_DIR / 'data' / 'funding_finder.db')
+    entry = export(db_path)
+    sizes = {enc: (BUILD_DIR / f).stat().st_size for enc, f in entry["encodings"].items()}
+    print(f"{INDEX_NAME} -> /assets/{entry['fingerprinted']}: "
+          + ", ".join(f"{enc} {size:,} B" for enc, size in sizes.items()))
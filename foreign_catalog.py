@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Importer for third-party catalogs shipped as SQL dumps with their own
+funding_sources layout (e.g. comprehensive_sources.sql: id, name, provider,
+amount_min, woman_owned, veteran_owned, ...).
+
+The dump is executed statement by statement into a scratch database, which is
+ATTACHed to ours; rows are then mapped with set-based INSERT ... SELECT
+statements (flag columns become the requirements_text phrases the engine reads
+and JSON tags, state/region lists become source_geography keys), so 10^5-10^6
+rows import in seconds without a Python loop over rows.
+
+    python foreign_catalog.py dump.sql [path/to/funding_finder.db]
+
+Rows whose name matches a source already in the catalog are not inserted again;
+every foreign row gets a source_provenance row (batch_file = dump name,
+record_index = its id) pointing at the source it became or matched.
+"""
+
+import logging
+import os
+import sqlite3
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from geo import REGION_TAGS, REGIONS, STATE_CODES
+from load_batches import GEOGRAPHY_DDL, PROVENANCE_DDL
+from migrations import analyze, migrate
+
+log = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Foreign layouts we can map, keyed by name; detected by the columns of the dump's table.
+#   flags: boolean column -> eligibility phrase (worded the way engine._source_required_identities
+#          and the hidden-eligibility checks look for it); every set flag is also a tag
+#   tags:  boolean columns that only become tags
+LAYOUTS: Dict[str, dict] = {
+    'comprehensive_sources': {
+        'table': 'funding_sources',
+        'detect': {'id', 'name', 'provider', 'amount_min', 'amount_max', 'woman_owned', 'states'},
+        'id': 'id',
+        'name': 'name',
+        'provider': 'provider',
+        'type': 'type',
+        'amount_min': 'amount_min',
+        'amount_max': 'amount_max',
+        'deadline': 'deadline',
+        'url': 'url',
+        'description': 'description',
+        'states': 'states',
+        'regions': 'regions',
+        'industries': 'industries',
+        'obscurity': 'obscurity_score',
+        'flags': {
+            'woman_owned': 'women-owned',
+            'minority_owned': 'minority-owned',
+            'veteran_owned': 'veteran-owned',
+            'lgbtq_owned': 'lgbtq-owned',
+            'disability_owned': 'disabled-owned',
+            'first_gen': 'first-generation',
+            'rural': 'rural',
+            'urban': 'urban',
+            'tribal': 'native american / tribal',
+            'immigrant': 'immigrant',
+        },
+        'tags': ('idea_stage', 'startup', 'growth', 'established'),
+    },
+}
+
+SCRATCH = 'scratch'
+
+
+# =============================================================================
+# SCRATCH DATABASE
+# =============================================================================
+
+def iter_statements(path: Path) -> Iterator[str]:
+    """Complete SQL statements from a dump, read line by line."""
+    buf = []
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            buf.append(line)
+            # complete_statement only once a line could end one: keeps huge INSERTs linear
+            if line.rstrip().endswith(';') and sqlite3.complete_statement(''.join(buf)):
+                yield ''.join(buf)
+                buf = []
+    tail = ''.join(buf).strip()
+    if tail:
+        yield tail
+
+
+def load_dump(dump_path: Path, scratch_path: str) -> None:
+    """Run the dump into a throwaway database (no journal, no fsync)."""
+    conn = sqlite3.connect(scratch_path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("BEGIN")
+        for stmt in iter_statements(dump_path):
+            head = stmt.lstrip().split(None, 1)[0].upper() if stmt.strip() else ''
+            if head in ('BEGIN', 'COMMIT', 'END'):
+                continue  # the dump's own transaction; we hold one around all of it
+            conn.execute(stmt)
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def detect_layout(conn: sqlite3.Connection) -> Optional[str]:
+    for name, layout in LAYOUTS.items():
+        cols = {row[1] for row in conn.execute(f"PRAGMA {SCRATCH}.table_info({layout['table']})")}
+        if layout['detect'] <= cols:
+            return name
+    return None
+
+
+# =============================================================================
+# SQL EXPRESSIONS (mirror load_batches.batch_record_to_row)
+# =============================================================================
+
+def _csv_json(expr: str) -> str:
+    """'TN, KY' -> '["TN"," KY"]' for json_each (values still need trim)."""
+    return f"""'["' || replace(replace(coalesce({expr}, ''), '"', ''), ',', '","') || '"]'"""
+
+
+def _source_type(expr: str) -> str:
+    t = f"lower(trim(coalesce({expr}, '')))"
+    return f"""CASE
+        WHEN {t} = '' THEN 'grant'
+        WHEN {t} IN ('grant', 'loan', 'contest', 'angel', 'microloan', 'crowdfund', 'tax_credit', 'scholarship') THEN {t}
+        WHEN {t} LIKE '%loan%' THEN 'loan'
+        WHEN {t} LIKE '%tax%' OR {t} LIKE '%credit%' THEN 'tax_credit'
+        WHEN {t} LIKE '%contest%' OR {t} LIKE '%prize%' THEN 'contest'
+        ELSE 'grant' END"""
+
+
+def _provider_type(prov: str) -> str:
+    # instr() is case-sensitive like Python's `in`; LIKE is not
+    return f"""CASE
+        WHEN instr({prov}, 'U.S.') OR lower({prov}) LIKE '%federal%'
+             OR instr({prov}, 'irs.gov') OR instr({prov}, 'energy.gov') THEN 'federal'
+        WHEN instr({prov}, 'Department of') OR instr({prov}, 'State ') OR substr({prov}, -6) = ' state'
+             OR instr({prov}, 'Alabama') OR instr({prov}, 'Commerce') OR instr({prov}, 'Labor')
+             OR instr({prov}, 'Economic') OR instr({prov}, 'Revenue') OR instr({prov}, 'SSBCI') THEN 'state'
+        ELSE 'private' END"""
+
+
+def _flag_list(flags: Dict[str, str], fmt: str) -> str:
+    """Concatenation of fmt(value) for each set flag column, each followed by a comma."""
+    return ' || '.join(f"CASE WHEN f.{col} THEN {fmt(val)} ELSE '' END" for col, val in flags.items()) or "''"
+
+
+def _quote(s: str) -> str:
+    return "'" + s.replace("'", "''") + "'"
+
+
+# =============================================================================
+# IMPORT
+# =============================================================================
+
+def _prepare_lookups(conn: sqlite3.Connection) -> None:
+    conn.executescript("""
+        CREATE TEMP TABLE IF NOT EXISTS import_state (code TEXT PRIMARY KEY);
+        CREATE TEMP TABLE IF NOT EXISTS import_region (alias TEXT PRIMARY KEY, key TEXT);
+        CREATE TEMP TABLE IF NOT EXISTS import_region_state (key TEXT, code TEXT);
+        CREATE TEMP TABLE IF NOT EXISTS import_map (foreign_id INTEGER PRIMARY KEY, source_id INTEGER, new INTEGER);
+        CREATE TEMP TABLE IF NOT EXISTS import_geo (foreign_id INTEGER, geo_key TEXT);
+        CREATE INDEX IF NOT EXISTS temp.idx_import_geo ON import_geo(foreign_id, geo_key);
+        DELETE FROM import_map;
+        DELETE FROM import_geo;
+    """)
+    conn.executemany("INSERT OR IGNORE INTO import_state VALUES (?)", [(c,) for c in STATE_CODES])
+    # Region names the way geo.record_geography resolves them: 'Appalachian' -> ARC
+    aliases = {tag.upper().replace('_REGION', ''): name for tag, name in REGION_TAGS.items()}
+    aliases.update({name: name for name in REGIONS})
+    conn.executemany("INSERT OR REPLACE INTO import_region VALUES (?, ?)", aliases.items())
+    conn.executemany("INSERT OR IGNORE INTO import_region_state VALUES (?, ?)",
+                     [(name, code) for name, codes in REGIONS.items() for code in codes])
+
+
+def import_rows(conn: sqlite3.Connection, layout: dict, label: str) -> Dict[str, int]:
+    """Map the attached foreign table into funding_sources. Returns counts."""
+    L = layout
+    src = f"{SCRATCH}.{L['table']}"
+    fid, name, prov = f"f.{L['id']}", f"f.{L['name']}", f"coalesce(nullif(trim(f.{L['provider']}), ''), 'Unknown')"
+    _prepare_lookups(conn)
+
+    # 1. Foreign id -> source_id: an existing source with the same name, else a new id
+    #    (one per distinct name; a dump that repeats a name gets one source)
+    conn.executescript("""
+        DROP TABLE IF EXISTS temp.import_rows;
+        DROP TABLE IF EXISTS temp.import_names;
+        CREATE TEMP TABLE import_names (name TEXT PRIMARY KEY, source_id INTEGER, first_id);
+    """)
+    conn.execute(f"""
+        CREATE TEMP TABLE import_rows AS
+        SELECT {fid} AS foreign_id, lower(trim({name})) AS name FROM {src} f
+        WHERE trim(coalesce({name}, '')) != ''
+    """)
+    conn.execute("CREATE INDEX temp.idx_import_rows_name ON import_rows(name)")
+    conn.execute("""
+        INSERT OR IGNORE INTO import_names (name, source_id)
+        SELECT lower(trim(source_name)), source_id FROM funding_sources ORDER BY source_id
+    """)
+    base = conn.execute(
+        "SELECT max(coalesce((SELECT seq FROM sqlite_sequence WHERE name = 'funding_sources'), 0),"
+        "           coalesce((SELECT max(source_id) FROM funding_sources), 0))"
+    ).fetchone()[0]
+    conn.execute("""
+        INSERT INTO import_names (name, source_id, first_id)
+        SELECT name, ? + ROW_NUMBER() OVER (ORDER BY min(foreign_id)), min(foreign_id)
+        FROM import_rows
+        WHERE name NOT IN (SELECT name FROM import_names)
+        GROUP BY name
+    """, (base,))
+    conn.execute("""
+        INSERT INTO import_map (foreign_id, source_id, new)
+        SELECT r.foreign_id, n.source_id, r.foreign_id IS n.first_id
+        FROM import_rows r JOIN import_names n ON n.name = r.name
+    """)
+
+    # 2. Geography keys for new rows (same keys as geo.record_geography)
+    new_rows = f"{src} f JOIN import_map m ON m.foreign_id = {fid} AND m.new = 1"
+    if L.get('states'):
+        conn.execute(f"""
+            INSERT INTO import_geo
+            SELECT DISTINCT {fid}, 'state:' || s.code
+            FROM {new_rows}, json_each({_csv_json('f.' + L['states'])}) j
+            JOIN import_state s ON s.code = upper(trim(j.value))
+        """)
+    if L.get('regions'):
+        region = "upper(replace(trim(j.value), ' ', '_'))"
+        conn.execute(f"""
+            INSERT INTO import_geo
+            SELECT DISTINCT {fid}, 'region:' || r.key
+            FROM {new_rows}, json_each({_csv_json('f.' + L['regions'])}) j
+            JOIN import_region r ON r.alias = {region}
+        """)
+        unknown = [row[0] for row in conn.execute(f"""
+            SELECT DISTINCT trim(j.value)
+            FROM {new_rows}, json_each({_csv_json('f.' + L['regions'])}) j
+            LEFT JOIN import_region r ON r.alias = {region}
+            WHERE trim(j.value) != '' AND r.key IS NULL
+        """)]
+        if unknown:
+            log.warning("%s: unknown regions %s; add them to geo.REGIONS", label, ', '.join(unknown))
+        # A known region with no explicit states stands for its member states
+        conn.execute("""
+            INSERT INTO import_geo
+            SELECT DISTINCT g.foreign_id, 'state:' || rs.code
+            FROM import_geo g JOIN import_region_state rs ON g.geo_key = 'region:' || rs.key
+            WHERE NOT EXISTS (SELECT 1 FROM import_geo s
+                              WHERE s.foreign_id = g.foreign_id AND s.geo_key LIKE 'state:%')
+        """)
+    conn.execute(f"""
+        INSERT INTO import_geo
+        SELECT {fid}, 'ALL' FROM {new_rows}
+        WHERE NOT EXISTS (SELECT 1 FROM import_geo s WHERE s.foreign_id = {fid} AND s.geo_key LIKE 'state:%')
+    """)
+
+    # 3. Sources
+    phrases = _flag_list(L.get('flags', {}), lambda v: _quote(v + ', '))
+    tags = _flag_list(
+        dict({c: c for c in L.get('flags', {})}, **{c: c for c in L.get('tags', ())}),
+        lambda v: _quote(f'"{v}",'),
+    )
+    amount_min = f"coalesce(f.{L['amount_min']}, 0)" if L.get('amount_min') else '0'
+    amount_max = f"coalesce(f.{L['amount_max']}, 0)" if L.get('amount_max') else '0'
+    deadline = f"trim(coalesce(f.{L['deadline']}, ''))" if L.get('deadline') else "''"
+    is_date = f"{deadline} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'"
+    description = f"coalesce(f.{L['description']}, '')" if L.get('description') else "''"
+    industries = f"trim(coalesce(f.{L['industries']}, ''))" if L.get('industries') else "''"
+    obscurity = f"coalesce(f.{L['obscurity']}, 5)" if L.get('obscurity') else '5'
+    url = f"nullif(trim(f.{L['url']}), '')" if L.get('url') else 'NULL'
+    conn.execute(f"""
+        INSERT INTO funding_sources (
+            source_id, source_name, source_type, provider_name, provider_type,
+            min_amount, max_amount, typical_award,
+            application_deadline, deadline_type,
+            eligible_states, eligible_project_types, eligible_fields,
+            requirements_text, application_url, application_complexity,
+            success_rate, number_awarded_last_year, quality_score, legitimacy_verified, active, tags
+        )
+        SELECT
+            m.source_id,
+            substr(trim({name}), 1, 500),
+            {_source_type('f.' + L['type'] if L.get('type') else 'NULL')},
+            substr({prov}, 1, 500),
+            {_provider_type(prov)},
+            min({amount_min}, {amount_max}), max({amount_min}, {amount_max}),
+            CASE WHEN {amount_max} > 0 THEN ({amount_min} + {amount_max}) / 2.0 ELSE {amount_min} END,
+            CASE WHEN {is_date} THEN date({deadline}) END,
+            CASE WHEN {is_date} THEN 'one-time' WHEN {deadline} = '' THEN 'rolling' ELSE lower({deadline}) END,
+            coalesce((SELECT json_group_array(substr(g.geo_key, 7)) FROM import_geo g
+                      WHERE g.foreign_id = {fid} AND g.geo_key LIKE 'state:%'
+                      HAVING count(*) > 0), 'ALL'),
+            '["business", "nonprofit"]',
+            'ALL',
+            substr(
+                CASE WHEN ({phrases}) != '' THEN 'Eligibility: ' || rtrim({phrases}, ', ') || '. ' ELSE '' END
+                || {description}
+                || CASE WHEN {industries} NOT IN ('', 'All', 'ALL') THEN ' Industries: ' || {industries} ELSE '' END,
+                1, 2000),
+            {url},
+            'moderate', 0.1, 0,
+            max(1, min(100, 100 - {obscurity} * 10)),
+            1, 1,
+            json('[' || rtrim({tags}, ',') || ']')
+        FROM {new_rows}
+        ORDER BY m.source_id
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO source_geography (source_id, geo_key)
+        SELECT m.source_id, g.geo_key FROM import_geo g JOIN import_map m ON m.foreign_id = g.foreign_id
+    """)
+    conn.execute(f"""
+        INSERT INTO source_provenance
+            (source_id, batch_file, record_index, source_name, provider_name, application_url, similarity)
+        SELECT m.source_id, ?1, {fid}, {name}, {prov}, {url}, 1.0
+        FROM {src} f JOIN import_map m ON m.foreign_id = {fid}
+        WHERE NOT EXISTS (SELECT 1 FROM source_provenance p
+                          WHERE p.batch_file = ?1 AND p.record_index = {fid})  -- same dump imported again
+    """, (label,))
+    counts = conn.execute("SELECT count(*), coalesce(sum(new), 0) FROM import_map").fetchone()
+    return {"rows": conn.execute(f"SELECT count(*) FROM {src}").fetchone()[0],
+            "inserted": counts[1], "matched_existing": counts[0] - counts[1]}
+
+
+def import_dump(db_path: str, dump_path: str) -> Dict[str, int]:
+    """Load a foreign SQL dump into db_path's catalog. Returns {"rows", "inserted", "matched_existing"}."""
+    dump = Path(dump_path)
+    fd, scratch = tempfile.mkstemp(suffix='.db', prefix='foreign_')
+    os.close(fd)
+    try:
+        load_dump(dump, scratch)
+        conn = sqlite3.connect(db_path)
+        try:
+            migrate(conn)
+            conn.executescript(GEOGRAPHY_DDL)
+            conn.executescript(PROVENANCE_DDL)
+            conn.execute(f"ATTACH DATABASE ? AS {SCRATCH}", (scratch,))
+            layout = detect_layout(conn)
+            if layout is None:
+                raise ValueError(f"{dump.name}: no known catalog layout (see foreign_catalog.LAYOUTS)")
+            result = import_rows(conn, LAYOUTS[layout], dump.name)
+            conn.commit()
+            conn.execute(f"DETACH DATABASE {SCRATCH}")
+            analyze(conn)
+            return dict(result, layout=layout)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    finally:
+        os.unlink(scratch)
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) < 2:
+        sys.exit("usage: python foreign_catalog.py dump.sql [path/to/funding_finder.db]")
+    db_path = sys.argv[2] if len(sys.argv) > 2 else str(BASE_DIR / 'data' / 'funding_finder.db')
+    result = import_dump(db_path, sys.argv[1])
+    print(f"{sys.argv[1]} ({result['layout']}): {result['rows']} rows, "
+          f"{result['inserted']} new sources, {result['matched_existing']} already in the catalog")
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Geographic eligibility: state codes, named regions and counties.
+
+Ingestion (load_batches.py) turns each record's eligibility into geo keys stored in
+source_geography:
+    ALL                     nationwide
+    state:TN                one key per eligible state (regions are expanded to states)
+    region:ARC              named region, e.g. Appalachian Regional Commission
+                            (region names not in REGIONS are logged and dropped)
+    county:OH:CUYAHOGA      county (or 5-digit FIPS) within a state
+The catalog folds these into one bitmap per key, so the geographic part of a match
+is a single lookup instead of a per-source list scan.
+"""
+
+import json
+import logging
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+STATE_NAMES = {
+    'alabama': 'AL', 'alaska': 'AK', 'arizona': 'AZ', 'arkansas': 'AR', 'california': 'CA',
+    'colorado': 'CO', 'connecticut': 'CT', 'delaware': 'DE', 'district_of_columbia': 'DC',
+    'florida': 'FL', 'georgia': 'GA', 'hawaii': 'HI', 'idaho': 'ID', 'illinois': 'IL',
+    'indiana': 'IN', 'iowa': 'IA', 'kansas': 'KS', 'kentucky': 'KY', 'louisiana': 'LA',
+    'maine': 'ME', 'maryland': 'MD', 'massachusetts': 'MA', 'michigan': 'MI', 'minnesota': 'MN',
+    'mississippi': 'MS', 'missouri': 'MO', 'montana': 'MT', 'nebraska': 'NE', 'nevada': 'NV',
+    'new_hampshire': 'NH', 'new_jersey': 'NJ', 'new_mexico': 'NM', 'new_york': 'NY',
+    'north_carolina': 'NC', 'north_dakota': 'ND', 'ohio': 'OH', 'oklahoma': 'OK', 'oregon': 'OR',
+    'pennsylvania': 'PA', 'rhode_island': 'RI', 'south_carolina': 'SC', 'south_dakota': 'SD',
+    'tennessee': 'TN', 'texas': 'TX', 'utah': 'UT', 'vermont': 'VT', 'virginia': 'VA',
+    'washington': 'WA', 'west_virginia': 'WV', 'wisconsin': 'WI', 'wyoming': 'WY',
+    'puerto_rico': 'PR',
+}
+STATE_CODES = frozenset(STATE_NAMES.values())
+
+log = logging.getLogger(__name__)
+
+# Named regions and their member states: the federal regional commissions (several
+# only cover some counties), then areas batch files name as regions
+REGIONS: Dict[str, Tuple[str, ...]] = {
+    'ARC': ('AL', 'GA', 'KY', 'MD', 'MS', 'NY', 'NC', 'OH', 'PA', 'SC', 'TN', 'VA', 'WV'),
+    'DRA': ('AL', 'AR', 'IL', 'KY', 'LA', 'MS', 'MO', 'TN'),
+    'NBRC': ('ME', 'NH', 'VT', 'NY'),
+    'BAY_AREA': ('CA',),
+    'NEW_ENGLAND': ('CT', 'ME', 'MA', 'NH', 'RI', 'VT'),
+    'PACIFIC_NORTHWEST': ('OR', 'WA'),
+    'GREAT_LAKES': ('IL', 'IN', 'MI', 'MN', 'NY', 'OH', 'PA', 'WI'),
+}
+# Eligibility tags in batch files that name a region
+REGION_TAGS = {
+    'appalachian_region': 'ARC',
+    'appalachia': 'ARC',
+    'delta_region': 'DRA',
+    'northern_border': 'NBRC',
+    'appalachian_regional_commission': 'ARC',
+    'delta_regional_authority': 'DRA',
+    'northern_border_regional_commission': 'NBRC',
+    'san_francisco_bay_area': 'BAY_AREA',
+}
+
+ALL_KEY = 'ALL'
+
+
+def state_key(code: str) -> str:
+    return f"state:{code}"
+
+
+def region_key(name: str) -> str:
+    return f"region:{name}"
+
+
+def county_key(state: str, county: str) -> str:
+    return f"county:{state}:{county}"
+
+
+def _norm(s: str) -> str:
+    return re.sub(r'[^A-Z0-9]+', '_', str(s).upper()).strip('_')
+
+
+def _split(val) -> List[str]:
+    if isinstance(val, list):
+        return [str(v).strip() for v in val if str(v).strip()]
+    return [p.strip() for p in str(val or '').split(',') if p.strip()]
+
+
+def record_geography(rec: dict) -> List[str]:
+    """Geo keys for one batch JSON record. ['ALL'] when nothing restricts it."""
+    elig = rec.get('eligibility')
+    states: List[str] = []
+    keys: List[str] = []
+    if isinstance(elig, dict):
+        for s in _split(elig.get('states')):
+            code = s.upper()
+            if code == 'ALL':
+                states = []
+                break
+            if code in STATE_CODES:
+                states.append(code)
+            elif _norm(s).lower() in STATE_NAMES:
+                states.append(STATE_NAMES[_norm(s).lower()])
+        explicit = bool(states)
+        for r in _split(elig.get('regions')):
+            tag = _norm(r).lower()
+            name = REGION_TAGS.get(tag + '_region') or REGION_TAGS.get(tag) or _norm(r)
+            if name not in REGIONS:
+                # A key nothing looks up; without states the record stays nationwide
+                log.warning("unknown region %r in %r; add it to geo.REGIONS", r, rec.get('name'))
+                continue
+            keys.append(region_key(name))
+            if not explicit:
+                states.extend(REGIONS[name])
+        if len(states) == 1:
+            for c in _split(elig.get('counties')):
+                keys.append(county_key(states[0], _norm(c)))
+    elif isinstance(elig, list):
+        for tag in elig:
+            tag = str(tag).lower().strip()
+            if tag in REGION_TAGS:
+                name = REGION_TAGS[tag]
+                keys.append(region_key(name))
+                states.extend(REGIONS[name])
+            elif tag.endswith('_based') and tag[:-len('_based')] in STATE_NAMES:
+                states.append(STATE_NAMES[tag[:-len('_based')]])
+    states = list(dict.fromkeys(states))
+    if not states:
+        return [ALL_KEY] + keys
+    return [state_key(s) for s in states] + keys
+
+
+def eligible_states_value(keys: Iterable[str]) -> str:
+    """funding_sources.eligible_states for a set of geo keys: JSON list of codes or 'ALL'."""
+    states = [k.split(':', 1)[1] for k in keys if k.startswith('state:')]
+    return json.dumps(states) if states else 'ALL'
+
+
+class GeoIndex:
+    """Bitmap per geo key over catalog positions; decoded id sets are cached per key."""
+
+    def __init__(self, keys_by_source: Dict[int, List[str]], order: List[int]):
+        self._ids = order                               # bit position -> source_id
+        self.bitmaps: Dict[str, int] = {}
+        for pos, sid in enumerate(order):
+            for key in keys_by_source.get(sid) or (ALL_KEY,):
+                self.bitmaps[key] = self.bitmaps.get(key, 0) | (1 << pos)
+        nationwide = self.bitmaps.get(ALL_KEY, 0)
+        # Fold nationwide sources into every state so a state resolves in one lookup
+        for code in STATE_CODES:
+            self.bitmaps[state_key(code)] = self.bitmaps.get(state_key(code), 0) | nationwide
+        self._decoded: Dict[str, FrozenSet[int]] = {}
+
+    def bitmap(self, key: str) -> int:
+        return self.bitmaps.get(key, 0)
+
+    def ids(self, key: str) -> FrozenSet[int]:
+        """Source ids set in the bitmap for key."""
+        cached = self._decoded.get(key)
+        if cached is None:
+            bits = bin(self.bitmap(key))[:1:-1]        # LSB first
+            cached = self._decoded[key] = frozenset(
+                self._ids[pos] for pos, bit in enumerate(bits) if bit == '1'
+            )
+        return cached
+
+    def eligible_ids(self, state: str) -> Optional[FrozenSet[int]]:
+        """Sources open to a user in state (nationwide included); None when state is unknown."""
+        state = (state or '').strip().upper()
+        if state not in STATE_CODES:
+            return None
+        return self.ids(state_key(state))
@@ -0,0 +1,40 @@
+"""
+gunicorn settings, read from the working directory (start.sh, Procfile).
+
+The master preloads the catalog and forks the workers from it, so one worker per
+core costs one catalog's memory plus each worker's private pages (preload.py).
+PRELOAD_CATALOG=0 gives every worker its own copy, as before.
+
+Matches wait for admission (admission.py) in their request thread, so each worker
+gets enough threads for its running and queued matches plus two for other routes.
+"""
+
+import os
+
+from admission import CONCURRENCY, QUEUE_SIZE
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 0)) or CONCURRENCY + QUEUE_SIZE + 2
+timeout = 120
+preload_app = os.environ.get("PRELOAD_CATALOG", "1") != "0"
+
+
+def on_starting(server):
+    if preload_app:
+        import gc
+        gc.disable()
+
+
+def when_ready(server):
+    if preload_app:
+        from app import DB_PATH, _ensure_db
+        from preload import preload
+        _ensure_db()
+        server.log.info("Preloaded catalog for %d workers: %s", workers, preload(DB_PATH))
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from preload import after_fork
+        after_fork()
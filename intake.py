@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Progressive matching while the questionnaire is filled in.
+
+The form takes minutes: PROFILE (state), VISION (amount), IDENTITY (id, story),
+DETAILS (edu, time, cap). A session receives each step's answers and shrinks its
+candidate set as soon as an answer allows:
+
+    state   sources open in the user's state (geo index)
+    amount  sources whose amount range overlaps the user's (amount index)
+    id      sources restricted to identities the user did not select
+
+Once all three are known, the session also builds the profile's score segment
+(segments.py) from the survivors, with the form's defaults for the questions not
+answered yet. The build happens during the user's idle time; if the final DETAILS
+answers leave the segment unchanged, the submit ranks from that cached segment.
+The submit ranks only the survivors (engine.top_ids(among=)). That gives the same
+result as /api/match because every filter is applied again to them.
+
+Changing an answer that already narrowed the set starts the narrowing over. So
+does a new catalog version.
+
+Like match cursors, sessions are kept in the app's SQLite database
+(intake_sessions) so each step can reach any gunicorn worker. The prewarmed segment
+lives in one worker's segment cache; a step served elsewhere builds it there.
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+from engine import FundingMatchEngine, UserProfile
+from segments import cache_for, segment_key
+
+SESSION_TTL = float(os.environ.get("INTAKE_SESSION_TTL", 1800))
+# Answer keys that narrow the candidate set, in questionnaire order
+NARROWING_KEYS = ('state', 'amount', 'id')
+
+# Same definition as schema.sql; repeated here so DBs created before it existed pick it up
+SESSIONS_DDL = """
+CREATE TABLE IF NOT EXISTS intake_sessions (
+    token TEXT PRIMARY KEY,
+    answers TEXT NOT NULL,
+    catalog_version TEXT NOT NULL,
+    survivors TEXT,
+    applied TEXT NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 0,
+    touched REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_intake_sessions_touched ON intake_sessions(touched);
+"""
+
+
+@dataclass
+class IntakeSession:
+    """One questionnaire in progress."""
+    answers: dict
+    catalog_version: str = ''
+    survivors: Optional[Set[int]] = None        # None: not narrowed yet (every active source)
+    applied: Dict[str, object] = field(default_factory=dict)  # narrowing key -> profile value it used
+    prewarmed: Optional[tuple] = None           # segment key built ahead of the submit (this process)
+    touched: float = 0.0
+    revision: int = 0                           # bumped on every save; a stale local copy is reloaded
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)  # one step at a time
+
+    def update(self, engine: FundingMatchEngine, profile: UserProfile, answers: dict) -> None:
+        """Merge answers (profile is form_to_profile of the merged answers) and narrow."""
+        self.answers.update(answers)
+        values = {
+            'state': profile.location.get('state', ''),
+            'amount': tuple(profile.funding_needed),
+            'id': tuple(profile.identity_factors),
+        }
+        catalog = engine.catalog
+        if catalog.version != self.catalog_version or any(
+                values[k] != v for k, v in self.applied.items()):
+            self.catalog_version, self.survivors, self.applied = catalog.version, None, {}
+        for key in NARROWING_KEYS:
+            if key in self.applied or key not in self.answers:
+                continue
+            if key == 'state':
+                keep = catalog.geo_index.eligible_ids(values['state'])
+            elif key == 'amount':
+                keep = catalog.amount_index.overlapping(*profile.funding_needed)
+            else:
+                pool = catalog.sources if self.survivors is None else catalog.in_rank_order(self.survivors)
+                keep = {s.source_id for s in pool if not engine._lacks_required_identity(profile, s)}
+            if keep is not None:
+                keep = set(keep)  # never alias an index's own set
+                self.survivors = keep if self.survivors is None else self.survivors & keep
+            self.applied[key] = values[key]
+
+    @property
+    def narrowed(self) -> bool:
+        return len(self.applied) == len(NARROWING_KEYS)
+
+    def prewarm(self, engine: FundingMatchEngine, profile: UserProfile, now: datetime) -> bool:
+        """Build the profile's segment from the survivors unless already done; True if built now."""
+        key = segment_key(profile)
+        if not self.narrowed or key == self.prewarmed:
+            return False
+        cache_for(engine).get(engine, profile, now, self.survivors)
+        self.prewarmed = key
+        return True
+
+    def candidates(self, engine: FundingMatchEngine) -> int:
+        return len(engine.catalog) if self.survivors is None else len(self.survivors)
+
+
+class SessionStore:
+    """
+    Intake sessions in db_path's intake_sessions table, with a thread-safe LRU of
+    this process's recent sessions in front; a session expires ttl seconds after its
+    last update. A local copy is used only while its revision matches the stored
+    one, so a step saved by another worker is always seen. Without a db_path the
+    LRU is the only copy (single-process use).
+    """
+
+    def __init__(self, db_path: Optional[str] = None, ttl: float = SESSION_TTL, max_entries: int = 5000):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._sessions: "OrderedDict[str, IntakeSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        if not self._ready:
+            # Once per store; IF NOT EXISTS makes a repeat from a racing thread harmless
+            conn.executescript(SESSIONS_DDL)
+            self._ready = True
+        return conn
+
+    def _remember(self, token: str, session: IntakeSession) -> None:
+        with self._lock:
+            self._sessions[token] = session
+            self._sessions.move_to_end(token)
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+
+    def create(self) -> str:
+        token = secrets.token_urlsafe(12)
+        session = IntakeSession(answers={}, touched=time.time())
+        if self.db_path:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM intake_sessions WHERE touched < ?", (session.touched - self.ttl,))
+                conn.commit()
+            finally:
+                conn.close()
+            self.save(token, session)
+        self._remember(token, session)
+        return token
+
+    def save(self, token: str, session: IntakeSession) -> None:
+        """Store session after a step (call with session.lock held)."""
+        session.touched = time.time()
+        session.revision += 1
+        if not self.db_path:
+            return
+        survivors = None if session.survivors is None else json.dumps(sorted(session.survivors))
+        conn = self._connect()
+        try:
+            conn.execute("""
+                INSERT OR REPLACE INTO intake_sessions
+                    (token, answers, catalog_version, survivors, applied, revision, touched)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (token, json.dumps(session.answers), session.catalog_version, survivors,
+                  json.dumps(session.applied), session.revision, session.touched))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get(self, token: str) -> Optional[IntakeSession]:
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is not None:
+                self._sessions.move_to_end(token)
+        if self.db_path:
+            session = self._load(token, session)
+            if session is None:
+                with self._lock:
+                    self._sessions.pop(token, None)
+                return None
+            self._remember(token, session)
+        if session is None or time.time() - session.touched > self.ttl:
+            with self._lock:
+                self._sessions.pop(token, None)
+            return None
+        return session
+
+    def _load(self, token: str, local: Optional[IntakeSession]) -> Optional[IntakeSession]:
+        """The stored session; local if it is still current. None if there is none."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT revision FROM intake_sessions WHERE token = ?", (token,)).fetchone()
+            if row is None:
+                return None
+            if local is not None and local.revision == row[0]:
+                return local
+            row = conn.execute("""
+                SELECT answers, catalog_version, survivors, applied, revision, touched
+                FROM intake_sessions WHERE token = ?
+            """, (token,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        answers, version, survivors, applied, revision, touched = row
+        return IntakeSession(
+            answers=json.loads(answers),
+            catalog_version=version,
+            survivors=None if survivors is None else set(json.loads(survivors)),
+            # JSON turns the amount and identity tuples into lists; update() compares tuples
+            applied={k: tuple(v) if isinstance(v, list) else v for k, v in json.loads(applied).items()},
+            touched=touched,
+            revision=revision,
+        )
+
+    def pop(self, token: str) -> Optional[IntakeSession]:
+        session = self.get(token)
+        with self._lock:
+            self._sessions.pop(token, None)
+        if session is not None and self.db_path:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM intake_sessions WHERE token = ?", (token,))
+                conn.commit()
+            finally:
+                conn.close()
+        return session
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Job kinds run by the worker (jobs.py). Each handler takes (db_path, payload) and
+returns a JSON-able result stored on the job row.
+
+    load_batches  {"reload": bool, "force": bool}     seed, or hot-reload the catalog from the batch files
+    match_batch   {"profiles": [...], "max_results"}  rank several profiles (UserProfile dicts)
+    render_report {"report_id", "profile", "now", "source_ids"}
+    rematch       {"profile_id"?}                     rank one saved profile, or re-match all saved profiles
+                                                      against the sources changed since the last run
+    deadline_sweep {"now"?}                           deactivate expired sources, rebuild upcoming_deadlines
+                                                      (queued once per interval by deadlines.start_sweeper)
+"""
+
+from dataclasses import asdict
+from datetime import datetime
+from typing import Optional
+
+from catalog import get_catalog, refresh_catalog
+from engine import FundingMatchEngine, UserProfile
+from jobs import PRIORITY_LOW, enqueue, handler
+
+
+def profile_to_json(profile: UserProfile) -> dict:
+    return asdict(profile)
+
+
+def profile_from_json(d: dict) -> UserProfile:
+    d = dict(d)
+    d['funding_needed'] = tuple(d['funding_needed'])
+    return UserProfile(**d)
+
+
+def _when(value: Optional[str]) -> datetime:
+    return datetime.fromisoformat(value) if value else datetime.now()
+
+
+@handler('load_batches')
+def load_batches(db_path: str, payload: dict) -> dict:
+    """
+    Seed an empty catalog, or with reload=true build a new one from the batch files and
+    swap it in (catalog_reload.py; force=true accepts a much smaller catalog).
+    """
+    if payload.get('reload'):
+        from catalog_reload import reload_catalog
+        result = reload_catalog(db_path, force=bool(payload.get('force')))
+    else:
+        from load_batches import load_all_batches
+        loaded = load_all_batches(db_path)
+        refresh_catalog(db_path)
+        result = {"loaded": loaded}
+    # Saved profiles pick up what changed (incremental; see saved_profiles.py)
+    result["rematch_job_id"] = enqueue(db_path, 'rematch', {}, priority=PRIORITY_LOW)
+    return result
+
+
+@handler('match_batch')
+def match_batch(db_path: str, payload: dict) -> dict:
+    """Rank each profile; results carry source ids and scores (fetch details from /api/sources/<id>)."""
+    max_results = int(payload.get('max_results', 50))
+    now = _when(payload.get('now'))
+    engine = FundingMatchEngine(db_path, catalog=get_catalog(db_path))
+    results = []
+    for p in payload.get('profiles', []):
+        stats: dict = {}
+        ranked = engine.top_ids(profile_from_json(p), max_results, now, stats)
+        results.append({
+            "total": stats['total'],
+            "matches": [
+                {"source_id": sid, "overall_score": round(score, 1)}
+                for sid, score in ranked
+            ],
+        })
+    return {"catalog_version": engine.catalog.version, "results": results}
+
+
+@handler('render_report')
+def render_report(db_path: str, payload: dict) -> dict:
+    from reports import render_report as render, report_status
+    content_hash = render(
+        db_path, payload['report_id'], profile_from_json(payload['profile']),
+        _when(payload.get('now')), payload.get('source_ids'),
+    )
+    if content_hash is None:
+        # Raise so the queue retries; the report row already says 'failed' with the error
+        raise RuntimeError((report_status(db_path, payload['report_id']) or {}).get('error') or 'render failed')
+    return {"report_id": payload['report_id'], "content_hash": content_hash}
+
+
+@handler('rematch')
+def rematch(db_path: str, payload: dict) -> dict:
+    from saved_profiles import match_profile, rematch_saved
+    if payload.get('profile_id') is not None:
+        return match_profile(db_path, int(payload['profile_id']))
+    return rematch_saved(db_path)
+
+
+@handler('deadline_sweep')
+def deadline_sweep(db_path: str, payload: dict) -> dict:
+    from deadlines import run_sweep
+    return run_sweep(db_path, _when(payload.get('now')))
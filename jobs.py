@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Durable job queue in the app's SQLite database, plus the worker that drains it.
+
+Heavy work (batch reloads, batch matching, report rendering) is enqueued from
+request threads and run by a worker instead of on gunicorn's request threads.
+
+    python jobs.py worker [db]                  # run a worker process (start.sh)
+    python jobs.py enqueue <kind> [json] [db]   # e.g. enqueue load_batches '{"reload": true}'
+    python jobs.py status [db]                  # counts per kind and status
+
+Claiming a job sets locked_until = now + its visibility timeout; a job whose
+worker died is claimed again once that passes. Failures retry with exponential
+backoff up to max_attempts, then stay 'failed' with the last error. Higher
+priority first, then oldest.
+
+Each web process runs one worker thread itself (start_worker_thread) unless
+JOB_WORKER=external, which only start.sh sets: its supervised worker process
+shares the container and the SQLite file. A worker on another host would not see
+the queue. [db] defaults to DATABASE_PATH, as in app.py.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import traceback
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Priorities: interactive work (a user waiting on a report) ahead of bulk work
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -10
+
+JOBS_DDL = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT, -- JSON
+    priority INTEGER DEFAULT 0,
+    status TEXT DEFAULT 'queued', -- queued, running, done, failed
+    attempts INTEGER DEFAULT 0,
+    max_attempts INTEGER DEFAULT 3,
+    visibility_timeout INTEGER DEFAULT 300, -- seconds a claim lasts
+    run_after TIMESTAMP NOT NULL,
+    locked_until TIMESTAMP,
+    locked_by TEXT,
+    result TEXT, -- JSON
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP,
+    dedupe_key TEXT -- at most one job per key (enqueue(key=)); NULL for most jobs
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(status, priority DESC, job_id);
+"""
+# After the column exists (tables created before it get it in _connect)
+JOBS_KEY_DDL = "CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedupe_key ON jobs(dedupe_key)"
+
+_handlers: Dict[str, Callable[[str, dict], Any]] = {}
+
+
+def handler(kind: str):
+    """Register fn(db_path, payload) -> JSON-able result as the handler for kind."""
+    def register(fn):
+        _handlers[kind] = fn
+        return fn
+    return register
+
+
+def _stamp(dt: datetime) -> str:
+    return dt.isoformat(sep=' ', timespec='seconds')
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(JOBS_DDL)
+    if 'dedupe_key' not in {r[1] for r in conn.execute("PRAGMA table_info(jobs)")}:
+        try:
+            conn.execute("ALTER TABLE jobs ADD COLUMN dedupe_key TEXT")
+        except sqlite3.OperationalError:
+            pass  # another process added it first
+    conn.execute(JOBS_KEY_DDL)
+    return conn
+
+
+# =============================================================================
+# QUEUE
+# =============================================================================
+
+def enqueue(db_path: str, kind: str, payload: Optional[dict] = None, priority: int = PRIORITY_NORMAL,
+            max_attempts: int = 3, visibility_timeout: int = 300, key: Optional[str] = None) -> Optional[int]:
+    """
+    Add a job; returns its job_id. With a key, a job is only added if none with that key
+    was ever queued (atomic across processes); returns None otherwise.
+    """
+    conn = _connect(db_path)
+    try:
+        cur = conn.execute("""
+            INSERT OR IGNORE INTO jobs (kind, payload, priority, max_attempts, visibility_timeout, run_after, dedupe_key)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (kind, json.dumps(payload or {}), priority, max_attempts, visibility_timeout,
+              _stamp(datetime.now()), key))
+        conn.commit()
+        return cur.lastrowid if cur.rowcount else None
+    finally:
+        conn.close()
+
+
+def claim(conn: sqlite3.Connection, worker_id: str, now: Optional[datetime] = None) -> Optional[sqlite3.Row]:
+    """Take the next ready job (or one whose claim expired); None when the queue is empty."""
+    now = now or datetime.now()
+    stamp = _stamp(now)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("""
+            SELECT job_id, visibility_timeout FROM jobs
+            WHERE (status = 'queued' AND run_after <= ?)
+               OR (status = 'running' AND locked_until < ?)
+            ORDER BY priority DESC, job_id
+            LIMIT 1
+        """, (stamp, stamp)).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        locked_until = _stamp(now + timedelta(seconds=row['visibility_timeout']))
+        job = conn.execute("""
+            UPDATE jobs
+            SET status = 'running', attempts = attempts + 1, locked_by = ?, locked_until = ?
+            WHERE job_id = ?
+            RETURNING *
+        """, (worker_id, locked_until, row['job_id'])).fetchone()
+        conn.execute("COMMIT")
+        return job
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def complete(conn: sqlite3.Connection, job_id: int, worker_id: str, result: Any = None) -> None:
+    # locked_by guard: a worker whose claim expired must not overwrite the new owner's state
+    conn.execute("""
+        UPDATE jobs SET status = 'done', result = ?, error = NULL, locked_until = NULL,
+                        finished_at = CURRENT_TIMESTAMP
+        WHERE job_id = ? AND locked_by = ?
+    """, (json.dumps(result), job_id, worker_id))
+    conn.commit()
+
+
+def fail(conn: sqlite3.Connection, job: sqlite3.Row, worker_id: str, error: str,
+         now: Optional[datetime] = None) -> None:
+    """Retry with backoff (5s, 10s, 20s, ...) until max_attempts, then mark failed."""
+    now = now or datetime.now()
+    if job['attempts'] < job['max_attempts']:
+        retry_at = _stamp(now + timedelta(seconds=5 * 2 ** (job['attempts'] - 1)))
+        conn.execute("""
+            UPDATE jobs SET status = 'queued', run_after = ?, locked_until = NULL, error = ?
+            WHERE job_id = ? AND locked_by = ?
+        """, (retry_at, error, job['job_id'], worker_id))
+    else:
+        conn.execute("""
+            UPDATE jobs SET status = 'failed', locked_until = NULL, error = ?, finished_at = CURRENT_TIMESTAMP
+            WHERE job_id = ? AND locked_by = ?
+        """, (error, job['job_id'], worker_id))
+    conn.commit()
+
+
+def job_status(db_path: str, job_id: int) -> Optional[dict]:
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("""
+            SELECT job_id, kind, priority, status, attempts, max_attempts, result, error,
+                   created_at, finished_at
+            FROM jobs WHERE job_id = ?
+        """, (job_id,)).fetchone()
+        if row is None:
+            return None
+        out = dict(row)
+        out['result'] = json.loads(out['result']) if out['result'] else None
+        return out
+    finally:
+        conn.close()
+
+
+def queue_stats(db_path: str) -> Dict[str, Dict[str, int]]:
+    """{kind: {status: count}}"""
+    conn = _connect(db_path)
+    try:
+        stats: Dict[str, Dict[str, int]] = {}
+        for row in conn.execute("SELECT kind, status, COUNT(*) AS n FROM jobs GROUP BY kind, status"):
+            stats.setdefault(row['kind'], {})[row['status']] = row['n']
+        return stats
+    finally:
+        conn.close()
+
+
+# =============================================================================
+# WORKER
+# =============================================================================
+
+def run_one(conn: sqlite3.Connection, db_path: str, worker_id: str) -> bool:
+    """Claim and run one job. Returns False when there was nothing to do."""
+    job = claim(conn, worker_id)
+    if job is None:
+        return False
+    fn = _handlers.get(job['kind'])
+    try:
+        if fn is None:
+            raise ValueError(f"no handler for job kind {job['kind']!r}")
+        result = fn(db_path, json.loads(job['payload'] or '{}'))
+        complete(conn, job['job_id'], worker_id, result)
+    except Exception as e:
+        fail(conn, job, worker_id, f"{e}\n{traceback.format_exc(limit=5)}")
+    return True
+
+
+def work(db_path: str, poll_interval: float = 1.0, stop: Optional[threading.Event] = None) -> None:
+    """Drain the queue until stop is set; sleep poll_interval when idle."""
+    _load_handlers()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    stop = stop or threading.Event()
+    conn = _connect(db_path)
+    try:
+        while not stop.is_set():
+            try:
+                busy = run_one(conn, db_path, worker_id)
+            except sqlite3.OperationalError:
+                busy = False  # database locked by a writer; try again next poll
+            if not busy:
+                stop.wait(poll_interval)
+    finally:
+        conn.close()
+
+
+def drain(db_path: str) -> int:
+    """Run jobs in this thread until none are ready (CLI and tests). Returns jobs run."""
+    _load_handlers()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:drain"
+    conn = _connect(db_path)
+    try:
+        n = 0
+        while run_one(conn, db_path, worker_id):
+            n += 1
+        return n
+    finally:
+        conn.close()
+
+
+_thread_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+
+
+def start_worker_thread(db_path: str, poll_interval: float = 1.0) -> None:
+    """In-process worker for setups without `python jobs.py worker` (once per process)."""
+    global _thread
+    with _thread_lock:
+        if _thread is not None:
+            return
+        _thread = threading.Thread(target=work, args=(db_path, poll_interval),
+                                   name="job-worker", daemon=True)
+        _thread.start()
+
+
+def _load_handlers() -> None:
+    # Handler modules register themselves with @handler on import
+    import job_handlers  # noqa: F401
+
+
+if __name__ == '__main__':
+    import sys
+    args = sys.argv[1:]
+    cmd = args[0] if args else 'worker'
+    default_db = os.environ.get('DATABASE_PATH', str(BASE_DIR / 'data' / 'funding_finder.db'))
+    if cmd == 'worker':
+        db_path = args[1] if len(args) > 1 else default_db
+        print(f"job worker on {db_path}")
+        work(db_path, float(os.environ.get("JOB_POLL_INTERVAL", 1.0)))
+    elif cmd == 'enqueue':
+        kind = args[1]
+        payload = json.loads(args[2]) if len(args) > 2 else {}
+        db_path = args[3] if len(args) > 3 else default_db
+        print(f"job {enqueue(db_path, kind, payload)} queued")
+    elif cmd == 'status':
+        db_path = args[1] if len(args) > 1 else default_db
+        print(json.dumps(queue_stats(db_path), indent=2))
+    else:
+        sys.exit(f"unknown command: {cmd}")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Incremental JSON reader for catalog feeds.
+
+iter_json_records(path) yields the elements of a top-level JSON array, or the
+values of an NDJSON / concatenated-JSON file, one at a time. The file is read in
+CHUNK-sized pieces and only the unparsed tail is buffered, so memory stays at
+roughly one record plus one chunk whatever the file size.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Iterator, Union
+
+CHUNK = 256 * 1024
+_WS = ' \t\r\n'
+_decoder = json.JSONDecoder()
+
+
+class FeedFormatError(ValueError):
+    """The feed is not a JSON array or a sequence of JSON values."""
+
+
+def iter_json_records(path: Union[str, Path], chunk_size: int = CHUNK) -> Iterator[Any]:
+    with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        buf = ''
+        pos = 0
+        eof = False
+
+        def fill() -> bool:
+            """Append the next chunk (dropping consumed text); False at end of file."""
+            nonlocal buf, pos, eof
+            data = f.read(chunk_size)
+            if not data:
+                eof = True
+                return False
+            buf = buf[pos:] + data
+            pos = 0
+            return True
+
+        def skip(extra: str = '') -> None:
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in _WS + extra:
+                    pos += 1
+                if pos < len(buf) or not fill():
+                    return
+
+        skip()
+        in_array = pos < len(buf) and buf[pos] == '['
+        if in_array:
+            pos += 1
+            skip()
+            if pos < len(buf) and buf[pos] == ']':
+                return
+        while True:
+            skip()
+            if pos >= len(buf):
+                if in_array:
+                    raise FeedFormatError(f"{path}: unterminated JSON array")
+                return
+            while True:
+                try:
+                    value, end = _decoder.raw_decode(buf, pos)
+                    # A number cut at the chunk boundary ("-0.5e|10") decodes as a shorter one
+                    if eof or (end < len(buf) and (not isinstance(value, (int, float))
+                                                   or buf[end] in _WS + ',]')):
+                        break
+                except json.JSONDecodeError as e:
+                    if eof:
+                        raise FeedFormatError(f"{path}: {e}") from None
+                if not fill():
+                    continue  # eof: one last attempt on what is buffered
+            pos = end
+            yield value
+            if in_array:
+                skip()
+                if pos >= len(buf):
+                    raise FeedFormatError(f"{path}: unterminated JSON array")
+                if buf[pos] == ']':
+                    return
+                if buf[pos] != ',':
+                    raise FeedFormatError(f"{path}: expected ',' or ']' after element {value!r:.40}")
+                pos += 1
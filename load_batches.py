@@ -2,15 +2,36 @@
 """
 Load batch JSON files (batches 11-20 and compatible formats) into funding_sources table.
 Used for report generation and search so Funding Finder has the best data of its kind.
+Near-duplicate records across batches are merged into one row (dedupe.py); every
+input record is kept in source_provenance with the row it became.
+
+Files are parsed incrementally (jsonstream.py: JSON arrays or NDJSON), staged in a
+temp table in BATCH_SIZE inserts, and clustered from there, so a large partner
+feed never sits in memory whole. Progress is reported every PROGRESS_EVERY records.
+
+    python load_batches.py [db] [feed.json|feed.ndjson ...]   # default: the batch files
+
+On an empty database the files are loaded directly. On one that already has a
+catalog, feeds go through catalog_reload.py: a staged catalog of the batch files
+plus the feeds is validated and swapped in, deduplicated across both, with live
+source ids kept. Feed sources are carried across later reloads.
 """
 
+import hashlib
 import json
 import re
 import sqlite3
 from pathlib import Path
-from typing import List, Tuple, Optional, Any
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Any
+
+from dedupe import MAX_URL_SHARE, MatchKey, UnionFind, band_keys, is_duplicate, merge_rows, similarity
+from geo import record_geography, eligible_states_value
+from jsonstream import iter_json_records
+from migrations import analyze
 
 BASE_DIR = Path(__file__).resolve().parent
+BATCH_SIZE = 1000
+PROGRESS_EVERY = 10_000  # records between progress reports while a file streams
 
 
 def parse_funding_range(s: str) -> Tuple[Optional[float], Optional[float]]:
@@ -99,6 +120,7 @@ def batch_record_to_row(rec: dict) -> Optional[dict]:
         provider_type = 'state'
     else:
         provider_type = 'private'
+    geo_keys = record_geography(rec)
     return {
         'source_name': name[:500],
         'source_type': source_type[:50],
@@ -109,7 +131,8 @@ def batch_record_to_row(rec: dict) -> Optional[dict]:
         'typical_award': (min_a + max_a) / 2 if max_a else min_a,
         'application_deadline': None,
         'deadline_type': 'rolling',
-        'eligible_states': 'ALL',
+        'eligible_states': eligible_states_value(geo_keys),
+        'geo_keys': geo_keys,
         'eligible_project_types': '["business", "nonprofit"]',
         'eligible_fields': eligible_fields,
         'requirements_text': (requirements_text or rec.get('description') or '')[:2000],
@@ -123,8 +146,8 @@ def batch_record_to_row(rec: dict) -> Optional[dict]:
     }
 
 
-def find_batch_files() -> List[Path]:
-    """Find ALL batch funding source JSON files for search (batch_11..35+, BATCH_2..10, FIRST_100 → 3,500 sources)."""
+def batch_candidates() -> List[Path]:
+    """Batch file names in load order, before dropping duplicate contents (cheap: no reads)."""
     seen = set()
     found: List[Path] = []
     # batch_11, batch_12, ..., batch_20, batch_21, ... (any batch_*.json)
@@ -158,10 +181,161 @@ def find_batch_files() -> List[Path]:
     return found
 
 
-def load_all_batches(db_path: str) -> int:
+def find_batch_files() -> List[Path]:
+    """Find ALL batch funding source JSON files for search (batch_11..35+, BATCH_2..10, FIRST_100 → 3,500 records)."""
+    found = batch_candidates()
+    # Byte-identical copies under another name (e.g. "batch_12_funding_sources (1).json")
+    hashes = set()
+    unique: List[Path] = []
+    for p in found:
+        digest = hashlib.sha256(p.read_bytes()).hexdigest()
+        if digest not in hashes:
+            hashes.add(digest)
+            unique.append(p)
+    return unique
+
+
+GEOGRAPHY_DDL = """
+CREATE TABLE IF NOT EXISTS source_geography (
+    source_id INTEGER NOT NULL,
+    geo_key TEXT NOT NULL,
+    PRIMARY KEY (source_id, geo_key)
+);
+CREATE INDEX IF NOT EXISTS idx_source_geography_key ON source_geography(geo_key);
+"""
+
+PROVENANCE_DDL = """
+CREATE TABLE IF NOT EXISTS source_provenance (
+    source_id INTEGER NOT NULL, -- the (merged) funding_sources row this record became
+    batch_file TEXT NOT NULL,
+    record_index INTEGER NOT NULL, -- position in the batch file's JSON list
+    source_name TEXT,
+    provider_name TEXT,
+    application_url TEXT,
+    similarity REAL -- name-token Jaccard with the merged row (1.0 = same)
+);
+CREATE INDEX IF NOT EXISTS idx_source_provenance_source ON source_provenance(source_id);
+CREATE INDEX IF NOT EXISTS idx_source_provenance_record ON source_provenance(batch_file, record_index);
+"""
+
+
+STAGING_DDL = """
+CREATE TEMP TABLE batch_staging (
+    seq INTEGER PRIMARY KEY, -- 0-based position in load order
+    batch_file TEXT NOT NULL,
+    record_index INTEGER NOT NULL,
+    row TEXT NOT NULL, -- batch_record_to_row output, JSON
+    tokens TEXT, url TEXT, provider TEXT -- dedupe.MatchKey columns
+);
+CREATE TEMP TABLE batch_bands (
+    bucket INTEGER NOT NULL, -- dedupe.band_keys
+    seq INTEGER NOT NULL
+);
+"""
+# Built once everything is staged (cheaper than maintaining them row by row)
+STAGING_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS temp.idx_batch_staging_url ON batch_staging(url)",
+    "CREATE INDEX IF NOT EXISTS temp.idx_batch_bands_bucket ON batch_bands(bucket, seq)",
+)
+
+SOURCE_COLUMNS = (
+    'source_name', 'source_type', 'provider_name', 'provider_type',
+    'min_amount', 'max_amount', 'typical_award',
+    'application_deadline', 'deadline_type',
+    'eligible_states', 'eligible_project_types', 'eligible_fields',
+    'requirements_text', 'application_url', 'application_complexity',
+    'success_rate', 'number_awarded_last_year', 'quality_score', 'legitimacy_verified', 'active',
+)
+INSERT_SOURCE = (
+    f"INSERT INTO funding_sources (source_id, {', '.join(SOURCE_COLUMNS)}) "
+    f"VALUES (?, {', '.join('?' * len(SOURCE_COLUMNS))})"
+)
+
+# progress(file_name, records_read, rows_staged, error): every PROGRESS_EVERY records and at the end of a file
+Progress = Callable[[str, int, int, Optional[str]], None]
+
+
+def _stage_file(conn: sqlite3.Connection, path: Path, seq: int,
+                progress: Optional[Progress] = None) -> Tuple[int, int]:
+    """Stage one file's rows (and their LSH buckets) from seq on; returns (records read, rows staged)."""
+    rows: List[tuple] = []
+    bands: List[tuple] = []
+    records = staged = 0
+
+    def flush() -> None:
+        conn.executemany("INSERT INTO batch_staging VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.executemany("INSERT INTO batch_bands (bucket, seq) VALUES (?, ?)", bands)
+        rows.clear()
+        bands.clear()
+
+    for i, rec in enumerate(iter_json_records(path)):
+        records = i + 1
+        if progress and records % PROGRESS_EVERY == 0:
+            progress(path.name, records, staged, None)
+        row = batch_record_to_row(rec) if isinstance(rec, dict) else None
+        if not row:
+            continue
+        key = MatchKey.from_row(row)
+        rows.append((seq + staged, path.name, i, json.dumps(row)) + key.columns())
+        bands.extend((bucket, seq + staged) for bucket in band_keys(key))
+        staged += 1
+        if len(rows) >= BATCH_SIZE:
+            flush()
+    flush()
+    return records, staged
+
+
+def _cluster_staged(conn: sqlite3.Connection, n: int) -> UnionFind:
+    """dedupe.cluster over the staged rows: candidate pairs come from self-joins on LSH buckets and URLs."""
+    uf = UnionFind(n)
+    for ddl in STAGING_INDEXES:
+        conn.execute(ddl)
+    pairs = conn.execute("""
+        WITH url_share AS (
+            SELECT url, COUNT(*) AS n FROM batch_staging WHERE url != '' GROUP BY url
+        ), pairs AS (
+            SELECT a.seq AS i, b.seq AS j
+            FROM batch_bands a JOIN batch_bands b ON b.bucket = a.bucket AND b.seq > a.seq
+            UNION
+            SELECT a.seq, b.seq
+            FROM url_share u
+            JOIN batch_staging a ON a.url = u.url
+            JOIN batch_staging b ON b.url = u.url AND b.seq > a.seq
+            WHERE u.n <= ?
+        )
+        SELECT x.seq, x.tokens, x.url, x.provider, y.seq, y.tokens, y.url, y.provider,
+               CASE WHEN x.url = y.url THEN u.n ELSE 0 END
+        FROM pairs p
+        JOIN batch_staging x ON x.seq = p.i
+        JOIN batch_staging y ON y.seq = p.j
+        LEFT JOIN url_share u ON u.url = x.url
+    """, (MAX_URL_SHARE,))
+    for i, i_tokens, i_url, i_provider, j, j_tokens, j_url, j_provider, url_share in pairs:
+        if is_duplicate(MatchKey.from_columns(i_tokens, i_url, i_provider),
+                        MatchKey.from_columns(j_tokens, j_url, j_provider), url_share or 0):
+            uf.union(i, j)
+    return uf
+
+
+def _staged_rows(conn: sqlite3.Connection, seqs: Optional[Sequence[int]] = None) -> Iterator[Tuple[int, str, int, dict]]:
+    if seqs is None:
+        cur = conn.execute("SELECT seq, batch_file, record_index, row FROM batch_staging ORDER BY seq")
+    else:
+        cur = conn.execute(
+            f"SELECT seq, batch_file, record_index, row FROM batch_staging "
+            f"WHERE seq IN ({', '.join('?' * len(seqs))}) ORDER BY seq", list(seqs))
+    for seq, batch_file, record_index, row in cur:
+        yield seq, batch_file, record_index, json.loads(row)
+
+
+def load_all_batches(db_path: str, files: Optional[Sequence[Path]] = None,
+                     progress: Optional[Progress] = None) -> int:
     """
-    Load all batch JSON files into funding_sources. Returns count of rows inserted.
-    Idempotent: only inserts if table is empty (caller can truncate first for full reload).
+    Load all batch JSON files (or the given feed files) into funding_sources.
+    Returns count of rows inserted (one per cluster of near-duplicate records).
+    Idempotent: only inserts if table is empty; a loaded database takes new files
+    through catalog_reload.reload_catalog(feeds=...), as the command line does.
+    A file that fails to parse is skipped whole, as before streaming.
     """
     conn = sqlite3.connect(db_path)
     conn.row_factory = sqlite3.Row
@@ -169,46 +343,76 @@ def load_all_batches(db_path: str) -> int:
     if cur.fetchone()[0] > 0:
         conn.close()
         return 0
-    files = find_batch_files()
-    inserted = 0
-    for path in files:
-        try:
-            raw = path.read_text(encoding='utf-8', errors='replace')
-            data = json.loads(raw)
-        except Exception:
-            continue
-        if not isinstance(data, list):
-            continue
-        for rec in data:
-            if not isinstance(rec, dict):
-                continue
-            row = batch_record_to_row(rec)
-            if not row:
-                continue
+    try:
+        conn.executescript(GEOGRAPHY_DDL)
+        conn.executescript(PROVENANCE_DDL)
+        conn.executescript(STAGING_DDL)  # temp tables: private to this connection, gone on close
+
+        total = 0
+        for path in (find_batch_files() if files is None else [Path(p) for p in files]):
+            error = None
             try:
-                conn.execute("""
-                    INSERT INTO funding_sources (
-                        source_name, source_type, provider_name, provider_type,
-                        min_amount, max_amount, typical_award,
-                        application_deadline, deadline_type,
-                        eligible_states, eligible_project_types, eligible_fields,
-                        requirements_text, application_url, application_complexity,
-                        success_rate, number_awarded_last_year, quality_score, legitimacy_verified, active
-                    ) VALUES (
-                        :source_name, :source_type, :provider_name, :provider_type,
-                        :min_amount, :max_amount, :typical_award,
-                        :application_deadline, :deadline_type,
-                        :eligible_states, :eligible_project_types, :eligible_fields,
-                        :requirements_text, :application_url, :application_complexity,
-                        :success_rate, :number_awarded_last_year, :quality_score, :legitimacy_verified, :active
-                    )
-                """, row)
-                inserted += 1
-            except Exception:
-                continue
-    conn.commit()
-    conn.close()
-    return inserted
+                records, staged = _stage_file(conn, path, total, progress)
+            except Exception as e:
+                conn.execute("DELETE FROM batch_staging WHERE seq >= ?", (total,))
+                conn.execute("DELETE FROM batch_bands WHERE seq >= ?", (total,))
+                records, staged, error = 0, 0, str(e)
+            total += staged
+            if progress:
+                progress(path.name, records, staged, error)
+
+        uf = _cluster_staged(conn, total)
+        merged_into: Dict[int, List[int]] = {}
+        for seq in range(total):
+            leader = uf.find(seq)
+            if leader != seq:
+                merged_into.setdefault(leader, [leader]).append(seq)
+
+        next_id = conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) + 1 FROM sqlite_sequence WHERE name = 'funding_sources'"
+        ).fetchone()[0]
+        sources: List[tuple] = []
+        geography: List[tuple] = []
+        provenance: List[tuple] = []
+
+        def flush() -> None:
+            conn.executemany(INSERT_SOURCE, sources)
+            conn.executemany(
+                "INSERT OR IGNORE INTO source_geography (source_id, geo_key) VALUES (?, ?)", geography)
+            conn.executemany("""
+                INSERT INTO source_provenance
+                    (source_id, batch_file, record_index, source_name, provider_name, application_url, similarity)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, provenance)
+            sources.clear()
+            geography.clear()
+            provenance.clear()
+
+        inserted = 0
+        # One row per cluster, in staging order; merged clusters fetch their other members by seq
+        for seq, batch_file, record_index, row in _staged_rows(conn):
+            if uf.find(seq) != seq:
+                continue  # merged into an earlier row
+            members = (list(_staged_rows(conn, merged_into[seq])) if seq in merged_into
+                       else [(seq, batch_file, record_index, row)])
+            merged = merge_rows([m[3] for m in members])
+            sources.append((next_id,) + tuple(merged[c] for c in SOURCE_COLUMNS))
+            geography.extend((next_id, k) for k in merged['geo_keys'])
+            provenance.extend(
+                (next_id, m_file, m_index, m_row['source_name'], m_row['provider_name'],
+                 m_row['application_url'], round(similarity(m_row, merged), 3) if len(members) > 1 else 1.0)
+                for _, m_file, m_index, m_row in members
+            )
+            next_id += 1
+            inserted += 1
+            if len(sources) >= BATCH_SIZE:
+                flush()
+        flush()
+        conn.commit()
+        analyze(conn)
+        return inserted
+    finally:
+        conn.close()
 
 
 if __name__ == '__main__':
@@ -216,5 +420,26 @@ if __name__ == '__main__':
     db_path = sys.argv[1] if len(sys.argv) > 1 else str(BASE_DIR / 'data' / 'funding_finder.db')
     BASE_DIR.mkdir(exist_ok=True)
     (BASE_DIR / 'data').mkdir(exist_ok=True)
-    n = load_all_batches(db_path)
-    print(f"Inserted {n} funding sources from batch files.")
+    feeds = [Path(p) for p in sys.argv[2:] if p != '--force'] or None
+
+    def report(name: str, records: int, rows: int, error: Optional[str]) -> None:
+        print(f"  {name}: skipped ({error})" if error else f"  {name}: {records} records, {rows} rows")
+
+    conn = sqlite3.connect(db_path)
+    try:
+        loaded = conn.execute("SELECT COUNT(*) FROM funding_sources").fetchone()[0] > 0
+    except sqlite3.OperationalError:
+        loaded = False  # no schema yet
+    finally:
+        conn.close()
+    if feeds and loaded:
+        from catalog_reload import ReloadError, reload_catalog
+        try:
+            result = reload_catalog(db_path, force='--force' in sys.argv, feeds=feeds, progress=report)
+        except ReloadError as e:
+            sys.exit(f"feed rejected, live catalog unchanged: {e}")
+        print(f"Swapped in {result['checks']['sources']} sources (was {result['checks']['live_sources']}),"
+              f" {result['ids']['new_ids']} new.")
+    else:
+        n = load_all_batches(db_path, feeds, progress=report)
+        print(f"Inserted {n} funding sources from {'feed' if feeds else 'batch'} files.")
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test of the web app: replays realistic questionnaire submissions
+against /api/match at a fixed concurrency and reports throughput, latency
+percentiles, errors and worker saturation.
+
+    python loadtest.py --url http://127.0.0.1:5000 -c 16 -d 30      # a running app
+    python loadtest.py --start -c 16 -d 30 --workers 2 --threads 4   # start one here
+    python loadtest.py --start -c 32 -d 20 --sweep 1x4,2x4,2x8,4x4   # compare settings
+
+Each client thread submits a generated form (the fields form_to_profile reads:
+state, zip, amount, stage, id, vision, story, edu, time, cap), reads the whole
+streamed response, and with --page-rate follows next_cursor like the results
+page's "more" button. Requests in the first --warmup seconds are not counted.
+
+--start runs gunicorn with gunicorn.conf.py (--workers/--threads become
+WEB_CONCURRENCY/GUNICORN_THREADS) on a free local port; --server flask runs
+`python app.py` instead. Saturation is each server process's CPU use over the
+run (from /proc; 100% = one core, the most a worker can use with the GIL), for
+a started server or --server-pid. Stdlib only, so it runs anywhere the app does.
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# =============================================================================
+# TRAFFIC
+# =============================================================================
+
+# Rough population weights: big states send most of the traffic
+STATE_WEIGHTS = {
+    'CA': 12, 'TX': 9, 'FL': 7, 'NY': 6, 'PA': 4, 'IL': 4, 'OH': 3.5, 'GA': 3.3, 'NC': 3.2, 'MI': 3,
+    'NJ': 2.8, 'VA': 2.6, 'WA': 2.3, 'AZ': 2.2, 'TN': 2.1, 'MA': 2.1, 'IN': 2, 'MO': 1.8, 'MD': 1.8,
+    'WI': 1.8, 'CO': 1.7, 'MN': 1.7, 'SC': 1.6, 'AL': 1.5, 'LA': 1.4, 'KY': 1.4, 'OR': 1.3, 'OK': 1.2,
+    'CT': 1.1, 'UT': 1, 'IA': 1, 'NV': 1, 'AR': 0.9, 'MS': 0.9, 'KS': 0.9, 'NM': 0.6, 'NE': 0.6,
+    'ID': 0.6, 'WV': 0.5, 'HI': 0.4, 'NH': 0.4, 'ME': 0.4, 'MT': 0.3, 'RI': 0.3, 'DE': 0.3, 'SD': 0.3,
+    'ND': 0.2, 'AK': 0.2, 'DC': 0.2, 'VT': 0.2, 'WY': 0.2,
+}
+AMOUNTS = {'micro': 25, 'small': 40, 'medium': 25, 'large': 10}
+STAGES = {'concept': 30, 'planning': 35, 'launched': 20, 'growing': 15}
+IDENTITIES = {'woman': 40, 'minority': 25, 'veteran': 10, 'lgbtq': 8, 'disability': 7, 'first': 10}
+EDU = ['hs', 'some', 'assoc', 'voc', 'bach', 'grad']
+TIME = ['now', '3mo', '6mo', 'year']
+CAP = ['limited', 'moderate', 'full']
+VISIONS = [
+    "Community bakery with job training for young people",
+    "AI tools for underserved communities",
+    "Organic vegetable farm selling to local schools",
+    "Mobile coffee truck serving rural towns",
+    "Nonprofit after-school coding program",
+    "Hair salon and beauty supply store",
+    "Solar installation business for low-income homes",
+    "Indie video game studio",
+    "Daycare center in my neighborhood",
+    "Craft brewery and taproom",
+    "Documentary film about my hometown",
+    "Landscaping company with two trucks",
+    "Online store for handmade jewelry",
+    "Home health care agency",
+    "Research on drought-resistant crops",
+]
+STORIES = [
+    "",
+    "",
+    "First in my family to start a business.",
+    "I grew up in poverty and worked two jobs to save for this.",
+    "After leaving the military I want to build something for my community. "
+    "I have spent three years learning the trade and saving what I could.",
+    "I was in foster care as a kid and now mentor teens; this project gives them paid work "
+    "and a place to go after school while they learn real skills.",
+]
+
+
+def _pick(weights: Dict[str, float], rng: random.Random) -> str:
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def make_form(rng: random.Random) -> List[Tuple[str, str]]:
+    """One questionnaire submission as form fields (id repeats for several checkboxes)."""
+    ids: List[str] = []
+    if rng.random() < 0.45:
+        ids = list(dict.fromkeys(_pick(IDENTITIES, rng) for _ in range(rng.choice((1, 1, 2, 3)))))
+    fields = [
+        ('state', _pick(STATE_WEIGHTS, rng)),
+        ('city', ''),
+        ('zip', f"{rng.randrange(10000, 99999)}" if rng.random() < 0.6 else ''),
+        ('vision', rng.choice(VISIONS)),
+        ('story', rng.choice(STORIES)),
+        ('stage', _pick(STAGES, rng)),
+        ('amount', _pick(AMOUNTS, rng)),
+        ('edu', rng.choice(EDU)),
+        ('time', rng.choice(TIME)),
+        ('cap', rng.choice(CAP)),
+    ]
+    return fields + [('id', i) for i in ids]
+
+
+# =============================================================================
+# CLIENT
+# =============================================================================
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: List[float] = []     # seconds, 2xx only
+        self.statuses: Dict[str, int] = {}
+        self.pages = 0
+
+    def add(self, status: str, latency: float, page: bool) -> None:
+        with self.lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if status.startswith('2'):
+                self.latencies.append(latency)
+                self.pages += page
+
+
+def _client(host: str, port: int, rng: random.Random, page_rate: float, measure_from: float,
+            stop_at: float, results: Results, timeout: float) -> None:
+    conn: Optional[http.client.HTTPConnection] = None
+    next_cursor: Optional[str] = None
+    while time.time() < stop_at:
+        if conn is None:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        page = bool(next_cursor)
+        started = time.perf_counter()
+        try:
+            if page:
+                conn.request('GET', f"/api/match?cursor={next_cursor}")
+            else:
+                conn.request('POST', '/api/match', body=urlencode(make_form(rng)),
+                             headers={'Content-Type': 'application/x-www-form-urlencoded'})
+            resp = conn.getresponse()
+            body = resp.read()
+            status = str(resp.status)
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            conn = None
+            status, body = type(e).__name__, b''
+        latency = time.perf_counter() - started
+        next_cursor = None
+        if status == '200' and not page and rng.random() < page_rate:
+            try:
+                next_cursor = json.loads(body).get('next_cursor')
+            except ValueError:
+                pass
+        if time.time() >= measure_from:
+            results.add(status, latency, page)
+    if conn is not None:
+        conn.close()
+
+
+# =============================================================================
+# SERVER (--start) AND SATURATION
+# =============================================================================
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(server: str, workers: int, threads: int, db: Optional[str]) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads),
+               JOB_WORKER='external', CATALOG_WATCH_FILES='0')
+    if db:
+        env['DATABASE_PATH'] = db
+    if server == 'gunicorn':
+        cmd = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}']
+    else:
+        cmd = [sys.executable, 'app.py']
+    proc = subprocess.Popen(cmd, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            sys.exit(f"{server} exited: {proc.stderr.read().decode(errors='replace')[-2000:]}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/api/health')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return proc, url
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    sys.exit(f"{server} did not answer /api/health within 120 s")
+
+
+def stop_server(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def _process_tree(pid: int) -> List[int]:
+    try:
+        children = Path(f"/proc/{pid}/task/{pid}/children").read_text().split()
+    except OSError:
+        return [pid]
+    return [pid] + [int(c) for c in children]
+
+
+def _cpu_seconds(pid: int) -> Optional[float]:
+    try:
+        fields = Path(f"/proc/{pid}/stat").read_text().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')  # utime + stime
+
+
+class CpuSampler:
+    """CPU use of a server's processes (master and workers) between start() and stop()."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.before: Dict[int, float] = {}
+
+    def start(self) -> None:
+        self.started = time.time()
+        self.before = {p: c for p in _process_tree(self.pid) if (c := _cpu_seconds(p)) is not None}
+
+    def stop(self) -> Dict[int, float]:
+        """Percent of one core per process (workers only when the server has any)."""
+        wall = time.time() - self.started
+        pids = _process_tree(self.pid)
+        workers = pids[1:] or pids
+        out = {}
+        for p in workers:
+            now = _cpu_seconds(p)
+            if now is not None and p in self.before:
+                out[p] = round(100 * (now - self.before[p]) / wall, 1)
+        return out
+
+
+# =============================================================================
+# RUN AND REPORT
+# =============================================================================
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+
+def run(url: str, concurrency: int, duration: float, warmup: float, page_rate: float,
+        seed: int, timeout: float, server_pid: Optional[int] = None) -> dict:
+    parts = urlsplit(url)
+    host, port = parts.hostname or '127.0.0.1', parts.port or 80
+    results = Results()
+    start = time.time()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+    sampler = CpuSampler(server_pid) if server_pid else None
+    threads = [
+        threading.Thread(target=_client, daemon=True, args=(
+            host, port, random.Random(seed * 1000 + i), page_rate, measure_from, stop_at, results, timeout))
+        for i in range(concurrency)
+    ]
+    for t in threads:
+        t.start()
+    if sampler:
+        time.sleep(max(0.0, measure_from - time.time()))
+        sampler.start()
+    for t in threads:
+        t.join()
+    saturation = sampler.stop() if sampler else {}
+    lat = sorted(results.latencies)
+    total = sum(results.statuses.values())
+    ok = len(lat)
+    return {
+        "concurrency": concurrency,
+        "duration_s": duration,
+        "requests": total,
+        "throughput_rps": round(ok / duration, 1),
+        "error_rate": round((total - ok) / total, 4) if total else 0.0,
+        "statuses": results.statuses,
+        "pages": results.pages,
+        "latency_ms": {name: round(percentile(lat, q) * 1000, 1)
+                       for name, q in (("p50", 50), ("p90", 90), ("p95", 95), ("p99", 99), ("max", 100))},
+        "worker_cpu_pct": saturation,
+    }
+
+
+def print_report(label: str, r: dict) -> None:
+    lat = r["latency_ms"]
+    print(f"{label}: {r['requests']} requests in {r['duration_s']:g}s at concurrency {r['concurrency']}")
+    print(f"  throughput  {r['throughput_rps']} req/s ({r['pages']} cursor pages)")
+    print(f"  latency     p50 {lat['p50']} ms  p90 {lat['p90']} ms  p95 {lat['p95']} ms  "
+          f"p99 {lat['p99']} ms  max {lat['max']} ms")
+    print(f"  errors      {r['error_rate']:.2%}  {json.dumps(r['statuses'])}")
+    if r["worker_cpu_pct"]:
+        cpu = r["worker_cpu_pct"]
+        busy = sum(1 for v in cpu.values() if v >= 90)
+        print(f"  saturation  worker CPU % of a core: {sorted(cpu.values(), reverse=True)} "
+              f"({busy}/{len(cpu)} workers at >= 90%)")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip(),
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--url', default='http://127.0.0.1:5000', help='app to test (ignored with --start)')
+    ap.add_argument('--start', action='store_true', help='start the app here for the run')
+    ap.add_argument('--server', choices=('gunicorn', 'flask'), default='gunicorn')
+    ap.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    ap.add_argument('--threads', type=int, default=4)
+    ap.add_argument('--sweep', help='comma-separated WORKERSxTHREADS settings to compare (implies --start)')
+    ap.add_argument('--db', help='DATABASE_PATH for a started app')
+    ap.add_argument('--server-pid', type=int, help='pid of a running server, for saturation')
+    ap.add_argument('-c', '--concurrency', type=int, default=16)
+    ap.add_argument('-d', '--duration', type=float, default=30)
+    ap.add_argument('--warmup', type=float, default=3)
+    ap.add_argument('--page-rate', type=float, default=0.2, help='share of results followed to page 2')
+    ap.add_argument('--timeout', type=float, default=130, help='per request (gunicorn kills at 120 s)')
+    ap.add_argument('--slo', type=float, default=1000, help='p99 ms a recommended setting must meet')
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--json', help='also write the results here')
+    args = ap.parse_args()
+
+    if args.sweep and args.server != 'gunicorn':
+        ap.error("--sweep compares gunicorn settings; drop --server flask")
+    settings = [tuple(int(x) for x in s.split('x')) for s in args.sweep.split(',')] if args.sweep else None
+    reports = []
+    if settings or args.start:
+        for workers, threads in settings or [(args.workers, args.threads)]:
+            proc, url = start_server(args.server, workers, threads, args.db)
+            try:
+                r = run(url, args.concurrency, args.duration, args.warmup, args.page_rate,
+                        args.seed, args.timeout, proc.pid)
+            finally:
+                stop_server(proc)
+            r["setting"] = f"{workers}x{threads}" if args.server == 'gunicorn' else 'flask'
+            print_report(f"{args.server} {r['setting']}", r)
+            reports.append(r)
+    else:
+        r = run(args.url, args.concurrency, args.duration, args.warmup, args.page_rate,
+                args.seed, args.timeout, args.server_pid)
+        r["setting"] = args.url
+        print_report(args.url, r)
+        reports.append(r)
+
+    if len(reports) > 1:
+        print(f"\n{'setting':<10} {'req/s':>8} {'p50':>8} {'p99':>8} {'errors':>8}")
+        for r in reports:
+            print(f"{r['setting']:<10} {r['throughput_rps']:>8} {r['latency_ms']['p50']:>8} "
+                  f"{r['latency_ms']['p99']:>8} {r['error_rate']:>8.2%}")
+        fits = [r for r in reports if r['latency_ms']['p99'] <= args.slo and r['error_rate'] < 0.01]
+        if fits:
+            best = max(fits, key=lambda r: r['throughput_rps'])
+            workers, threads = best['setting'].split('x')
+            print(f"best within p99 <= {args.slo:g} ms: {best['setting']} "
+                  f"(WEB_CONCURRENCY={workers} GUNICORN_THREADS={threads})")
+        else:
+            print(f"no setting kept p99 <= {args.slo:g} ms with < 1% errors at concurrency {args.concurrency}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(reports, indent=2))
+
+
+if __name__ == '__main__':
+    main()
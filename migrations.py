@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Schema migrations and planner statistics.
+
+schema.sql describes a new database and stamps PRAGMA user_version with
+SCHEMA_VERSION. migrate() brings a database created from an older schema.sql up
+to date, step by step, and records each step in user_version. Steps check what
+already exists, so a half-applied one can simply run again.
+
+Version 1:
+  - Generated (virtual) columns on funding_sources for values that otherwise
+    need Python parsing:
+      amount_lo, amount_hi    amount range as AmountIndex reads it (both 0 when no max is known)
+      states_open             1 when eligible_states is empty or 'ALL'
+    The engine's no-catalog path filters on them (engine._get_active_sources).
+  - Indexes for the SQL access patterns (ACCESS_PATTERNS):
+      idx_funding_sources_rank    (active, quality_score DESC, source_id, updated_at)
+                                  covers the catalog refresh scan and the active count, and
+                                  gives the engine's no-catalog path its order without a sort
+      idx_funding_sources_amount  (amount_hi, amount_lo) WHERE active = 1: amount overlap
+  - Drops idx_funding_sources_active, a prefix of idx_funding_sources_rank.
+
+Version 2 (saved profiles, saved_profiles.py):
+  - user_profiles.profile_json (the full UserProfile), top_k, matched_at
+  - funding_matches.updated_at, notified_at; one row per (profile_id, source_id)
+  - rematch_sources: each source's fingerprint at the last incremental re-match
+
+Version 3:
+  - Drops funding_sources.fields_open, a generated column version 1 added that no
+    query read.
+
+analyze() refreshes sqlite_stat1 so the planner knows these indexes' selectivity.
+It runs after every catalog load (load_batches, the hot reload swap, foreign dumps).
+
+    python migrations.py [path/to/funding_finder.db] [--explain]
+--explain prints each access pattern's query plan and timing before and after.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+SCHEMA_VERSION = 3
+
+# Same expressions as schema.sql
+GENERATED_COLUMNS = {
+    "amount_lo": """REAL GENERATED ALWAYS AS (
+        CASE WHEN coalesce(max_amount, 0) > 0 THEN min(coalesce(min_amount, 0), max_amount) ELSE 0 END) VIRTUAL""",
+    "amount_hi": """REAL GENERATED ALWAYS AS (
+        CASE WHEN coalesce(max_amount, 0) > 0 THEN max(coalesce(min_amount, 0), max_amount) ELSE 0 END) VIRTUAL""",
+    "states_open": """INTEGER GENERATED ALWAYS AS (
+        CASE WHEN trim(coalesce(eligible_states, '')) IN ('', '[]') OR upper(trim(eligible_states)) = 'ALL' THEN 1
+             WHEN json_valid(eligible_states) THEN instr(lower(eligible_states), '"all"') > 0
+             ELSE 0 END) VIRTUAL""",
+}
+
+INDEXES_V1 = """
+CREATE INDEX IF NOT EXISTS idx_funding_sources_rank
+    ON funding_sources(active, quality_score DESC, source_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_funding_sources_amount
+    ON funding_sources(amount_hi, amount_lo) WHERE active = 1;
+DROP INDEX IF EXISTS idx_funding_sources_active;
+"""
+
+# name -> (query, legacy query for a database without the generated columns, params)
+ACCESS_PATTERNS: Dict[str, Tuple[str, Optional[str], tuple]] = {
+    "catalog refresh (catalog.py)": (
+        "SELECT source_id, updated_at FROM funding_sources WHERE active = 1 ORDER BY quality_score DESC",
+        None, ()),
+    "engine without catalog, 5k-25k in TN (engine._get_active_sources)": (
+        "SELECT * FROM funding_sources WHERE active = 1"
+        " AND (amount_hi = 0 OR (amount_hi >= ? AND amount_lo <= ?))"
+        " AND (states_open = 1 OR instr(upper(eligible_states), ?) > 0) ORDER BY quality_score DESC",
+        "SELECT * FROM funding_sources WHERE active = 1"
+        " AND (coalesce(max_amount, 0) <= 0 OR (max(coalesce(min_amount, 0), max_amount) >= ?"
+        " AND min(coalesce(min_amount, 0), max_amount) <= ?))"
+        " AND (upper(trim(coalesce(eligible_states, ''))) IN ('', '[]', 'ALL')"
+        " OR instr(upper(eligible_states), ?) > 0) ORDER BY quality_score DESC",
+        (5000, 25000, '"TN"')),
+    "active count (/api/stats, reload checks)": (
+        "SELECT count(*) FROM funding_sources WHERE active = 1",
+        None, ()),
+    "amount overlap 5k-25k": (
+        "SELECT source_id FROM funding_sources WHERE active = 1 AND amount_hi >= ? AND amount_lo <= ?",
+        "SELECT source_id FROM funding_sources WHERE active = 1"
+        " AND coalesce(max_amount, 0) > 0 AND max(coalesce(min_amount, 0), max_amount) >= ?"
+        " AND min(coalesce(min_amount, 0), max_amount) <= ?",
+        (5000, 25000)),
+    "expired one-time sources (deadlines sweep)": (
+        "SELECT source_id FROM funding_sources WHERE active = 1 AND application_deadline IS NOT NULL"
+        " AND application_deadline < ? AND deadline_type = 'one-time'",
+        None, ('2026-01-01',)),
+}
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> Set[str]:
+    # table_xinfo also lists generated columns (table_info hides them)
+    return {r[1] for r in conn.execute(f"PRAGMA table_xinfo({table})")}
+
+
+def _v1(conn: sqlite3.Connection) -> None:
+    have = _columns(conn, "funding_sources")
+    for name, decl in GENERATED_COLUMNS.items():
+        if name not in have:
+            conn.execute(f"ALTER TABLE funding_sources ADD COLUMN {name} {decl}")
+    conn.executescript(INDEXES_V1)
+
+
+PROFILE_COLUMNS = {
+    "profile_json": "TEXT",
+    "top_k": "INTEGER DEFAULT 50",
+    "matched_at": "TIMESTAMP",
+}
+MATCH_COLUMNS = {
+    "updated_at": "TIMESTAMP",
+    "notified_at": "TIMESTAMP",
+}
+
+# Same definitions as schema.sql
+SAVED_DDL = """
+CREATE TABLE IF NOT EXISTS rematch_sources (
+    source_id INTEGER PRIMARY KEY,
+    fingerprint TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_funding_matches_profile_source ON funding_matches(profile_id, source_id);
+CREATE INDEX IF NOT EXISTS idx_funding_matches_unnotified ON funding_matches(user_id) WHERE notified_at IS NULL;
+"""
+
+
+def _v2(conn: sqlite3.Connection) -> None:
+    for table, columns in (("user_profiles", PROFILE_COLUMNS), ("funding_matches", MATCH_COLUMNS)):
+        have = _columns(conn, table)
+        for name, decl in columns.items():
+            if name not in have:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+    conn.executescript(SAVED_DDL)
+
+
+def _v3(conn: sqlite3.Connection) -> None:
+    if "fields_open" in _columns(conn, "funding_sources"):
+        conn.execute("ALTER TABLE funding_sources DROP COLUMN fields_open")
+
+
+MIGRATIONS = [(1, _v1), (2, _v2), (3, _v3)]
+
+
+def migrate(conn: sqlite3.Connection) -> List[int]:
+    """Apply the pending steps; returns the versions applied."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return []
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'funding_sources'").fetchone():
+        return []  # no catalog yet; schema.sql will create the current layout
+    applied = []
+    for step, apply in MIGRATIONS:
+        if step <= version:
+            continue
+        apply(conn)
+        conn.execute(f"PRAGMA user_version = {step}")
+        conn.commit()
+        applied.append(step)
+    if applied:
+        analyze(conn)
+    return applied
+
+
+def analyze(conn: sqlite3.Connection) -> None:
+    """
+    Refresh the planner statistics (after a load changed the catalog). A full pass:
+    sampled statistics (analysis_limit) misjudged active = 1 and kept the amount index unused.
+    """
+    conn.execute("ANALYZE")
+    conn.commit()
+
+
+_migrated: Set[str] = set()
+_migrated_lock = threading.Lock()
+
+
+def ensure_migrated(db_path: str) -> None:
+    """
+    migrate() once per process per database, and switch it to WAL so readers are
+    not blocked while a writer (e.g. a catalog swap) holds its transaction.
+    """
+    with _migrated_lock:
+        if db_path in _migrated:
+            return
+        conn = sqlite3.connect(db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")  # persistent: stored in the file
+            migrate(conn)
+        finally:
+            conn.close()
+        _migrated.add(db_path)
+
+
+# =============================================================================
+# QUERY PLANS
+# =============================================================================
+
+def query_plans(conn: sqlite3.Connection, repeat: int = 20) -> Dict[str, dict]:
+    """EXPLAIN QUERY PLAN and mean time (ms) of each access pattern on this database."""
+    generated = "amount_hi" in _columns(conn, "funding_sources")
+    out = {}
+    for name, (sql, legacy, params) in ACCESS_PATTERNS.items():
+        sql = sql if generated or legacy is None else legacy
+        plan = [r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        started = time.perf_counter()
+        for _ in range(repeat):
+            rows = len(conn.execute(sql, params).fetchall())
+        out[name] = {"plan": plan, "rows": rows, "ms": (time.perf_counter() - started) * 1000 / repeat}
+    return out
+
+
+def _print_plans(title: str, plans: Dict[str, dict]) -> None:
+    print(title)
+    for name, p in plans.items():
+        print(f"  {name}: {p['rows']} rows, {p['ms']:.2f} ms")
+        for step in p["plan"]:
+            print(f"      {step}")
+
+
+if __name__ == '__main__':
+    import sys
+    args = [a for a in sys.argv[1:] if a != '--explain']
+    db_path = args[0] if args else str(BASE_DIR / 'data' / 'funding_finder.db')
+    conn = sqlite3.connect(db_path)
+    try:
+        if '--explain' in sys.argv:
+            _print_plans(f"before (user_version {conn.execute('PRAGMA user_version').fetchone()[0]}):",
+                         query_plans(conn))
+        applied = migrate(conn)
+        print(f"applied: {applied or 'nothing, already at version %d' % SCHEMA_VERSION}")
+        if '--explain' in sys.argv:
+            _print_plans("after:", query_plans(conn))
+    finally:
+        conn.close()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Preloading the catalog in the gunicorn master so workers share it copy-on-write.
+
+Without preload every worker builds its own catalog snapshot, indexes and
+keyword postings. With it (gunicorn.conf.py, PRELOAD_CATALOG=1, the default) the
+master builds them once and forks the workers:
+    on_starting  gc.disable(): no collections while the long-lived objects are
+                 built, so they are not interleaved with freed holes
+    when_ready   preload(): build everything, close the master's SQLite
+                 connections (they must not cross fork), gc.freeze() what is left
+    post_fork    after_fork(): gc.enable() in the worker; frozen objects are
+                 never traversed by its collector, so GC does not dirty their pages
+
+Refcount updates still copy the pages of objects a worker touches, so the
+sharing is partial. memory_report() shows what each process actually shares,
+from /proc/<pid>/smaps_rollup (Linux only; None elsewhere):
+    python preload.py [master_pid]
+"""
+
+import gc
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from catalog import get_catalog, release_connections
+from engine import FundingMatchEngine
+
+SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def preload(db_path: str) -> dict:
+    """Build the catalog snapshot and segment postings, then freeze them for forking."""
+    from segments import cache_for
+    catalog = get_catalog(db_path)
+    engine = FundingMatchEngine(db_path, catalog=catalog)
+    try:
+        cache_for(engine)  # keyword postings and field tags for this snapshot
+    finally:
+        engine.close()
+    release_connections()
+    gc.collect()
+    gc.freeze()
+    return {"sources": len(catalog), "catalog_version": catalog.version, "frozen": gc.get_freeze_count()}
+
+
+def after_fork() -> None:
+    """First thing in a forked worker."""
+    gc.enable()
+
+
+# =============================================================================
+# MEMORY REPORT
+# =============================================================================
+
+def process_memory(pid: int) -> Optional[Dict[str, int]]:
+    """KiB per SMAPS_FIELDS for pid, plus shared/private totals; None if unavailable."""
+    try:
+        text = Path(f"/proc/{pid}/smaps_rollup").read_text()
+    except OSError:
+        return None
+    out = {k: 0 for k in SMAPS_FIELDS}
+    for line in text.splitlines():
+        key, _, rest = line.partition(':')
+        if key in out:
+            out[key] = int(rest.split()[0])
+    out['shared'] = out['Shared_Clean'] + out['Shared_Dirty']
+    out['private'] = out['Private_Clean'] + out['Private_Dirty']
+    return out
+
+
+def _children(pid: int) -> List[int]:
+    try:
+        return [int(c) for c in Path(f"/proc/{pid}/task/{pid}/children").read_text().split()]
+    except OSError:
+        return []
+
+
+def memory_report(master_pid: Optional[int] = None) -> List[dict]:
+    """
+    One entry per process: the master (default: this process's parent, i.e. the
+    gunicorn master when called from a worker) and each of its children.
+    """
+    master_pid = master_pid or os.getppid()
+    out = []
+    for role, pid in [('master', master_pid)] + [('worker', c) for c in _children(master_pid)]:
+        mem = process_memory(pid)
+        if mem is not None:
+            out.append(dict(mem, pid=pid, role=role, current=pid == os.getpid()))
+    return out
+
+
+if __name__ == '__main__':
+    import sys
+    rows = memory_report(int(sys.argv[1]) if len(sys.argv) > 1 else os.getpid())
+    if not rows:
+        sys.exit("no /proc/<pid>/smaps_rollup here (Linux only)")
+    print(f"{'pid':>8} {'role':<7} {'rss':>9} {'pss':>9} {'shared':>9} {'private':>9}  (KiB)")
+    for r in rows:
+        print(f"{r['pid']:>8} {r['role']:<7} {r['Rss']:>9} {r['Pss']:>9} {r['shared']:>9} {r['private']:>9}")
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+On-demand CPU profiles of /api/match.
+
+A request is profiled when an admin asks for it (X-Profile: 1 with a valid
+X-Admin-Token) or when it is sampled (PROFILE_SAMPLE_RATE, a fraction, default
+0). Only then does cProfile wrap the engine work (ranking plus the re-scored page);
+otherwise the request pays for one comparison.
+
+Each profile is stored in request_profiles: wall time, a JSON summary (top
+functions by cumulative time, plus every engine.py / segments.py function) and
+the raw pstats data, which downloads as a .prof file for pstats or snakeviz.
+Only the newest PROFILE_KEEP (default 200) are kept.
+
+    python profiling.py [path/to/funding_finder.db]    # slowest stored profiles
+"""
+
+import cProfile
+import json
+import marshal
+import os
+import random
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+KEEP = int(os.environ.get("PROFILE_KEEP", 200))
+TOP_FUNCTIONS = 30
+# Functions in these files are reported on their own: _score_match's layers and the cached segment path
+LAYER_FILES = ('engine.py', 'segments.py')
+
+# Same definition as schema.sql; repeated here so DBs created before it existed pick it up
+PROFILES_DDL = """
+CREATE TABLE IF NOT EXISTS request_profiles (
+    profile_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    label TEXT,
+    trigger TEXT,
+    elapsed_ms REAL,
+    summary TEXT,
+    stats BLOB,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_request_profiles_elapsed ON request_profiles(elapsed_ms);
+"""
+
+
+def sampled() -> bool:
+    """True for about SAMPLE_RATE of calls; always False (no random draw) when sampling is off."""
+    return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+
+def _function_name(key: Tuple[str, int, str]) -> str:
+    filename, line, name = key
+    if filename == '~':
+        return name  # builtin
+    return f"{name} ({Path(filename).name}:{line})"
+
+
+def summarize(stats: Dict[tuple, tuple]) -> Dict[str, List[dict]]:
+    """Top functions by cumulative time and the engine layers, times in ms."""
+    def entry(key, value):
+        _, calls, tottime, cumtime, _ = value
+        return {"function": _function_name(key), "calls": calls,
+                "tottime_ms": round(tottime * 1000, 3), "cumtime_ms": round(cumtime * 1000, 3)}
+
+    ranked = sorted(stats.items(), key=lambda kv: kv[1][3], reverse=True)
+    layers = [kv for kv in ranked if Path(kv[0][0]).name in LAYER_FILES]
+    return {
+        "top": [entry(k, v) for k, v in ranked[:TOP_FUNCTIONS]],
+        "layers": [entry(k, v) for k, v in layers],
+    }
+
+
+def profiled(db_path: str, label: str, trigger: str, fn: Callable[[], Any]) -> Tuple[Any, int]:
+    """Run fn under cProfile, store the profile; returns (fn's result, profile_id)."""
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        result = fn()
+    finally:
+        profiler.disable()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    profiler.create_stats()
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.executescript(PROFILES_DDL)
+        profile_id = conn.execute("""
+            INSERT INTO request_profiles (label, trigger, elapsed_ms, summary, stats)
+            VALUES (?, ?, ?, ?, ?)
+        """, (label, trigger, round(elapsed_ms, 3), json.dumps(summarize(profiler.stats)),
+              marshal.dumps(profiler.stats))).lastrowid
+        conn.execute("DELETE FROM request_profiles WHERE profile_id <= ?", (profile_id - KEEP,))
+        conn.commit()
+    finally:
+        conn.close()
+    return result, profile_id
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(PROFILES_DDL)
+    return conn
+
+
+def slowest_profiles(db_path: str, limit: int = 20) -> List[dict]:
+    """Stored profiles, slowest first, each with its five costliest functions."""
+    conn = _connect(db_path)
+    try:
+        rows = conn.execute("""
+            SELECT profile_id, label, trigger, elapsed_ms, summary, created_at
+            FROM request_profiles ORDER BY elapsed_ms DESC LIMIT ?
+        """, (limit,)).fetchall()
+    finally:
+        conn.close()
+    out = []
+    for r in rows:
+        item = dict(r)
+        item["top"] = json.loads(item.pop("summary"))["top"][:5]
+        out.append(item)
+    return out
+
+
+def get_profile(db_path: str, profile_id: int) -> Optional[dict]:
+    """Metadata and full summary of one profile (no raw stats)."""
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("""
+            SELECT profile_id, label, trigger, elapsed_ms, summary, created_at
+            FROM request_profiles WHERE profile_id = ?
+        """, (profile_id,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    item = dict(row)
+    item["summary"] = json.loads(item["summary"])
+    return item
+
+
+def profile_stats(db_path: str, profile_id: int) -> Optional[bytes]:
+    """Raw pstats data (marshal), the format pstats.Stats(path) loads."""
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("SELECT stats FROM request_profiles WHERE profile_id = ?", (profile_id,)).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+if __name__ == '__main__':
+    import sys
+    db_path = sys.argv[1] if len(sys.argv) > 1 else str(BASE_DIR / 'data' / 'funding_finder.db')
+    for p in slowest_profiles(db_path):
+        print(f"#{p['profile_id']:<6} {p['elapsed_ms']:9.1f} ms  {p['trigger']:<7} {p['label']}  {p['created_at']}")
+        for f in p["top"]:
+            print(f"          {f['cumtime_ms']:9.1f} ms  {f['function']}")
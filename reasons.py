@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Match explanations as reason codes.
+
+The engine records why a source matched, what an application may still need and
+what makes the user a strong candidate as codes with parameters, e.g.
+('amount_fits', 5000.0, 25000.0), on Match.match_reasons / eligibility_gaps /
+competitive_advantages. Codes without parameters are shared module constants, so
+scoring builds no strings. funding_matches stores the codes (encode / decode).
+
+Text is rendered only when a match is shown (serialize.py, the report template,
+saved profile reads): explain() formats each code's template for the requested
+language, falling back to English. A language is one more MESSAGES entry.
+"""
+
+from functools import lru_cache
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+Reason = Tuple  # (code, *params)
+
+DEFAULT_LANG = "en"
+
+# Match reasons
+ELIGIBLE = ("eligible",)                      # {name}: the source's name
+STRONG_CANDIDATE = ("strong_candidate",)
+WOMEN_PROGRAM = ("women_program",)
+VETERAN_PROGRAM = ("veteran_program",)
+RURAL_PROGRAM = ("rural_program",)
+AMOUNT_FITS = "amount_fits"                   # (min_amount, max_amount)
+# Eligibility gaps
+NEEDS_BUSINESS_PLAN = ("needs_business_plan",)
+NEEDS_FINANCIALS = ("needs_financials",)
+NEEDS_LETTERS = ("needs_letters",)
+# Competitive advantages
+STATED = "stated"                             # (the profile's own wording,)
+DIVERSITY = ("diversity",)
+PERSONAL_STORY = ("personal_story",)
+EXPERIENCE = "experience"                     # (years,)
+
+MESSAGES = {
+    "en": {
+        "eligible": "You meet all major eligibility requirements for {name}",
+        "strong_candidate": "You have strong competitive advantages for this opportunity",
+        "women_program": "Women-owned business program match",
+        "veteran_program": "Veteran-specific funding opportunity",
+        "rural_program": "Rural location qualifies you for this program",
+        "amount_fits": "Funding amount ({0:,.0f} - {1:,.0f}) matches your needs",
+        "needs_business_plan": "Business plan required - not mentioned in your profile",
+        "needs_financials": "Financial statements may be required",
+        "needs_letters": "Letters of support/recommendation needed",
+        "stated": "{0}",
+        "diversity": "Multiple diversity factors strengthen your application",
+        "personal_story": "Compelling personal story of overcoming obstacles",
+        "experience": "{0} years of experience in your field",
+    },
+    "es": {
+        "eligible": "Cumple todos los requisitos principales de elegibilidad de {name}",
+        "strong_candidate": "Tiene ventajas competitivas sólidas para esta oportunidad",
+        "women_program": "Programa para negocios de propiedad de mujeres",
+        "veteran_program": "Financiamiento específico para veteranos",
+        "rural_program": "Su ubicación rural le permite calificar para este programa",
+        "amount_fits": "El monto ({0:,.0f} - {1:,.0f}) se ajusta a sus necesidades",
+        "needs_business_plan": "Se requiere un plan de negocios (no aparece en su perfil)",
+        "needs_financials": "Es posible que se requieran estados financieros",
+        "needs_letters": "Se necesitan cartas de apoyo o recomendación",
+        "diversity": "Varios factores de diversidad fortalecen su solicitud",
+        "personal_story": "Una historia personal convincente de superación",
+        "experience": "{0} años de experiencia en su campo",
+    },
+}
+
+
+def language(value: Optional[str]) -> str:
+    """A supported language from ?lang= or an Accept-Language header, else DEFAULT_LANG."""
+    for part in (value or "").split(","):
+        tag = part.split(";")[0].strip().lower()[:2]
+        if tag in MESSAGES:
+            return tag
+    return DEFAULT_LANG
+
+
+@lru_cache(maxsize=None)
+def _template(lang: str, code: str) -> Callable[..., str]:
+    text = MESSAGES.get(lang, {}).get(code) or MESSAGES[DEFAULT_LANG].get(code)
+    return text.format if text is not None else (lambda *params, **_: code)
+
+
+def explain(reasons: Iterable[Reason], name: str = "", lang: str = DEFAULT_LANG) -> List[str]:
+    """Text for each reason; name is the source's name (for the codes that mention it)."""
+    return [_template(lang, r[0])(*r[1:], name=name) for r in reasons or ()]
+
+
+def encode(reasons: Sequence[Reason]) -> list:
+    """JSON-able form for funding_matches: a bare code when it has no parameters."""
+    return [r[0] if len(r) == 1 else list(r) for r in reasons]
+
+
+def decode(stored) -> List[Reason]:
+    return [(r,) if isinstance(r, str) else tuple(r) for r in stored or ()]
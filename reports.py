@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Funding report generator: renders a match run into funding_reports.
+
+Reports render as 'render_report' jobs on the job worker (jobs.py), never on a
+request thread, with Jinja's streaming generate(): the HTML goes chunk by chunk
+to a temp file while it is hashed, then into report_html through SQLite
+incremental blob I/O, so a large report is never held in memory whole.
+Downloads stream the stored bytes back out under their content hash
+(/reports/<hash>.html), so a repeat download never re-renders, and the same
+profile against the same catalog reuses the stored report.
+
+    python reports.py [path/to/funding_finder.db]    # render one sample report
+"""
+
+import hashlib
+import json
+import sqlite3
+import tempfile
+from collections import Counter, OrderedDict
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from catalog import get_catalog
+from engine import FundingMatchEngine, Match, UserProfile
+from jobs import PRIORITY_HIGH, enqueue
+from reasons import explain
+
+BASE_DIR = Path(__file__).resolve().parent
+TEMPLATE = "funding_report.html"
+MAX_MATCHES = 200
+CHUNK = 64 * 1024
+
+# Columns the generator needs beyond schema.sql's original funding_reports; added to older DBs
+REPORT_COLUMNS = {
+    "status": "TEXT DEFAULT 'pending'",  # pending, rendering, ready, failed
+    "request_key": "TEXT",
+    "catalog_version": "TEXT",
+    "content_hash": "TEXT",
+    "content_length": "INTEGER",
+    "rendered_at": "TIMESTAMP",
+    "error": "TEXT",
+}
+REPORT_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_funding_reports_request_key ON funding_reports(request_key);
+CREATE INDEX IF NOT EXISTS idx_funding_reports_content_hash ON funding_reports(content_hash);
+"""
+
+# Application documents to gather, keyed by the phrase that asks for them in requirements_text
+DOCUMENTS = OrderedDict([
+    ("business plan", "Business plan"),
+    ("financial statements", "Financial statements"),
+    ("tax return", "Tax returns"),
+    ("budget", "Project budget"),
+    ("letters of support", "Letters of support"),
+    ("recommendation", "Letters of recommendation"),
+    ("resume", "Resume"),
+    ("pitch", "Pitch deck or video"),
+    ("credit", "Credit history"),
+    ("collateral", "Collateral documentation"),
+    ("proof of", "Proof of eligibility (identity, residency or status)"),
+])
+
+_env = Environment(
+    loader=FileSystemLoader(str(BASE_DIR / "templates")),
+    autoescape=select_autoescape(["html"]),
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+_env.filters["money"] = lambda x: f"${float(x or 0):,.0f}"
+# Reason codes on a match -> text (reasons.py); reports are rendered in English
+_env.filters["explain"] = lambda codes, source: explain(codes, source.source_name)
+
+
+def ensure_report_schema(conn: sqlite3.Connection) -> None:
+    have = {row[1] for row in conn.execute("PRAGMA table_info(funding_reports)")}
+    for name, decl in REPORT_COLUMNS.items():
+        if name not in have:
+            conn.execute(f"ALTER TABLE funding_reports ADD COLUMN {name} {decl}")
+    conn.executescript(REPORT_INDEXES)
+
+
+def request_key(profile: UserProfile, catalog_version: str) -> str:
+    """Same profile + same catalog -> same report."""
+    raw = json.dumps(asdict(profile), sort_keys=True, default=str) + catalog_version
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+# =============================================================================
+# REPORT CONTENT
+# =============================================================================
+
+def executive_summary(matches: List[Match], now: datetime) -> str:
+    if not matches:
+        return "No funding opportunities matched this profile yet. Try a wider funding range or add more detail."
+    total = sum(m.source.max_amount or 0 for m in matches)
+    top = matches[0]
+    soon = sum(1 for m in matches if m.source.deadline and 0 <= (m.source.deadline - now).days <= 90)
+    rolling = sum(1 for m in matches if not m.source.deadline)
+    return (
+        f"We found {len(matches)} funding opportunities worth up to ${total:,.0f} combined. "
+        f"Your strongest match is {top.source.source_name} ({top.overall_score:.0f}/100). "
+        f"{soon} have deadlines in the next 90 days and {rolling} accept applications on a rolling basis."
+    )
+
+
+def application_roadmap(matches: List[Match], now: datetime) -> List[Dict]:
+    """Timeline: dated deadlines first (soonest first), then rolling opportunities by score."""
+    dated = sorted((m for m in matches if m.source.deadline and m.source.deadline >= now),
+                   key=lambda m: m.source.deadline)
+    rolling = [m for m in matches if not m.source.deadline]
+    steps = []
+    for m in dated:
+        steps.append({
+            "source_id": m.source.source_id,
+            "source_name": m.source.source_name,
+            "deadline": m.source.deadline.date().isoformat(),
+            "days_remaining": (m.source.deadline - now).days,
+            "action": f"Submit by {m.source.deadline:%B %d, %Y}",
+        })
+    for m in rolling:
+        steps.append({
+            "source_id": m.source.source_id,
+            "source_name": m.source.source_name,
+            "deadline": None,
+            "days_remaining": None,
+            "action": "Apply anytime (rolling)",
+        })
+    return steps
+
+
+def required_documents(matches: List[Match]) -> List[Dict]:
+    """Checklist of documents, most-requested first, with the sources that ask for each."""
+    needed: Dict[str, List[int]] = {}
+    for m in matches:
+        req = (m.source.requirements_text or "").lower()
+        for phrase, doc in DOCUMENTS.items():
+            if phrase in req:
+                needed.setdefault(doc, []).append(m.source.source_id)
+    order = Counter({doc: len(ids) for doc, ids in needed.items()})
+    return [{"document": doc, "count": n, "source_ids": needed[doc]} for doc, n in order.most_common()]
+
+
+def _render(context: dict) -> Iterator[str]:
+    return _env.get_template(TEMPLATE).generate(**context)
+
+
+# =============================================================================
+# JOBS
+# =============================================================================
+
+def submit_report(db_path: str, profile: UserProfile, now: Optional[datetime] = None,
+                  source_ids: Optional[List[int]] = None) -> Dict:
+    """
+    Queue a report for profile (optionally for an existing ranked run's source_ids).
+    Returns {"report_id", "status", "content_hash"}; a report already rendered or
+    queued for the same profile and catalog is returned instead of a new one.
+    """
+    now = now or datetime.now()
+    catalog = get_catalog(db_path)
+    key = request_key(profile, catalog.version)
+    conn = sqlite3.connect(db_path)
+    try:
+        ensure_report_schema(conn)
+        row = conn.execute("""
+            SELECT report_id, status, content_hash FROM funding_reports
+            WHERE request_key = ? AND status != 'failed'
+            ORDER BY report_id DESC LIMIT 1
+        """, (key,)).fetchone()
+        if row:
+            return {"report_id": row[0], "status": row[1], "content_hash": row[2]}
+        cur = conn.execute("""
+            INSERT INTO funding_reports (user_id, profile_id, report_type, status, request_key, catalog_version)
+            VALUES (?, ?, 'comprehensive', 'pending', ?, ?)
+        """, (profile.user_id, profile.profile_id, key, catalog.version))
+        conn.commit()
+        report_id = cur.lastrowid
+    finally:
+        conn.close()
+    # A user is waiting on this one: ahead of bulk jobs
+    enqueue(db_path, "render_report", {
+        "report_id": report_id,
+        "profile": asdict(profile),
+        "now": now.isoformat(),
+        "source_ids": source_ids,
+    }, priority=PRIORITY_HIGH)
+    return {"report_id": report_id, "status": "pending", "content_hash": None}
+
+
+def render_report(db_path: str, report_id: int, profile: UserProfile, now: datetime,
+                  source_ids: Optional[List[int]] = None) -> Optional[str]:
+    """Render one queued report into its row. Returns the content hash (None on failure)."""
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("UPDATE funding_reports SET status = 'rendering' WHERE report_id = ?", (report_id,))
+        conn.commit()
+        engine = FundingMatchEngine(db_path, catalog=get_catalog(db_path))
+        if source_ids is not None:
+            matches = engine.rescore(profile, source_ids[:MAX_MATCHES], now)
+        else:
+            matches = engine.match(profile, MAX_MATCHES, now)
+
+        summary = executive_summary(matches, now)
+        roadmap = application_roadmap(matches, now)
+        documents = required_documents(matches)
+        total = sum(m.source.max_amount or 0 for m in matches)
+        context = {
+            "profile": profile,
+            "generated_at": now,
+            "summary": summary,
+            "matches": matches,
+            "roadmap": roadmap,
+            "documents": documents,
+            "total": total,
+        }
+
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.TemporaryFile() as tmp:
+            for chunk in _render(context):
+                data = chunk.encode("utf-8")
+                digest.update(data)
+                tmp.write(data)
+                size += len(data)
+            content_hash = digest.hexdigest()[:32]
+
+            conn.execute("""
+                UPDATE funding_reports
+                SET num_opportunities = ?, total_potential_funding = ?,
+                    executive_summary = ?, top_matches = ?, application_roadmap = ?,
+                    required_documents = ?, report_html = zeroblob(?),
+                    content_hash = ?, content_length = ?
+                WHERE report_id = ?
+            """, (
+                len(matches), total, summary,
+                json.dumps([{"source_id": m.source.source_id, "overall_score": round(m.overall_score, 1)}
+                            for m in matches]),
+                json.dumps(roadmap), json.dumps(documents),
+                size, content_hash, size, report_id,
+            ))
+            tmp.seek(0)
+            with conn.blobopen("funding_reports", "report_html", report_id) as blob:
+                for data in iter(lambda: tmp.read(CHUNK), b""):
+                    blob.write(data)
+        conn.execute("""
+            UPDATE funding_reports SET status = 'ready', rendered_at = CURRENT_TIMESTAMP, error = NULL
+            WHERE report_id = ?
+        """, (report_id,))
+        conn.commit()
+        return content_hash
+    except Exception as e:
+        conn.rollback()
+        conn.execute("UPDATE funding_reports SET status = 'failed', error = ? WHERE report_id = ?",
+                     (str(e), report_id))
+        conn.commit()
+        return None
+    finally:
+        conn.close()
+
+
+# =============================================================================
+# READS
+# =============================================================================
+
+def report_status(db_path: str, report_id: int) -> Optional[Dict]:
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        ensure_report_schema(conn)
+        row = conn.execute("""
+            SELECT report_id, status, content_hash, content_length, num_opportunities,
+                   total_potential_funding, executive_summary, rendered_at, error
+            FROM funding_reports WHERE report_id = ?
+        """, (report_id,)).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def find_report(db_path: str, content_hash: str) -> Optional[Dict]:
+    """report_id and size of a rendered report, by content hash."""
+    conn = sqlite3.connect(db_path)
+    try:
+        ensure_report_schema(conn)
+        row = conn.execute("""
+            SELECT report_id, content_length FROM funding_reports
+            WHERE content_hash = ? AND status = 'ready' LIMIT 1
+        """, (content_hash,)).fetchone()
+        return {"report_id": row[0], "content_length": row[1]} if row else None
+    finally:
+        conn.close()
+
+
+def iter_report_html(db_path: str, report_id: int) -> Iterator[bytes]:
+    """Stream stored report_html in CHUNK-sized pieces."""
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn.blobopen("funding_reports", "report_html", report_id, readonly=True) as blob:
+            for data in iter(lambda: blob.read(CHUNK), b""):
+                yield data
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    import sys
+    db_path = sys.argv[1] if len(sys.argv) > 1 else str(BASE_DIR / "data" / "funding_finder.db")
+    from app import form_to_profile
+    from jobs import drain
+    profile = form_to_profile({"state": "TN", "amount": "small", "id": ["woman"],
+                               "vision": "Community bakery and small business training kitchen"})
+    queued = submit_report(db_path, profile)
+    drain(db_path)
+    status = report_status(db_path, queued["report_id"])
+    print(f"report {status['report_id']}: {status['status']}, {status['num_opportunities']} matches, "
+          f"{status['content_length'] or 0:,} B -> /reports/{status['content_hash']}.html")
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+ZIP code -> rurality (RUCA) and county lookup.
+
+The table is a small binary file of sorted fixed-width arrays:
+
+    header   magic b'ZRU1', byte-order mark, row count       (12 bytes)
+    zips     uint32[count]  5-digit ZIP as an integer, ascending
+    counties uint32[count]  5-digit county FIPS, 0 when unknown
+    ruca     uint8[count]   primary RUCA code 1-10, 0 when unknown
+
+It is memory-mapped on the first lookup (nothing is read at startup, and gunicorn
+workers share its pages) and searched with bisect on the zips array, so a lookup is
+a couple of microseconds. RUCA 1-3 is metropolitan; 4-10 (micropolitan, small town,
+rural) counts as rural, the nonmetro definition USDA programs use.
+
+Build or refresh it from USDA ERS ZIP-code RUCA data (CSV export; a county column,
+e.g. from a HUD ZIP-county crosswalk, is optional). The new file replaces the old
+one atomically; running processes map it within a minute (or on reload()):
+
+    python rurality.py build RUCA2010zipcode.csv [out.bin]
+    python rurality.py lookup 37201 [table.bin]
+
+Without a table, lookups return None and form_to_profile falls back to its
+state list.
+"""
+
+import bisect
+import csv
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_PATH = os.environ.get("ZIP_RURALITY_PATH", str(BASE_DIR / "data" / "zip_rurality.bin"))
+MAGIC = b'ZRU1'
+BOM = 0x01020304  # written in native order; a table from a machine of the other endianness is rejected
+HEADER = struct.Struct('=4sII')
+RURAL_FROM = 4  # RUCA primary codes 4-10 are nonmetropolitan
+
+# Column names accepted by build(), first match wins (USDA ERS, HUD crosswalk, generic)
+ZIP_COLUMNS = ('zip_code', 'zip', 'zcta5', 'zcta')
+RUCA_COLUMNS = ('ruca1', 'primary_ruca', 'ruca', 'ruca_code')
+COUNTY_COLUMNS = ('county', 'county_fips', 'stcnty', 'fips', 'geoid')
+
+
+class ZipInfo(NamedTuple):
+    ruca: Optional[int]
+    county_fips: Optional[str]
+
+    @property
+    def rural(self) -> Optional[bool]:
+        return None if self.ruca is None else self.ruca >= RURAL_FROM
+
+
+def zip5(value) -> Optional[int]:
+    """The 5-digit ZIP as an integer ('37201-1234' -> 37201); None if it is not one."""
+    digits = str(value or '').strip()[:5]
+    return int(digits) if len(digits) == 5 and digits.isdigit() else None
+
+
+class ZipTable:
+    """A memory-mapped table file; read-only and thread-safe."""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, bom, count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or bom != BOM:
+            raise ValueError(f"{path}: not a ZIP rurality table for this platform")
+        view = memoryview(self._mm)
+        start = HEADER.size
+        self.zips = view[start:start + 4 * count].cast('I')
+        self.counties = view[start + 4 * count:start + 8 * count].cast('I')
+        self.ruca = view[start + 8 * count:start + 9 * count]
+        self.path = path
+
+    def __len__(self) -> int:
+        return len(self.zips)
+
+    def lookup(self, zip_code) -> Optional[ZipInfo]:
+        z = zip5(zip_code)
+        if z is None:
+            return None
+        i = bisect.bisect_left(self.zips, z)
+        if i == len(self.zips) or self.zips[i] != z:
+            return None
+        ruca, county = self.ruca[i], self.counties[i]
+        return ZipInfo(ruca or None, f"{county:05d}" if county else None)
+
+
+def write_table(rows: Iterable[Tuple[int, int, int]], out_path: str) -> int:
+    """Write (zip, ruca, county_fips) rows as a table; the last row for a ZIP wins. Returns rows written."""
+    by_zip = {z: (ruca, county) for z, ruca, county in rows}
+    zips = array('I', sorted(by_zip))
+    counties = array('I', (by_zip[z][1] for z in zips))
+    ruca = bytes(by_zip[z][0] for z in zips)
+    tmp = f"{out_path}.tmp"
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, BOM, len(zips)))
+        f.write(zips.tobytes())
+        f.write(counties.tobytes())
+        f.write(ruca)
+    # A new inode: processes that mapped the old file keep reading it until reload()
+    os.replace(tmp, out_path)
+    return len(zips)
+
+
+def _column(header, names) -> Optional[str]:
+    lowered = {h.strip().lower(): h for h in header}
+    return next((lowered[n] for n in names if n in lowered), None)
+
+
+def _code(value) -> int:
+    """Primary RUCA code: '4', '4.0' and secondary codes like '4.2' -> 4; 99 or junk -> 0."""
+    try:
+        code = int(float(value))
+    except (TypeError, ValueError):
+        return 0
+    return code if 1 <= code <= 10 else 0
+
+
+def build(csv_path: str, out_path: str = DEFAULT_PATH) -> int:
+    """Build the table from a RUCA CSV. Returns rows written."""
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        zip_col = _column(reader.fieldnames or [], ZIP_COLUMNS)
+        ruca_col = _column(reader.fieldnames or [], RUCA_COLUMNS)
+        county_col = _column(reader.fieldnames or [], COUNTY_COLUMNS)
+        if zip_col is None or ruca_col is None:
+            raise ValueError(f"{csv_path}: needs a ZIP column {ZIP_COLUMNS} and a RUCA column {RUCA_COLUMNS}")
+        rows = []
+        for r in reader:
+            z = zip5(r[zip_col].zfill(5) if r[zip_col] else '')
+            if z is None:
+                continue
+            county = (r.get(county_col) or '').strip() if county_col else ''
+            rows.append((z, _code(r[ruca_col]), int(county[:5]) if county[:5].isdigit() else 0))
+    return write_table(rows, out_path)
+
+
+# =============================================================================
+# PROCESS-WIDE TABLE
+# =============================================================================
+
+CHECK_INTERVAL = 60.0  # seconds between checks for a refreshed table file
+
+_path = DEFAULT_PATH
+_table: Optional[ZipTable] = None
+_stamp: Optional[Tuple[int, int]] = None   # (inode, mtime) of the mapped file
+_checked = float('-inf')
+_lock = threading.Lock()
+
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def table() -> Optional[ZipTable]:
+    """
+    The process-wide table (ZIP_RURALITY_PATH), mapped on first use; None if there is
+    none. A file replaced since (rurality.py build) is mapped within CHECK_INTERVAL.
+    """
+    global _checked
+    if time.monotonic() - _checked < CHECK_INTERVAL:
+        return _table
+    with _lock:
+        if time.monotonic() - _checked >= CHECK_INTERVAL:
+            if _file_stamp(_path) != _stamp:
+                _open(_path)
+            _checked = time.monotonic()
+    return _table
+
+
+def _open(path: str) -> None:
+    global _path, _table, _stamp
+    _path, _stamp = path, _file_stamp(path)
+    _table = ZipTable(path) if _stamp is not None else None
+
+
+def reload(path: Optional[str] = None) -> Optional[ZipTable]:
+    """Map the table file now (another one if path is given)."""
+    global _checked
+    with _lock:
+        _open(path or _path)
+        _checked = time.monotonic()
+        return _table
+
+
+def lookup(zip_code) -> Optional[ZipInfo]:
+    t = table()
+    return t.lookup(zip_code) if t is not None else None
+
+
+def is_rural(zip_code) -> Optional[bool]:
+    """True / False from the ZIP's RUCA code; None when the ZIP (or the table) is unknown."""
+    info = lookup(zip_code)
+    return info.rural if info is not None else None
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) >= 3 and sys.argv[1] == 'build':
+        n = build(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else DEFAULT_PATH)
+        print(f"{n} ZIP codes -> {sys.argv[3] if len(sys.argv) > 3 else DEFAULT_PATH}")
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'lookup':
+        if len(sys.argv) > 3:
+            reload(sys.argv[3])
+        print(lookup(sys.argv[2]))
+    else:
+        sys.exit(__doc__)
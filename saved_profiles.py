@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Saved profiles and incremental re-matching.
+
+A saved profile (user_profiles.profile_json) keeps its top_k recommended matches
+in funding_matches. The first ranking is a full one (engine.top_ids). After that,
+rematch_saved() scores only the sources that changed since the last run (the
+delta) against each saved profile and merges the ones that now reach its top k,
+so the nightly run costs profiles x delta instead of profiles x catalog.
+
+The delta is found by fingerprint, not updated_at: a hot reload (catalog_reload.py)
+restamps every row, while the fingerprint (the parsed source plus its geo keys,
+rematch_sources) only changes when something the engine reads changed.
+
+Merging is exact as long as no stored match got worse. Unchanged sources keep their
+scores, so the new top k is the stored rows plus the delta sources scoring at least
+the old k-th score. When a stored delta source fell below that (or left the catalog)
+and the profile had a full top k, a source we never stored may now belong in it:
+that profile alone is ranked again in full (counted as refilled).
+
+Rows the user acted on (status other than 'recommended') are never deleted.
+Matches added by a re-match have notified_at NULL until an alert run lists them.
+
+    python saved_profiles.py rematch [path/to/funding_finder.db]
+    python saved_profiles.py alerts [path/to/funding_finder.db]   # re-match, then list and mark new matches
+"""
+
+import hashlib
+import json
+import sqlite3
+from dataclasses import asdict, astuple
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from catalog import CatalogSnapshot, get_catalog
+from engine import FundingMatchEngine, Match, UserProfile
+from migrations import migrate
+from reasons import DEFAULT_LANG, decode, encode, explain
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_TOP_K = 50
+MAX_TOP_K = 200
+THRESHOLD = 15
+# A delta this large a share of the catalog: rank every profile in full instead (top_ids prunes)
+FULL_RERANK_SHARE = 0.25
+
+
+def _stamp(now: datetime) -> str:
+    return now.isoformat(sep=' ', timespec='seconds')
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    migrate(conn)
+    return conn
+
+
+def _profile_from_json(raw: str) -> UserProfile:
+    d = json.loads(raw)
+    d['funding_needed'] = tuple(d['funding_needed'])
+    return UserProfile(**d)
+
+
+def save_profile(db_path: str, email: str, profile: UserProfile, top_k: int = DEFAULT_TOP_K,
+                 name: Optional[str] = None) -> int:
+    """Store profile for the user with this email (created if new); returns the profile_id."""
+    email = (email or '').strip().lower()
+    if '@' not in email:
+        raise ValueError("a valid email is required to save a profile")
+    top_k = max(1, min(MAX_TOP_K, int(top_k)))
+    conn = _connect(db_path)
+    try:
+        conn.execute("INSERT OR IGNORE INTO users (email, name) VALUES (?, ?)", (email, name))
+        user_id = conn.execute("SELECT user_id FROM users WHERE email = ?", (email,)).fetchone()[0]
+        low, high = profile.funding_needed
+        profile_id = conn.execute("""
+            INSERT INTO user_profiles (user_id, city, state, zip_code, project_type, project_description,
+                                       project_field, project_stage, funding_needed_min, funding_needed_max,
+                                       education_level, top_k)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (user_id, profile.location.get('city'), profile.location.get('state'), profile.location.get('zip'),
+              profile.project_type, profile.project_description, profile.project_field, profile.project_stage,
+              low, high, profile.education_level, top_k)).lastrowid
+        # The stored profile carries its real ids (form_to_profile leaves placeholders)
+        profile.user_id, profile.profile_id = user_id, profile_id
+        conn.execute("UPDATE user_profiles SET profile_json = ? WHERE profile_id = ?",
+                     (json.dumps(asdict(profile), default=str), profile_id))
+        conn.commit()
+        return profile_id
+    finally:
+        conn.close()
+
+
+def fingerprint(source, geo_keys: Iterable[str]) -> str:
+    """Hash of everything the engine reads about a source."""
+    raw = repr(astuple(source)) + '|' + ','.join(sorted(geo_keys))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _fingerprints(catalog: CatalogSnapshot) -> Dict[int, str]:
+    return {s.source_id: fingerprint(s, catalog.geo_keys.get(s.source_id, ())) for s in catalog.sources}
+
+
+# =============================================================================
+# MATCH ROWS
+# =============================================================================
+
+def _upsert(conn: sqlite3.Connection, user_id: int, profile_id: int, matches: List[Match],
+            stamp: str, notified: Optional[str]) -> None:
+    """Insert or refresh scores; an existing row keeps its status and notified_at."""
+    conn.executemany("""
+        INSERT INTO funding_matches (user_id, profile_id, source_id, overall_score, eligibility_score,
+                                     success_probability, effort_score, timeline_score, match_reasons,
+                                     eligibility_gaps, competitive_advantages, updated_at, notified_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(profile_id, source_id) DO UPDATE SET
+            overall_score = excluded.overall_score,
+            eligibility_score = excluded.eligibility_score,
+            success_probability = excluded.success_probability,
+            effort_score = excluded.effort_score,
+            timeline_score = excluded.timeline_score,
+            match_reasons = excluded.match_reasons,
+            eligibility_gaps = excluded.eligibility_gaps,
+            competitive_advantages = excluded.competitive_advantages,
+            updated_at = excluded.updated_at
+    """, [(user_id, profile_id, m.source.source_id, m.overall_score, m.eligibility_score,
+           m.success_probability, m.effort_score, m.timeline_score, json.dumps(encode(m.match_reasons)),
+           json.dumps(encode(m.eligibility_gaps)), json.dumps(encode(m.competitive_advantages)), stamp, notified)
+          for m in matches])
+
+
+def _trim(conn: sqlite3.Connection, profile_id: int, top_k: int, catalog: CatalogSnapshot) -> None:
+    """Drop recommended rows past the profile's top k (catalog order breaks score ties, as in rank())."""
+    rows = conn.execute("SELECT source_id, overall_score, status FROM funding_matches WHERE profile_id = ?",
+                        (profile_id,)).fetchall()
+    rows.sort(key=lambda r: (-r['overall_score'], catalog.rank.get(r['source_id'], len(catalog))))
+    drop = [(profile_id, r['source_id']) for r in rows[top_k:] if r['status'] == 'recommended']
+    conn.executemany("DELETE FROM funding_matches WHERE profile_id = ? AND source_id = ?", drop)
+
+
+def _match_full(conn: sqlite3.Connection, engine: FundingMatchEngine, row: sqlite3.Row,
+                profile: UserProfile, now: datetime) -> int:
+    """Rank the whole catalog for one profile and replace its recommended rows; returns rows kept."""
+    top = engine.top_ids(profile, row['top_k'], now)
+    matches = engine.rescore(profile, [sid for sid, _ in top], now)
+    keep = {m.source.source_id for m in matches}
+    stale = [(row['profile_id'], r[0]) for r in conn.execute(
+        "SELECT source_id FROM funding_matches WHERE profile_id = ? AND status = 'recommended'",
+        (row['profile_id'],)) if r[0] not in keep]
+    conn.executemany("DELETE FROM funding_matches WHERE profile_id = ? AND source_id = ?", stale)
+    stamp = _stamp(now)
+    # The first ranking is what the user saw when saving; only later additions are news
+    _upsert(conn, row['user_id'], row['profile_id'], matches, stamp,
+            stamp if row['matched_at'] is None else None)
+    conn.execute("UPDATE user_profiles SET matched_at = ? WHERE profile_id = ?", (stamp, row['profile_id']))
+    return len(matches)
+
+
+def _merge_delta(conn: sqlite3.Connection, engine: FundingMatchEngine, row: sqlite3.Row,
+                 profile: UserProfile, delta: Set[int], now: datetime) -> Optional[int]:
+    """
+    Score only delta for one profile and merge it; returns the rows merged, or None when
+    a stored match got worse and the profile needs a full ranking.
+    """
+    top_k = row['top_k']
+    stored = {r['source_id']: (r['overall_score'], r['status']) for r in conn.execute(
+        "SELECT source_id, overall_score, status FROM funding_matches WHERE profile_id = ?",
+        (row['profile_id'],))}
+    full = len(stored) >= top_k
+    kth = sorted((s for s, _ in stored.values()), reverse=True)[top_k - 1] if full else THRESHOLD
+    scored = {m.source.source_id: m for m in engine.match_among(profile, delta, now)}
+    gone = []
+    for sid in delta & stored.keys():
+        m = scored.get(sid)
+        score, status = stored[sid]
+        if full and score >= kth and (m is None or m.overall_score < kth):
+            return None
+        if m is None and status == 'recommended':
+            gone.append((row['profile_id'], sid))
+    conn.executemany("DELETE FROM funding_matches WHERE profile_id = ? AND source_id = ?", gone)
+    merged = [m for m in scored.values() if m.overall_score >= kth or m.source.source_id in stored]
+    _upsert(conn, row['user_id'], row['profile_id'], merged, _stamp(now), None)
+    _trim(conn, row['profile_id'], top_k, engine.catalog)
+    return len(merged)
+
+
+# =============================================================================
+# RE-MATCH
+# =============================================================================
+
+def match_profile(db_path: str, profile_id: int, now: Optional[datetime] = None) -> dict:
+    """Full ranking of one saved profile (right after it is saved)."""
+    now = now or datetime.now()
+    engine = FundingMatchEngine(db_path, catalog=get_catalog(db_path))
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("SELECT profile_id, user_id, profile_json, top_k, matched_at FROM user_profiles"
+                           " WHERE profile_id = ? AND profile_json IS NOT NULL", (profile_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"no saved profile {profile_id}")
+        kept = _match_full(conn, engine, row, _profile_from_json(row['profile_json']), now)
+        conn.commit()
+        return {"profile_id": profile_id, "matches": kept}
+    finally:
+        conn.close()
+
+
+def rematch_saved(db_path: str, now: Optional[datetime] = None) -> dict:
+    """
+    Bring every saved profile's matches up to date with the catalog. Profiles never
+    ranked get a full ranking; the rest score only the changed sources (see module doc).
+    """
+    now = now or datetime.now()
+    catalog = get_catalog(db_path)
+    engine = FundingMatchEngine(db_path, catalog=catalog)
+    current = _fingerprints(catalog)
+    conn = _connect(db_path)
+    try:
+        seen = dict(conn.execute("SELECT source_id, fingerprint FROM rematch_sources").fetchall())
+        changed = {sid for sid, fp in current.items() if seen.get(sid) != fp}
+        removed = seen.keys() - current.keys()
+        delta = changed | removed
+        wholesale = len(delta) > FULL_RERANK_SHARE * max(1, len(catalog))
+        stats = {"profiles": 0, "delta": len(delta), "changed": len(changed), "removed": len(removed),
+                 "scored": 0, "merged": 0, "ranked": 0, "refilled": 0}
+        query = "SELECT profile_id, user_id, profile_json, top_k, matched_at FROM user_profiles" \
+                " WHERE profile_json IS NOT NULL"
+        if not delta:
+            query += " AND matched_at IS NULL"
+        for row in conn.execute(query).fetchall():
+            profile = _profile_from_json(row['profile_json'])
+            stats["profiles"] += 1
+            if row['matched_at'] is None or wholesale:
+                _match_full(conn, engine, row, profile, now)
+                stats["ranked"] += 1
+            else:
+                stats["scored"] += len(changed)
+                merged = _merge_delta(conn, engine, row, profile, delta, now)
+                if merged is None:
+                    _match_full(conn, engine, row, profile, now)
+                    stats["refilled"] += 1
+                else:
+                    stats["merged"] += merged
+            conn.commit()
+        conn.executemany("INSERT OR REPLACE INTO rematch_sources (source_id, fingerprint) VALUES (?, ?)",
+                         [(sid, current[sid]) for sid in changed])
+        conn.executemany("DELETE FROM rematch_sources WHERE source_id = ?", [(sid,) for sid in removed])
+        conn.commit()
+        stats["catalog_version"] = catalog.version
+        return stats
+    finally:
+        conn.close()
+
+
+# =============================================================================
+# READS AND ALERTS
+# =============================================================================
+
+def profile_matches(db_path: str, profile_id: int, lang: str = DEFAULT_LANG) -> Optional[List[dict]]:
+    """Stored matches of a saved profile, best first, reasons rendered in lang; None if there is no such profile."""
+    conn = _connect(db_path)
+    try:
+        if not conn.execute("SELECT 1 FROM user_profiles WHERE profile_id = ?", (profile_id,)).fetchone():
+            return None
+        rows = conn.execute("""
+            SELECT m.source_id, s.source_name, s.provider_name, m.overall_score, m.status,
+                   m.match_reasons, m.updated_at, m.notified_at
+            FROM funding_matches m JOIN funding_sources s ON s.source_id = m.source_id
+            WHERE m.profile_id = ?
+            ORDER BY m.overall_score DESC, m.source_id
+        """, (profile_id,)).fetchall()
+    finally:
+        conn.close()
+    out = []
+    for r in rows:
+        item = dict(r)
+        item["overall_score"] = round(item["overall_score"], 1)
+        item["match_reasons"] = explain(decode(json.loads(item["match_reasons"] or "[]")), item["source_name"], lang)
+        out.append(item)
+    return out
+
+
+def pending_alerts(db_path: str) -> Dict[str, List[dict]]:
+    """New recommended matches not yet alerted, per user email."""
+    conn = _connect(db_path)
+    try:
+        rows = conn.execute("""
+            SELECT u.email, m.match_id, m.profile_id, m.source_id, s.source_name, m.overall_score
+            FROM funding_matches m
+            JOIN users u ON u.user_id = m.user_id
+            JOIN funding_sources s ON s.source_id = m.source_id
+            WHERE m.notified_at IS NULL AND m.status = 'recommended'
+            ORDER BY u.email, m.overall_score DESC
+        """).fetchall()
+    finally:
+        conn.close()
+    out: Dict[str, List[dict]] = {}
+    for r in rows:
+        item = dict(r)
+        out.setdefault(item.pop("email"), []).append(item)
+    return out
+
+
+def mark_notified(db_path: str, match_ids: List[int], now: Optional[datetime] = None) -> None:
+    stamp = _stamp(now or datetime.now())
+    conn = _connect(db_path)
+    try:
+        conn.executemany("UPDATE funding_matches SET notified_at = ? WHERE match_id = ?",
+                         [(stamp, mid) for mid in match_ids])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    import sys
+    command = sys.argv[1] if len(sys.argv) > 1 else 'rematch'
+    db_path = sys.argv[2] if len(sys.argv) > 2 else str(BASE_DIR / 'data' / 'funding_finder.db')
+    if command not in ('rematch', 'alerts'):
+        sys.exit(__doc__)
+    print(json.dumps(rematch_saved(db_path)))
+    if command == 'alerts':
+        # Listed here; delivery (mail) is up to whatever reads this output
+        alerts = pending_alerts(db_path)
+        for email, items in alerts.items():
+            print(f"{email}: {len(items)} new")
+            for a in items:
+                print(f"    {a['overall_score']:5.1f}  {a['source_name']}")
+        mark_notified(db_path, [a['match_id'] for items in alerts.values() for a in items])
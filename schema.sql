@@ -71,6 +71,11 @@ CREATE TABLE user_profiles (
     hidden_eligibility_factors TEXT, -- JSON - AI-discovered factors
     nuanced_qualifications TEXT, -- JSON - subtle matches
     
+    -- SAVED MATCHING (saved_profiles.py)
+    profile_json TEXT, -- JSON: the engine's UserProfile
+    top_k INTEGER DEFAULT 50, -- recommended matches kept in funding_matches
+    matched_at TIMESTAMP, -- last full ranking; NULL until the first one
+    
     FOREIGN KEY (user_id) REFERENCES users(user_id)
 );
 
@@ -141,7 +146,53 @@ CREATE TABLE funding_sources (
     
     -- QUALITY SCORE (our assessment)
     quality_score REAL, -- 0-100, based on legitimacy, success rate, clarity
-    legitimacy_verified BOOLEAN DEFAULT 0
+    legitimacy_verified BOOLEAN DEFAULT 0,
+    
+    -- PARSED (generated; same expressions as migrations.py)
+    amount_lo REAL GENERATED ALWAYS AS (
+        CASE WHEN coalesce(max_amount, 0) > 0 THEN min(coalesce(min_amount, 0), max_amount) ELSE 0 END) VIRTUAL,
+    amount_hi REAL GENERATED ALWAYS AS (
+        CASE WHEN coalesce(max_amount, 0) > 0 THEN max(coalesce(min_amount, 0), max_amount) ELSE 0 END) VIRTUAL,
+    states_open INTEGER GENERATED ALWAYS AS ( -- eligible_states empty or ALL
+        CASE WHEN trim(coalesce(eligible_states, '')) IN ('', '[]') OR upper(trim(eligible_states)) = 'ALL' THEN 1
+             WHEN json_valid(eligible_states) THEN instr(lower(eligible_states), '"all"') > 0
+             ELSE 0 END) VIRTUAL
+);
+
+-- Geographic eligibility keys written at ingestion (see geo.py):
+-- 'ALL', 'state:TN', 'region:ARC', 'county:OH:CUYAHOGA'
+CREATE TABLE source_geography (
+    source_id INTEGER NOT NULL,
+    geo_key TEXT NOT NULL,
+    PRIMARY KEY (source_id, geo_key),
+    FOREIGN KEY (source_id) REFERENCES funding_sources(source_id)
+);
+
+-- One row per batch record; near-duplicates share the source_id of their merged row
+CREATE TABLE source_provenance (
+    source_id INTEGER NOT NULL,
+    batch_file TEXT NOT NULL,
+    record_index INTEGER NOT NULL, -- position in the batch file's JSON list
+    source_name TEXT,
+    provider_name TEXT,
+    application_url TEXT,
+    similarity REAL, -- name-token Jaccard with the merged row (1.0 = same)
+    FOREIGN KEY (source_id) REFERENCES funding_sources(source_id)
+);
+
+-- One row per catalog swapped in by catalog_reload.py (hot reload from the batch files)
+CREATE TABLE catalog_builds (
+    build_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fingerprint TEXT NOT NULL, -- batch file names, sizes and mtimes it was built from
+    sources INTEGER,
+    checks TEXT, -- JSON: validation results
+    built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Fingerprint of each source at the last incremental re-match (saved_profiles.py)
+CREATE TABLE rematch_sources (
+    source_id INTEGER PRIMARY KEY,
+    fingerprint TEXT NOT NULL -- hash of the source's fields and geo keys
 );
 
 -- =============================================================================
@@ -163,9 +214,9 @@ CREATE TABLE funding_matches (
     timeline_score REAL, -- can they meet deadline?
     
     -- DETAILED MATCH REASONS (why this recommendation)
-    match_reasons TEXT, -- JSON array of specific reasons
-    eligibility_gaps TEXT, -- JSON array of missing requirements
-    competitive_advantages TEXT, -- JSON array of strengths
+    match_reasons TEXT, -- JSON array of reason codes (reasons.py)
+    eligibility_gaps TEXT, -- JSON array of reason codes: missing requirements
+    competitive_advantages TEXT, -- JSON array of reason codes: strengths
     
     -- STATUS TRACKING
     status TEXT DEFAULT 'recommended', -- recommended, saved, applied, awarded, rejected
@@ -175,6 +226,8 @@ CREATE TABLE funding_matches (
     decision_received DATE,
     outcome TEXT, -- awarded, rejected, waitlisted
     amount_awarded REAL,
+    updated_at TIMESTAMP, -- scores last refreshed by a re-match
+    notified_at TIMESTAMP, -- included in an alert run; NULL = new
     
     FOREIGN KEY (user_id) REFERENCES users(user_id),
     FOREIGN KEY (profile_id) REFERENCES user_profiles(profile_id),
@@ -201,9 +254,18 @@ CREATE TABLE funding_reports (
     success_stories TEXT, -- JSON array of similar winner profiles
     
     -- DELIVERABLE
-    report_html TEXT, -- rendered HTML
+    report_html TEXT, -- rendered HTML (UTF-8, written/read in chunks via blob I/O)
     report_pdf_path TEXT, -- file path if generated
     
+    -- RENDERING (reports.py: background worker, served by content hash)
+    status TEXT DEFAULT 'pending', -- pending, rendering, ready, failed
+    request_key TEXT, -- hash of profile + catalog version; repeat requests reuse the report
+    catalog_version TEXT,
+    content_hash TEXT,
+    content_length INTEGER,
+    rendered_at TIMESTAMP,
+    error TEXT,
+    
     -- ANALYTICS
     report_opened BOOLEAN DEFAULT 0,
     report_opened_at TIMESTAMP,
@@ -227,6 +289,72 @@ CREATE TABLE audit_log (
     user_agent TEXT
 );
 
+-- Materialized by deadlines.py (sweeper); listing reads this instead of the view below
+CREATE TABLE upcoming_deadlines (
+    source_id INTEGER PRIMARY KEY,
+    source_name TEXT,
+    provider_name TEXT,
+    application_deadline DATE NOT NULL,
+    min_amount REAL,
+    max_amount REAL,
+    application_url TEXT,
+    refreshed_at TIMESTAMP
+);
+
+-- Background job queue (jobs.py): reloads, batch matches, report rendering
+CREATE TABLE jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT, -- JSON
+    priority INTEGER DEFAULT 0,
+    status TEXT DEFAULT 'queued', -- queued, running, done, failed
+    attempts INTEGER DEFAULT 0,
+    max_attempts INTEGER DEFAULT 3,
+    visibility_timeout INTEGER DEFAULT 300, -- seconds a claim lasts
+    run_after TIMESTAMP NOT NULL,
+    locked_until TIMESTAMP,
+    locked_by TEXT,
+    result TEXT, -- JSON
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP,
+    dedupe_key TEXT -- at most one job per key, e.g. one watched reload per batch-file fingerprint
+);
+
+-- Ranked /api/match runs behind ?cursor= paging (cursors.py); rows expire after MATCH_CURSOR_TTL
+CREATE TABLE match_runs (
+    token TEXT PRIMARY KEY,
+    catalog_version TEXT NOT NULL,
+    profile TEXT NOT NULL, -- JSON UserProfile
+    now TIMESTAMP NOT NULL, -- the run's scoring time, reused by every page
+    source_ids TEXT NOT NULL, -- JSON: every viable match, best first
+    lane TEXT, -- admission lane
+    total INTEGER, -- viable matches
+    created REAL NOT NULL -- unix time
+);
+
+-- Questionnaires in progress (intake.py); rows expire INTAKE_SESSION_TTL after their last step
+CREATE TABLE intake_sessions (
+    token TEXT PRIMARY KEY,
+    answers TEXT NOT NULL, -- JSON: merged form answers so far
+    catalog_version TEXT NOT NULL,
+    survivors TEXT, -- JSON: candidate source ids; NULL until an answer narrows them
+    applied TEXT NOT NULL, -- JSON: narrowing key -> profile value it used
+    revision INTEGER NOT NULL DEFAULT 0, -- bumped per step; workers reload stale copies
+    touched REAL NOT NULL -- unix time of the last step
+);
+
+-- CPU profiles of sampled or admin-requested /api/match calls (profiling.py)
+CREATE TABLE request_profiles (
+    profile_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    label TEXT, -- request summary: state, amount, identities, stage
+    trigger TEXT, -- admin, sampled
+    elapsed_ms REAL,
+    summary TEXT, -- JSON: top functions and engine layers
+    stats BLOB, -- marshalled pstats data
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 CREATE TABLE system_metrics (
     metric_id INTEGER PRIMARY KEY AUTOINCREMENT,
     recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -243,10 +371,30 @@ CREATE INDEX idx_users_email ON users(email);
 CREATE INDEX idx_user_profiles_user_id ON user_profiles(user_id);
 CREATE INDEX idx_funding_sources_type ON funding_sources(source_type);
 CREATE INDEX idx_funding_sources_deadline ON funding_sources(application_deadline);
-CREATE INDEX idx_funding_sources_active ON funding_sources(active);
+-- Covers the catalog refresh scan (catalog.py) and active counts; ordered for the engine without a catalog
+CREATE INDEX idx_funding_sources_rank ON funding_sources(active, quality_score DESC, source_id, updated_at);
+CREATE INDEX idx_funding_sources_amount ON funding_sources(amount_hi, amount_lo) WHERE active = 1;
+CREATE INDEX idx_funding_sources_active_deadline ON funding_sources(application_deadline)
+    WHERE active = 1 AND application_deadline IS NOT NULL;
+CREATE INDEX idx_source_geography_key ON source_geography(geo_key);
+CREATE INDEX idx_request_profiles_elapsed ON request_profiles(elapsed_ms);
+CREATE INDEX idx_source_provenance_source ON source_provenance(source_id);
+CREATE INDEX idx_source_provenance_record ON source_provenance(batch_file, record_index);
 CREATE INDEX idx_funding_matches_user ON funding_matches(user_id);
 CREATE INDEX idx_funding_matches_score ON funding_matches(overall_score);
 CREATE INDEX idx_funding_matches_status ON funding_matches(status);
+CREATE UNIQUE INDEX idx_funding_matches_profile_source ON funding_matches(profile_id, source_id);
+CREATE INDEX idx_funding_matches_unnotified ON funding_matches(user_id) WHERE notified_at IS NULL;
+CREATE INDEX idx_upcoming_deadlines_deadline ON upcoming_deadlines(application_deadline);
+CREATE INDEX idx_funding_reports_request_key ON funding_reports(request_key);
+CREATE INDEX idx_funding_reports_content_hash ON funding_reports(content_hash);
+CREATE INDEX idx_jobs_ready ON jobs(status, priority DESC, job_id);
+CREATE UNIQUE INDEX idx_jobs_dedupe_key ON jobs(dedupe_key);
+CREATE INDEX idx_match_runs_created ON match_runs(created);
+CREATE INDEX idx_intake_sessions_touched ON intake_sessions(touched);
+
+-- Layout version for migrations.py (databases from older schema.sql files are migrated up)
+PRAGMA user_version = 3;
 
 -- =============================================================================
 -- DATA: Loaded by load_batches.py from batch_11..batch_20 (and BATCH_*.json)
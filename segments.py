@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Per-segment score components.
+
+Questionnaire profiles (form_to_profile) differ mostly in a handful of discrete
+inputs: state, amount bucket, identity set, stage, capacity, urgency, plus a few
+yes/no facts about the free text (hardship words, story length). Everything
+_score_match computes except the keyword fit and the field-tag check depends only
+on those, so for each segment we compute, once per catalog snapshot, the
+candidate sources and their eligibility base, success, timeline and effort
+scores. A request then adds the free-text terms to each candidate and sorts.
+
+Segments live in an LRU per snapshot (SEGMENT_CACHE_SIZE, default 128); a new
+catalog version starts empty. An entry is only used while no candidate's
+days-until-deadline can have changed since it was built. Concurrent misses on
+one segment wait for a single build (singleflight.py).
+
+A candidate that shares no keyword with the request has a fixed fit, so its
+overall score is known up to the field-tag penalty: each segment keeps those lower
+and upper bounds. top_ids scores the few candidates with keyword overlap exactly,
+then the rest by descending upper bound, and stops once the k-th best exact score
+beats the next bound; the sources it never scores are pruned.
+"""
+
+import heapq
+import os
+from bisect import bisect_left
+import threading
+import weakref
+from array import array
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from engine import FundingMatchEngine, UserProfile
+from singleflight import SingleFlight
+
+CACHE_SIZE = int(os.environ.get("SEGMENT_CACHE_SIZE", 128))
+# Same words _check_hidden_eligibility looks for in obstacles_overcome
+HARDSHIP_WORDS = ('poor', 'poverty', 'homeless', 'foster')
+DAY = timedelta(days=1)
+THRESHOLD = 15  # FundingMatchEngine.rank's minimum overall score
+
+
+def segment_key(profile: UserProfile) -> tuple:
+    """Every profile input the cached components depend on."""
+    obstacles = (profile.obstacles_overcome or '').lower()
+    education = (profile.education_level or '').lower()
+    return (
+        profile.location.get('state', ''),
+        profile.project_type,
+        tuple(profile.funding_needed),
+        tuple(sorted(str(x) for x in profile.identity_factors or [])),
+        (profile.heritage or '').lower(),
+        (profile.community_ties or '').lower(),
+        any(kw in obstacles for kw in HARDSHIP_WORDS),
+        bool(profile.hidden_eligibility_factors.get('rural_status')),
+        len(profile.competitive_advantages),
+        bool(profile.unique_story and len(profile.unique_story) > 100),
+        profile.experience_years,
+        'bachelor' in education or 'master' in education,
+        profile.project_stage,
+        profile.time_capacity,
+        profile.urgency,
+    )
+
+
+class Segment:
+    """Cached components for one segment, parallel arrays over its candidates (catalog order)."""
+
+    def __init__(self, engine: FundingMatchEngine, profile: UserProfile, now: datetime,
+                 among: Optional[Set[int]] = None):
+        self.ids = array('q')
+        self.eligibility_base = array('d')   # before the field-tag check and clamping
+        self.success = array('d')
+        self.timeline = array('d')
+        self.effort = array('d')
+        self.needs_field = bytearray()
+        self.stage_fits = bytearray()
+        self.valid_from = now
+        self.valid_until = datetime.max
+        for source in engine._candidates(profile, now, among):
+            self.ids.append(source.source_id)
+            self.eligibility_base.append(engine._eligibility_base(profile, source))
+            self.success.append(engine._score_success_probability(profile, source))
+            self.timeline.append(engine._score_timeline(profile, source, now))
+            self.effort.append(engine._score_effort(profile, source))
+            self.needs_field.append(engine._needs_field_match(source))
+            self.stage_fits.append(engine._stage_fits(profile, source))
+            if source.deadline and source.deadline + DAY > now:
+                # Whole days until the deadline change (and it expires after its day) at now + remainder
+                self.valid_until = min(self.valid_until, now + (source.deadline - now) % DAY)
+        self._bound()
+
+    def _bound(self) -> None:
+        """Score bounds for candidates without keyword overlap, and the visiting order for top_ids."""
+        # Zero overlap fixes fit at 50 (+15 on stage fit); only the field-tag penalty is open
+        self.upper = array('d')
+        self.lower = array('d')
+        for j in range(len(self.ids)):
+            base, fit = self.eligibility_base[j], min(100, 50.0 + (15 if self.stage_fits[j] else 0))
+            rest = (self.success[j], fit, self.timeline[j], self.effort[j])
+            self.upper.append(_overall(max(0, min(100, base)), *rest))
+            self.lower.append(_overall(max(0, min(100, base - (10 if self.needs_field[j] else 0))), *rest))
+        self.index = {sid: j for j, sid in enumerate(self.ids)}
+        # Highest bound first; ties keep catalog order, as rank_ids does
+        self.by_bound = array('q', sorted(range(len(self.ids)), key=lambda j: -self.upper[j]))
+        self.position = array('q', [0] * len(self.ids))
+        for p, j in enumerate(self.by_bound):
+            self.position[j] = p
+        # From position p of by_bound on: how many are viable whatever the field tags
+        # (sure_from[p]), and which positions could go either way (in_doubt, ascending)
+        self.sure_from = array('q', [0] * (len(self.ids) + 1))
+        self.in_doubt = array('q')
+        for p in range(len(self.by_bound) - 1, -1, -1):
+            self.sure_from[p] = self.sure_from[p + 1] + (self.lower[self.by_bound[p]] >= THRESHOLD)
+        for p, j in enumerate(self.by_bound):
+            if self.lower[j] < THRESHOLD <= self.upper[j]:
+                self.in_doubt.append(p)
+
+    def valid_at(self, now: datetime) -> bool:
+        return self.valid_from <= now < self.valid_until
+
+
+class CatalogTerms:
+    """Free-text side of one snapshot: keyword postings and field tags per source."""
+
+    def __init__(self, engine: FundingMatchEngine):
+        self.postings: Dict[str, List[int]] = {}
+        self.field_tags: Dict[int, FrozenSet[str]] = {}
+        for s in engine.catalog.sources:
+            for kw in set(engine._extract_keywords(s.source_name.lower() + " " + (s.requirements_text or ""))):
+                self.postings.setdefault(kw, []).append(s.source_id)
+            self.field_tags[s.source_id] = frozenset(str(f).lower() for f in (s.eligible_fields or []))
+        self.all_tags = frozenset(t for tags in self.field_tags.values() for t in tags)
+
+
+class SegmentCache:
+    def __init__(self, engine: FundingMatchEngine, max_entries: int = CACHE_SIZE):
+        self.terms = CatalogTerms(engine)
+        self.max_entries = max_entries
+        self._segments: "OrderedDict[tuple, Segment]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._builds = SingleFlight()  # concurrent misses on one segment build it once
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, engine: FundingMatchEngine, profile: UserProfile, now: datetime,
+            among: Optional[Set[int]] = None) -> Segment:
+        """The profile's segment; a miss builds it, from among (a superset of its candidates) if given."""
+        key = segment_key(profile)
+        with self._lock:
+            seg = self._segments.get(key)
+            if seg is not None and seg.valid_at(now):
+                self._segments.move_to_end(key)
+                self.hits += 1
+                return seg
+            self.misses += 1
+        seg, shared = self._builds.do(key, lambda: Segment(engine, profile, now, among))
+        if not shared:
+            with self._lock:
+                self._segments[key] = seg
+                self._segments.move_to_end(key)
+                while len(self._segments) > self.max_entries:
+                    self._segments.popitem(last=False)
+        return seg
+
+
+_caches: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def cache_for(engine: FundingMatchEngine) -> SegmentCache:
+    """The segment cache of the engine's catalog snapshot (built on first use)."""
+    catalog = engine.catalog
+    with _caches_lock:
+        cache = _caches.get(catalog)
+        if cache is None:
+            cache = _caches[catalog] = SegmentCache(engine)
+        return cache
+
+
+def _overall(eligibility: float, success: float, fit: float, timeline: float, effort: float) -> float:
+    # Same expression, in the same order, as _score_match (so bounds compare exactly)
+    return (
+        eligibility * 0.35 +
+        success * 0.25 +
+        fit * 0.20 +
+        timeline * 0.10 +
+        effort * 0.10
+    )
+
+
+def _scorer(engine: FundingMatchEngine, profile: UserProfile, now: datetime,
+            among: Optional[Set[int]] = None):
+    """The profile's segment, a function giving the exact overall score of its candidate j,
+    and the keyword overlap per source id (only sources with some)."""
+    cache = cache_for(engine)
+    seg = cache.get(engine, profile, now, among)
+    terms = cache.terms
+
+    proj = (profile.project_field or '').lower() + ' ' + (profile.project_description or '').lower()
+    matched_tags = {t for t in terms.all_tags if t in proj or t.replace('_', ' ') in proj}
+    overlap: Counter = Counter()
+    for kw in set(engine._extract_keywords(profile.project_description.lower())):
+        overlap.update(terms.postings.get(kw, ()))
+
+    def score(j: int) -> float:
+        # Same arithmetic, in the same order, as _score_match
+        sid = seg.ids[j]
+        eligibility = seg.eligibility_base[j]
+        if seg.needs_field[j] and not (terms.field_tags[sid] & matched_tags):
+            eligibility -= 10
+        eligibility = max(0, min(100, eligibility))
+        fit = 50.0 + min(30, overlap[sid] * 5)
+        if seg.stage_fits[j]:
+            fit += 15
+        fit = min(100, fit)
+        return _overall(eligibility, seg.success[j], fit, seg.timeline[j], seg.effort[j])
+
+    return seg, score, overlap
+
+
+def rank_ids(engine: FundingMatchEngine, profile: UserProfile, now: datetime) -> List[Tuple[int, float]]:
+    """All viable (source_id, overall_score), best first (ties keep catalog order)."""
+    seg, score, _ = _scorer(engine, profile, now)
+    scored = [(overall, sid) for overall, sid in ((score(j), sid) for j, sid in enumerate(seg.ids))
+              if overall >= THRESHOLD]
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return [(sid, overall) for overall, sid in scored]
+
+
+def top_ids(engine: FundingMatchEngine, profile: UserProfile, now: datetime,
+            k: int, stats: Optional[dict] = None, among: Optional[Set[int]] = None) -> List[Tuple[int, float]]:
+    """
+    The first k of rank_ids. Candidates with keyword overlap are scored first, the
+    rest by descending upper bound until the k-th best exact score (ties: catalog
+    order) beats the next bound. stats, if given, receives candidates / scored / pruned and total
+    (len(rank_ids), still exact).
+    """
+    seg, score, overlap = _scorer(engine, profile, now, among)
+    order, upper, lower = seg.by_bound, seg.upper, seg.lower
+    top: List[Tuple[float, int, int]] = []  # (overall, -j, sid) min-heap; ties favour catalog order
+    viable = 0
+
+    def offer(j: int) -> None:
+        nonlocal viable
+        overall = score(j)
+        if overall >= THRESHOLD:
+            viable += 1
+            item = (overall, -j, seg.ids[j])
+            if len(top) < k:
+                heapq.heappush(top, item)
+            elif top and item > top[0]:
+                heapq.heapreplace(top, item)
+
+    # Overlap raises fit above the bound, so these are always scored
+    hits = {seg.index[sid] for sid in overlap if sid in seg.index}
+    for j in sorted(hits):
+        offer(j)
+    scored = len(hits)
+    p = 0
+    while p < len(order):
+        j = order[p]
+        if j not in hits:
+            # (bound, -j) only decreases along by_bound, so once it cannot beat the
+            # k-th best (score, then catalog order), nothing after it can either
+            bound = upper[j]
+            if bound < THRESHOLD or (len(top) >= k and (k <= 0 or (bound, -j) < top[0][:2])):
+                break
+            offer(j)
+            scored += 1
+        p += 1
+    # Past p: viable by the lower bound unless the field tags decide (then scored here)
+    viable += seg.sure_from[p] - sum(1 for j in hits if seg.position[j] >= p and lower[j] >= THRESHOLD)
+    for q in seg.in_doubt[bisect_left(seg.in_doubt, p):]:
+        if order[q] not in hits:
+            scored += 1
+            viable += score(order[q]) >= THRESHOLD
+    if stats is not None:
+        stats.update(candidates=len(order), scored=scored, pruned=len(order) - scored, total=viable)
+    return [(sid, overall) for overall, _, sid in sorted(top, reverse=True)]
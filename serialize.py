@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Match/source JSON serialization.
+
+Source objects are rendered to JSON text once per catalog snapshot (per field
+projection) and spliced into responses, so a match response only encodes the
+per-match scores and explanations. Responses are streamed match by match instead
+of being built as one dict and handed to jsonify.
+
+Projection: ?fields=overall_score,match_reasons,source.source_name,...
+            (fields come back in the canonical order below, whatever order was asked for)
+Compact:    ?compact=1 drops source.requirements_text (fetch it from /api/sources/<id>).
+Language:   ?lang= (or Accept-Language) for the explanation lists, rendered from
+            the matches' reason codes (reasons.py).
+"""
+
+import json
+import threading
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from reasons import DEFAULT_LANG, explain
+
+SOURCE_FIELDS = (
+    "source_id", "source_name", "provider_name", "source_type",
+    "min_amount", "max_amount", "deadline", "deadline_type",
+    "application_url", "requirements_text",
+)
+SCORE_FIELDS = ("overall_score", "eligibility_score", "success_probability", "fit_score")
+LIST_FIELDS = ("match_reasons", "eligibility_gaps", "competitive_advantages")
+MATCH_FIELDS = SCORE_FIELDS + LIST_FIELDS
+# Source projections with a fragment cache per catalog snapshot; the least recently used goes first
+MAX_CACHED_PROJECTIONS = 8
+
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def source_to_json(s) -> dict:
+    """Public fields of a FundingSource (match results and browse endpoints)."""
+    return {
+        "source_id": s.source_id,
+        "source_name": s.source_name,
+        "provider_name": s.provider_name,
+        "source_type": s.source_type,
+        "min_amount": s.min_amount,
+        "max_amount": s.max_amount,
+        "deadline": s.deadline.isoformat() if s.deadline else None,
+        "deadline_type": s.deadline_type,
+        "application_url": getattr(s, "application_url", None),
+        "requirements_text": (s.requirements_text or "").strip(),
+    }
+
+
+class Projection:
+    """Which match fields and which source fields a response carries, and in which language."""
+
+    def __init__(self, match_fields: Tuple[str, ...], source_fields: Tuple[str, ...],
+                 lang: str = DEFAULT_LANG):
+        self.match_fields = match_fields
+        self.source_fields = source_fields
+        self.lang = lang
+
+    @classmethod
+    def parse(cls, fields: Optional[str], compact: bool = False, lang: str = DEFAULT_LANG) -> "Projection":
+        """Build from ?fields=, ?compact= and the language; raises ValueError on unknown fields."""
+        if not fields:
+            match_fields = MATCH_FIELDS
+            source_fields = SOURCE_FIELDS
+        else:
+            match_fields, source_fields = [], []
+            for f in (x.strip() for x in fields.split(",")):
+                if not f:
+                    continue
+                if f == "source":
+                    source_fields.extend(SOURCE_FIELDS)
+                elif f.startswith("source."):
+                    if f[7:] not in SOURCE_FIELDS:
+                        raise ValueError(f"unknown field: {f}")
+                    source_fields.append(f[7:])
+                elif f in MATCH_FIELDS:
+                    match_fields.append(f)
+                else:
+                    raise ValueError(f"unknown field: {f}")
+            # Canonical order, so permutations and repeats are one projection (one fragment cache)
+            match_fields = tuple(f for f in MATCH_FIELDS if f in match_fields)
+            source_fields = tuple(f for f in SOURCE_FIELDS if f in source_fields)
+        if compact:
+            source_fields = tuple(f for f in source_fields if f != "requirements_text")
+        return cls(match_fields, source_fields, lang)
+
+
+_fragments_lock = threading.Lock()
+
+
+def _fragment_cache(catalog, source_fields: Tuple[str, ...]) -> Dict[int, str]:
+    """The snapshot's fragments for a projection; at most MAX_CACHED_PROJECTIONS are kept."""
+    with _fragments_lock:
+        cache = catalog.fragments.get(source_fields)
+        if cache is None:
+            cache = catalog.fragments[source_fields] = {}
+            while len(catalog.fragments) > MAX_CACHED_PROJECTIONS:
+                catalog.fragments.popitem(last=False)
+        else:
+            catalog.fragments.move_to_end(source_fields)
+        return cache
+
+
+def source_fragment(catalog, source, source_fields: Tuple[str, ...]) -> str:
+    """Pre-rendered JSON for one source, cached on the catalog snapshot per projection."""
+    cache = _fragment_cache(catalog, source_fields)
+    frag = cache.get(source.source_id)
+    if frag is None:
+        full = source_to_json(source)
+        frag = cache[source.source_id] = _dumps({f: full[f] for f in source_fields})
+    return frag
+
+
+def match_fragment(m, catalog, projection: Projection) -> str:
+    parts = []
+    if projection.source_fields:
+        parts.append('"source":' + source_fragment(catalog, m.source, projection.source_fields))
+    for f in projection.match_fields:
+        if f in SCORE_FIELDS:
+            parts.append(f'"{f}":{getattr(m, f):.1f}')
+        else:
+            parts.append(f'"{f}":' + _dumps(explain(getattr(m, f), m.source.source_name, projection.lang)))
+    return "{" + ",".join(parts) + "}"
+
+
+def iter_match_response(matches: Iterable, catalog, projection: Projection, **meta) -> Iterator[str]:
+    """Stream {"ok":true, **meta, "matches":[...]} one match at a time."""
+    head = {"ok": True}
+    head.update(meta)
+    yield _dumps(head)[:-1] + ',"matches":['
+    for i, m in enumerate(matches):
+        yield ("," if i else "") + match_fragment(m, catalog, projection)
+    yield "]}"
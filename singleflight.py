@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Single-flight: concurrent calls with the same key share one computation.
+
+The first caller for a key (the leader) runs the function. Callers that arrive
+while it runs wait for it and get the same result, or the same exception.
+Nothing is cached: once the leader returns, the next call for the key computes again.
+
+Used for whole match rankings (app.py; the key is the normalized profile plus
+catalog version, so a burst of identical campaign-link submissions ranks once) and
+for segment builds (segments.py; similar forms that differ only in free text).
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Per-process; thread-safe."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.computed = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """fn()'s result for key, and whether it came from another caller's computation."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.computed += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"computed": self.computed, "shared": self.shared, "in_flight": len(self._calls)}
@@ -1,14 +1,17 @@
 #!/bin/sh
 # Use PORT from environment (Railway, Render, etc.)
 PORT="${PORT:-5000}"
+# One database for the web workers, the job worker and the index export
+export DATABASE_PATH="${DATABASE_PATH:-/app/data/funding_finder.db}"
 
 # Pre-load DB at startup so first API request is fast (3,500 sources)
 echo "Initializing database..."
 python3 -c "
+import os
 import sqlite3
 from pathlib import Path
-db = '/app/data/funding_finder.db'
-Path('/app/data').mkdir(exist_ok=True)
+db = os.environ['DATABASE_PATH']
+Path(db).parent.mkdir(parents=True, exist_ok=True)
 s = Path('/app/schema.sql')
 if s.exists():
     c = sqlite3.connect(db)
@@ -20,4 +23,18 @@ n = load_all_batches(db)
 print(f'Loaded {n} funding sources')
 " 2>/dev/null || true
 
-exec gunicorn --bind "0.0.0.0:${PORT}" --workers 1 --threads 4 --timeout 120 app:app
+# Compiled catalog for in-browser matching (/api/catalog-index); rebuilt on demand if stale
+python3 export_catalog.py "$DATABASE_PATH" 2>/dev/null || true
+
+# Reloads, batch matches and report rendering run here, not on gunicorn's request threads.
+# Same container and disk as the web workers; restarted if it exits, so the web
+# side can leave its in-process worker off
+(while true; do
+  python3 jobs.py worker "$DATABASE_PATH"
+  echo "job worker exited ($?); restarting" >&2
+  sleep 1
+done) &
+export JOB_WORKER=external
+
+# Bind, workers (WEB_CONCURRENCY, default one per core) and catalog preload: gunicorn.conf.py
+exec gunicorn app:app
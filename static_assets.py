@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Static asset pipeline: precompress the front end at build time, serve the right
+variant per Accept-Encoding with strong ETags and conditional GET.
+
+Build (Dockerfile runs this; safe to re-run):
+    python static_assets.py
+writes build/static/<stem>.<hash>.<ext> (the fingerprinted name), .gz and .br
+(when the Brotli package is installed) copies of it, and manifest.json, which maps
+each name to its ETag, fingerprinted name and files. Generated files
+(export_catalog.py) are added with publish_asset().
+
+Entry pages (/, /index.html, ...) are served with `Cache-Control: no-cache` so
+browsers revalidate with If-None-Match and get a 304; fingerprinted copies under
+/assets/ never change and are cached for a year. A rebuild keeps the previous
+generation of each changed asset (its manifest entry's "previous" and its files),
+so pages cached with the old HTML still load their old fingerprinted URLs; the
+generation before that is deleted.
+
+Every file is written to a temporary name and renamed into place, so a reader never
+sees half a file, and manifest updates hold an flock on manifest.lock, so
+concurrent publishes from several workers do not lose each other's entries.
+"""
+
+import fcntl
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # optional: gzip-only without it
+    brotli = None
+
+BASE_DIR = Path(__file__).resolve().parent
+BUILD_DIR = BASE_DIR / "build" / "static"
+
+# Served from the repo root; everything else falls through to Flask's static handler
+ASSETS = [
+    "FUNDING_FINDER_FUN.html",
+    "index.html",
+    "SAMPLE_FUNDING_REPORT.html",
+    "engine.js",
+    "catalog_matcher.js",
+]
+
+LONG_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+MANIFEST_CHECK_INTERVAL = 1.0  # seconds between checks of manifest.json's mtime
+
+
+def fingerprinted_name(name: str, digest: str) -> str:
+    stem, dot, ext = name.rpartition(".")
+    return f"{stem}.{digest[:10]}.{ext}" if dot else f"{name}.{digest[:10]}"
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Write data to path through a unique temporary file in the same directory and a rename."""
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+@contextmanager
+def manifest_lock(out_dir: Path):
+    """Exclusive across threads and processes while manifest.json is read, changed and written."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with open(out_dir / "manifest.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def build_asset(src: Path, out_dir: Path, name: Optional[str] = None) -> dict:
+    """Precompress one file into out_dir; returns its manifest entry."""
+    name = name or src.name
+    raw = src.read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()
+    # Files are named by content, so the previous generation's files stay in place
+    fingerprinted = fingerprinted_name(name, digest)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    write_atomic(out_dir / fingerprinted, raw)
+    encodings = {"identity": fingerprinted}
+    # mtime=0 keeps .gz output byte-identical across builds
+    gz = gzip.compress(raw, compresslevel=9, mtime=0)
+    if len(gz) < len(raw):
+        write_atomic(out_dir / f"{fingerprinted}.gz", gz)
+        encodings["gzip"] = f"{fingerprinted}.gz"
+    if brotli is not None:
+        br = brotli.compress(raw, quality=11)
+        if len(br) < len(raw):
+            write_atomic(out_dir / f"{fingerprinted}.br", br)
+            encodings["br"] = f"{fingerprinted}.br"
+    return {
+        "etag": digest[:32],
+        "fingerprinted": fingerprinted,
+        "encodings": encodings,
+    }
+
+
+def _generations(entry: dict) -> List[dict]:
+    """The entry itself and, if kept, its previous generation."""
+    return [entry] + ([entry["previous"]] if entry.get("previous") else [])
+
+
+def _supersede(out_dir: Path, old: Optional[dict], entry: dict) -> dict:
+    """
+    entry, keeping old (the name's current entry) as its previous generation when the
+    content changed; deletes the files of the generation that drops out.
+    """
+    if old is None:
+        return entry
+    if old["etag"] == entry["etag"]:
+        previous = old.get("previous")
+    else:
+        previous = {k: v for k, v in old.items() if k != "previous"}
+    if previous:
+        entry["previous"] = previous
+    kept = {f for g in _generations(entry) for f in g["encodings"].values()}
+    for g in _generations(old):
+        for f in g["encodings"].values():
+            if f not in kept:
+                (out_dir / f).unlink(missing_ok=True)
+    return entry
+
+
+def _read_manifest(out_dir: Path) -> Dict[str, dict]:
+    path = out_dir / "manifest.json"
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def _write_manifest(out_dir: Path, manifest: Dict[str, dict]) -> None:
+    write_atomic(out_dir / "manifest.json", json.dumps(manifest, indent=2).encode())
+
+
+def build(out_dir: Path = BUILD_DIR, assets: Optional[List[str]] = None) -> Dict[str, dict]:
+    """Precompress every asset and write manifest.json. Returns the manifest."""
+    with manifest_lock(out_dir):
+        # Keep entries published by other build steps (e.g. export_catalog.py)
+        manifest = _read_manifest(out_dir)
+        for name in assets or ASSETS:
+            src = BASE_DIR / name
+            if src.exists():
+                manifest[name] = _supersede(out_dir, manifest.get(name), build_asset(src, out_dir))
+        _write_manifest(out_dir, manifest)
+    return manifest
+
+
+def publish_asset(src: Path, out_dir: Path = BUILD_DIR, **meta) -> dict:
+    """Precompress one generated file and add it (plus any meta) to the manifest. Returns its entry."""
+    with manifest_lock(out_dir):
+        entry = build_asset(src, out_dir)
+        entry.update(meta)
+        manifest = _read_manifest(out_dir)
+        entry = manifest[src.name] = _supersede(out_dir, manifest.get(src.name), entry)
+        _write_manifest(out_dir, manifest)
+    return entry
+
+
+def _representations(manifest: Dict[str, dict]) -> set:
+    """(file, representation ETag) of every generation the manifest serves."""
+    return {
+        (f, g["etag"] if enc == "identity" else f"{g['etag']}-{enc}")
+        for e in manifest.values() for g in _generations(e) for enc, f in g["encodings"].items()
+    }
+
+
+class StaticAssets:
+    """
+    Serves precompressed variants from a build dir; variants are read once and kept in
+    memory. manifest.json is re-read when its mtime changes (another worker or process
+    published an asset), and variants it no longer serves are dropped.
+    """
+
+    def __init__(self, out_dir: Path = BUILD_DIR):
+        self.out_dir = out_dir
+        self._lock = threading.Lock()
+        self._manifest: Optional[Dict[str, dict]] = None
+        self._mtime: Optional[int] = None
+        self._checked = float("-inf")
+        self._by_fingerprint: Dict[str, Tuple[str, dict]] = {}  # -> (name, generation entry)
+        self._bytes: Dict[tuple, bytes] = {}
+
+    def _manifest_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.out_dir / "manifest.json").st_mtime_ns
+        except OSError:
+            return None
+
+    def manifest(self) -> Dict[str, dict]:
+        manifest = self._manifest
+        if manifest is not None and time.monotonic() - self._checked < MANIFEST_CHECK_INTERVAL:
+            return manifest
+        with self._lock:
+            if self._manifest is None or time.monotonic() - self._checked >= MANIFEST_CHECK_INTERVAL:
+                mtime = self._manifest_mtime()
+                if self._manifest is None or mtime != self._mtime:
+                    manifest = _read_manifest(self.out_dir)
+                    self._by_fingerprint = {
+                        g["fingerprinted"]: (n, g) for n, e in manifest.items() for g in _generations(e)
+                    }
+                    live = _representations(manifest)
+                    self._bytes = {k: v for k, v in self._bytes.items() if k in live}
+                    self._manifest, self._mtime = manifest, mtime
+                self._checked = time.monotonic()
+            return self._manifest
+
+    def reload(self) -> None:
+        """Re-read manifest.json on next use (right after publish_asset in this process)."""
+        with self._lock:
+            self._manifest = None
+
+    def url_for(self, name: str) -> str:
+        """/assets/<fingerprinted name> when built, else the plain path."""
+        entry = self.manifest().get(name)
+        return f"/assets/{entry['fingerprinted']}" if entry else f"/{name}"
+
+    def for_fingerprint(self, fingerprinted: str) -> Optional[Tuple[str, dict]]:
+        """(name, manifest entry) of the current or previous generation with that fingerprint."""
+        self.manifest()
+        return self._by_fingerprint.get(fingerprinted)
+
+    def _read(self, filename: str, etag: str) -> bytes:
+        # Keyed by etag too: generated assets are republished under the same filename
+        data = self._bytes.get((filename, etag))
+        if data is None:
+            data = self._bytes[(filename, etag)] = (self.out_dir / filename).read_bytes()
+        return data
+
+    def response(self, name: str, request, immutable: bool = False, entry: Optional[dict] = None):
+        """Flask response for a built asset (entry: a given generation), or None if it was not built."""
+        entry = entry or self.manifest().get(name)
+        if entry is None:
+            return None
+        accepted = request.accept_encodings
+        encodings = entry["encodings"]
+        encoding = "identity"
+        for candidate in ("br", "gzip"):
+            if candidate in encodings and accepted[candidate]:
+                encoding = candidate
+                break
+        # Strong ETag per representation: compressed bytes differ from identity bytes
+        etag = entry["etag"] if encoding == "identity" else f"{entry['etag']}-{encoding}"
+        headers = {
+            "ETag": f'"{etag}"',
+            "Vary": "Accept-Encoding",
+            "Cache-Control": LONG_CACHE if immutable else REVALIDATE,
+        }
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers=headers)
+        resp = Response(self._read(encodings[encoding], etag), headers=headers)
+        resp.mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        if encoding != "identity":
+            resp.headers["Content-Encoding"] = encoding
+        return resp
+
+
+if __name__ == "__main__":
+    built = build()
+    for name, entry in built.items():
+        sizes = {enc: (BUILD_DIR / f).stat().st_size for enc, f in entry["encodings"].items()}
+        print(f"{name}: " + ", ".join(f"{enc} {size:,} B" for enc, size in sizes.items()))
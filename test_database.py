@@ -21,9 +21,391 @@ def test_source_count():
     conn = sqlite3.connect(DB_PATH)
     cur = conn.execute("SELECT COUNT(*) FROM funding_sources WHERE active = 1")
     n = cur.fetchone()[0]
+    records, merged = conn.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT source_id) FROM source_provenance"
+    ).fetchone()
     conn.close()
-    assert n >= 3500, f"Expected >= 3500 sources, got {n}"
-    print(f"✓ Active sources: {n} (target 3,500)")
+    # Near-duplicate batch records are merged at load; every record stays in source_provenance
+    assert records >= 3500, f"Expected >= 3500 batch records, got {records}"
+    assert n >= merged >= records * 0.95, f"Too many records merged: {records} -> {merged}"
+    print(f"✓ Active sources: {n} ({records} batch records, {records - merged} near-duplicates merged)")
+
+
+def test_dedupe():
+    sys.path.insert(0, str(BASE))
+    from dedupe import MatchKey, band_keys, cluster, merge_rows
+    rows = [
+        {"source_name": "Amber Grant for Women", "provider_name": "WomensNet",
+         "application_url": "https://ambergrantsforwomen.com/get-an-amber-grant", "quality_score": 50,
+         "max_amount": 10000, "geo_keys": ["ALL"]},
+        {"source_name": "North Carolina Rural Grant", "provider_name": "NC Commerce",
+         "application_url": "https://nccommerce.com/rural", "geo_keys": ["state:NC"]},
+        {"source_name": "Amber Grant for Women Entrepreneurs", "provider_name": "WomensNet Foundation",
+         "application_url": "https://www.ambergrantsforwomen.com/get-an-amber-grant/", "quality_score": 70,
+         "max_amount": 0, "geo_keys": ["ALL"]},
+        {"source_name": "South Carolina Rural Grant", "provider_name": "SC Commerce",
+         "application_url": "https://sccommerce.com/rural", "geo_keys": ["state:SC"]},
+        {"source_name": "NC Rural Grants", "provider_name": "Regional Foundation",
+         "application_url": None, "geo_keys": ["state:NC", "county:NC:WAKE"]},
+        # Reworded at the same provider (Jaccard 0.8); one per state stays apart, Indiana included
+        {"source_name": "Eileen Fisher Women-Owned Business Grant", "provider_name": "Eileen Fisher Foundation",
+         "application_url": "https://eileenfisher.com/grant", "geo_keys": ["ALL"]},
+        {"source_name": "Eileen Fisher Women-Owned Grant", "provider_name": "Eileen Fisher",
+         "application_url": "https://www.eileenfisher.com/women-owned", "geo_keys": ["ALL"]},
+        {"source_name": "Indiana Film Production Tax Credit", "provider_name": "Indiana Film Commission",
+         "application_url": "https://film.in.gov/tax-credit", "geo_keys": ["state:IN"]},
+        {"source_name": "Utah Film Production Tax Credit", "provider_name": "Utah Film Commission",
+         "application_url": "https://film.utah.gov/tax-credit", "geo_keys": ["state:UT"]},
+    ]
+    groups = cluster(rows)
+    assert groups == [[0, 2], [1, 4], [3], [5, 6], [7], [8]], f"Unexpected clusters {groups}"
+    # LSH buckets come from a fixed hash: the same in every process
+    assert band_keys(MatchKey.from_row(rows[0]))[:2] == [8040858874295627270, -8771476346760671032]
+    amber = merge_rows([rows[i] for i in groups[0]])
+    assert amber["source_name"].endswith("Entrepreneurs") and amber["max_amount"] == 10000
+    assert merge_rows([rows[i] for i in groups[1]])["geo_keys"] == ["state:NC", "county:NC:WAKE"]
+    print("✓ Near-duplicate and reworded records merge; state variants stay apart")
+
+
+def test_stream_reader():
+    sys.path.insert(0, str(BASE))
+    import json
+    import tempfile
+    from jsonstream import iter_json_records
+    path = BASE / "batch_11_funding_sources.json"
+    expected = json.loads(path.read_text(encoding="utf-8"))
+    # Tiny chunks: records, strings and numbers split across reads
+    assert list(iter_json_records(path, chunk_size=7)) == expected, "Chunked array parse differs"
+    with tempfile.TemporaryDirectory() as tmp:
+        ndjson = Path(tmp) / "feed.ndjson"
+        ndjson.write_text("\n".join(json.dumps(r) for r in expected) + "\n", encoding="utf-8")
+        assert list(iter_json_records(ndjson, chunk_size=7)) == expected, "NDJSON parse differs"
+    print(f"✓ Streaming reader matches json.loads ({len(expected)} records, array and NDJSON)")
+
+
+def test_foreign_import():
+    sys.path.insert(0, str(BASE))
+    import tempfile
+    from foreign_catalog import import_dump
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = str(Path(tmp) / "import.db")
+        src, dst = sqlite3.connect(DB_PATH), sqlite3.connect(copy)
+        src.backup(dst)
+        src.close()
+        dst.close()
+        first = import_dump(copy, str(BASE / "comprehensive_sources.sql"))
+        again = import_dump(copy, str(BASE / "comprehensive_sources.sql"))
+        assert first["inserted"] + first["matched_existing"] == first["rows"] > 0
+        assert again["inserted"] == 0, "Re-import should match every row to the first import"
+        conn = sqlite3.connect(copy)
+        prov = conn.execute("SELECT count(*) FROM source_provenance WHERE batch_file = 'comprehensive_sources.sql'").fetchone()[0]
+        missing_geo = conn.execute("""
+            SELECT count(*) FROM funding_sources f WHERE NOT EXISTS
+                (SELECT 1 FROM source_geography g WHERE g.source_id = f.source_id)
+        """).fetchone()[0]
+        flagged = conn.execute("SELECT count(*) FROM funding_sources WHERE requirements_text LIKE 'Eligibility: %'").fetchone()[0]
+        conn.close()
+    assert prov == first["rows"], "One provenance row per dump row, also after a re-import"
+    assert missing_geo == 0, "Imported sources need geography keys"
+    assert flagged > 0, "Identity flags should become eligibility phrases"
+    print(f"✓ Foreign dump imports ({first['inserted']} new, {first['matched_existing']} matched, re-import adds none)")
+
+
+def test_hot_reload():
+    sys.path.insert(0, str(BASE))
+    import tempfile
+    from catalog import get_catalog
+    import json
+    import threading
+    import load_batches
+    from catalog_reload import ReloadError, check_batch_files, reload_catalog
+    from foreign_catalog import import_dump
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = str(Path(tmp) / "reload.db")
+        src, dst = sqlite3.connect(DB_PATH), sqlite3.connect(copy)
+        src.backup(dst)
+        src.close()
+        dst.close()
+        imported = import_dump(copy, str(BASE / "comprehensive_sources.sql"))["inserted"]
+        before = get_catalog(copy)
+        result = reload_catalog(copy)
+        after = get_catalog(copy)
+        assert after is not before and len(before) == result["checks"]["live_sources"], \
+            "The old snapshot stays intact for requests already using it"
+        assert len(after) == result["checks"]["sources"] == len(before), \
+            "Sources imported from SQL dumps should survive a reload"
+        assert result["ids"] == {"kept_ids": len(before) - imported, "new_ids": 0, "carried": imported}
+        assert {s.source_id: s.source_name for s in after.sources} == \
+            {s.source_id: s.source_name for s in before.sources}, "source_ids should not change across swaps"
+        assert after.stamps == before.stamps, "Unchanged sources keep their updated_at"
+        # Two workers reloading at once: each builds its own staging file, one after the other
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(reload_catalog(copy))) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert [r["ids"]["new_ids"] for r in results] == [0, 0] and len(get_catalog(copy)) == len(after)
+        wal = sqlite3.connect(copy)
+        assert wal.execute("PRAGMA journal_mode").fetchone()[0] == "wal", "Readers should not wait on a swap"
+        wal.close()
+        # A partner feed on a loaded catalog goes through the reload, streamed with progress
+        feed = Path(tmp) / "partner_feed.ndjson"
+        feed.write_text("".join(json.dumps({
+            "name": f"{word} Cooperative Kiln Fund", "source": f"{word} Ceramics Guild", "type": "grant",
+            "eligibility": ["small_business"], "funding_range": "$1,000 - $5,000",
+            "url": f"https://example.org/{word.lower()}-kiln"}) + "\n"
+            for word in ("Amber", "Basalt", "Cobalt", "Dolomite", "Ember")), encoding="utf-8")
+        reports = []
+        saved_every, load_batches.PROGRESS_EVERY = load_batches.PROGRESS_EVERY, 2
+        try:
+            fed = reload_catalog(copy, feeds=[feed], progress=lambda *r: reports.append(r))
+        finally:
+            load_batches.PROGRESS_EVERY = saved_every
+        assert [r[:2] for r in reports if r[0] == feed.name] == [(feed.name, 2), (feed.name, 4), (feed.name, 5)], \
+            "Feeds report progress while they stream"
+        assert fed["ids"]["new_ids"] == 5 and fed["checks"]["sources"] == len(after) + 5
+        # Carried across a plain reload; loading the same feed again replaces it, not doubles it
+        assert reload_catalog(copy)["ids"]["carried"] == imported + 5
+        again = reload_catalog(copy, feeds=[feed])
+        assert again["ids"]["new_ids"] == 0 and again["checks"]["sources"] == len(after) + 5
+        assert {s.source_id for s in get_catalog(copy).sources} == \
+            {s.source_id for s in after.sources} | set(range(max(s.source_id for s in after.sources) + 1,
+                                                               max(s.source_id for s in after.sources) + 6))
+        conn = sqlite3.connect(copy)
+        # Every worker's watcher notices changed batch files; only one reload is queued
+        conn.execute("UPDATE catalog_builds SET fingerprint = 'older'")
+        conn.commit()
+        queued = [check_batch_files(copy) for _ in range(3)]
+        assert queued[0] is not None and queued[1:] == [None, None], f"Expected one queued reload, got {queued}"
+        # Doubling the live catalog makes the staged one look truncated: rejected, nothing swapped
+        conn.execute("""
+            INSERT INTO funding_sources (source_name, source_type, provider_name, active)
+            SELECT source_name || ' (copy)', source_type, provider_name, 1 FROM funding_sources
+        """)
+        conn.commit()
+        live = conn.execute("SELECT count(*) FROM funding_sources").fetchone()[0]
+        try:
+            reload_catalog(copy)
+            raise AssertionError("A much smaller staged catalog should be rejected")
+        except ReloadError:
+            pass
+        assert conn.execute("SELECT count(*) FROM funding_sources").fetchone()[0] == live
+        assert not list(Path(tmp).glob("reload.db.*.next*")), "Staged files should be removed"
+        conn.close()
+    print(f"✓ Hot reload swaps in {len(after)} sources with stable ids ({imported} from a dump kept); "
+          f"partner feeds reload with progress; truncated catalogs are rejected")
+
+
+def test_preload_fork():
+    sys.path.insert(0, str(BASE))
+    import gc
+    import os
+    from catalog import get_catalog
+    from preload import after_fork, memory_report, preload
+    if not hasattr(os, "fork"):
+        print("- Preload fork test skipped (no fork)")
+        return
+    info = preload(DB_PATH)
+    snapshot = get_catalog(DB_PATH)
+    pid = os.fork()
+    if pid == 0:
+        after_fork()
+        # The worker serves the master's snapshot, through its own connection
+        ok = get_catalog(DB_PATH) is snapshot and gc.isenabled()
+        os._exit(0 if ok else 1)
+    report = memory_report(os.getpid())  # [] off Linux
+    _, status = os.waitpid(pid, 0)
+    gc.unfreeze()
+    assert status == 0, "Forked worker should reuse the preloaded snapshot"
+    assert info["sources"] == len(snapshot) and info["frozen"] > 0
+    assert all(r["shared"] >= 0 and r["private"] > 0 for r in report)
+    print(f"✓ Preloaded catalog shared by a forked worker ({info['frozen']:,} objects frozen)")
+
+
+def test_request_profiling():
+    sys.path.insert(0, str(BASE))
+    import pstats
+    import tempfile
+    from datetime import datetime
+    from catalog import get_catalog
+    from engine import FundingMatchEngine
+    from app import form_to_profile
+    from profiling import get_profile, profile_stats, profiled, slowest_profiles
+    profile = form_to_profile({"state": "TN", "amount": "small", "vision": "Community bakery"})
+    engine = FundingMatchEngine(DB_PATH, catalog=get_catalog(DB_PATH))
+    with tempfile.TemporaryDirectory() as tmp:
+        store = str(Path(tmp) / "profiles.db")
+        ranked, pid = profiled(store, "test", "admin", lambda: engine.rank_ids(profile, datetime(2026, 1, 1)))
+        assert ranked == engine.rank_ids(profile, datetime(2026, 1, 1)), "Profiling must not change results"
+        listed = slowest_profiles(store)
+        layers = get_profile(store, pid)["summary"]["layers"]
+        prof = Path(tmp) / "match.prof"
+        prof.write_bytes(profile_stats(store, pid))
+        stats = pstats.Stats(str(prof))
+    assert [p["profile_id"] for p in listed] == [pid]
+    assert any(l["function"].startswith("rank_ids (engine.py") for l in layers), "Engine layers in summary"
+    assert stats.total_calls > 0
+    print(f"✓ Match profile stored and downloadable ({len(layers)} engine layers, {stats.total_calls:,} calls)")
+
+
+def test_loadtest_traffic():
+    sys.path.insert(0, str(BASE))
+    import random
+    from app import AMOUNT_MAP, form_to_profile
+    from loadtest import make_form, percentile
+    rng = random.Random(7)
+    profiles = []
+    for _ in range(300):
+        fields = make_form(rng)
+        form = dict(fields)
+        form["id"] = [v for k, v in fields if k == "id"]
+        profiles.append(form_to_profile(form))
+    assert {p.funding_needed for p in profiles} == {tuple(map(float, v)) for v in AMOUNT_MAP.values()}
+    assert all(len(p.location["state"]) == 2 for p in profiles)
+    assert any(len(p.identity_factors) > 1 for p in profiles) and any(not p.identity_factors for p in profiles)
+    assert percentile([1, 2, 3, 4], 50) == 2 and percentile([1, 2, 3, 4], 100) == 4
+    print(f"✓ Load-test traffic parses into varied profiles ({len({p.location['state'] for p in profiles})} states)")
+
+
+def test_admission():
+    sys.path.insert(0, str(BASE))
+    import threading
+    import time
+    from admission import AdmissionController, Overloaded
+    ctl = AdmissionController(concurrency=1, queue_size=3, reserved=1, timeout=2)
+    first = ctl.acquire("free")
+    order = []
+
+    def wait(lane):
+        try:
+            admitted = ctl.acquire(lane)
+            order.append(lane)
+            ctl.release(admitted)
+        except Overloaded:
+            order.append("rejected " + lane)
+
+    threads = []
+    for lane in ("free", "premium", "b2b"):
+        t = threading.Thread(target=wait, args=(lane,))
+        t.start()
+        threads.append(t)
+        time.sleep(0.05)
+    # Two waiting; the third place is kept for paid lanes, so a free request is turned away at once
+    try:
+        ctl.acquire("free")
+        raise AssertionError("free request admitted past the reserved places")
+    except Overloaded as e:
+        assert e.reason == "queue full" and 1 <= e.retry_after <= 30
+    ctl.release(first)
+    for t in threads:
+        t.join()
+    assert order == ["b2b", "premium", "free"], order
+    stats = ctl.stats()
+    assert stats["running"] == 0 and stats["lanes"]["free"]["rejected_full"] == 1
+    ctl = AdmissionController(concurrency=1, queue_size=1, reserved=0, timeout=0.1)
+    held = ctl.acquire("b2b")
+    try:
+        ctl.acquire("b2b")
+        raise AssertionError("waiter admitted while the slot was held")
+    except Overloaded as e:
+        assert e.reason == "wait timed out"
+    ctl.release(held)
+    import tempfile
+    from admission import issue_key, lane_for
+    with tempfile.TemporaryDirectory() as tmp:
+        db = str(Path(tmp) / "users.db")
+        conn = sqlite3.connect(db)
+        conn.execute("CREATE TABLE users (email TEXT, subscription_tier TEXT, subscription_expires TIMESTAMP)")
+        conn.execute("INSERT INTO users VALUES ('ops@partner.org', 'b2b', NULL)")
+        conn.commit()
+        conn.close()
+        key = issue_key("Ops@Partner.org", "s3cret")
+        assert lane_for(db, key, "s3cret") == "b2b"
+        encoded = key.rpartition(".")[0]
+        for claimed in ("ops@partner.org", encoded, encoded + "." + "0" * 32, key):
+            secret = "other" if claimed == key else "s3cret"
+            assert lane_for(db, claimed, secret) == "free", f"Unsigned claim {claimed!r} got a paid lane"
+    print("✓ Admission control: limit, priority lanes, reserved places, fast 503, signed lane keys")
+
+
+def test_single_flight():
+    sys.path.insert(0, str(BASE))
+    import threading
+    from singleflight import SingleFlight
+    flights = SingleFlight()
+    release = threading.Event()
+    calls, results = [], []
+
+    def slow():
+        calls.append(1)
+        release.wait(2)
+        return len(calls)
+
+    threads = [threading.Thread(target=lambda: results.append(flights.do("k", slow))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    while flights.stats()["shared"] < 7:
+        release.wait(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and all(r == 1 for r, _ in results)
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    # Nothing is cached once the flight lands, and errors reach the caller
+    assert flights.do("k", lambda: 2) == (2, False)
+    try:
+        flights.do("k", lambda: 1 / 0)
+        raise AssertionError("error swallowed")
+    except ZeroDivisionError:
+        pass
+    assert flights.stats() == {"computed": 3, "shared": 7, "in_flight": 0}
+    print("✓ Single-flight: 8 concurrent identical calls, 1 computation")
+
+
+def test_schema_migration():
+    sys.path.insert(0, str(BASE))
+    import tempfile
+    from migrations import ACCESS_PATTERNS, migrate, query_plans
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = str(Path(tmp) / "old.db")
+        src, conn = sqlite3.connect(DB_PATH), sqlite3.connect(copy)
+        src.backup(conn)
+        src.close()
+        # Back to the layout of a database from before migrations.py
+        conn.executescript("""
+            DROP INDEX idx_funding_sources_rank;
+            DROP INDEX idx_funding_sources_amount;
+            ALTER TABLE funding_sources DROP COLUMN amount_lo;
+            ALTER TABLE funding_sources DROP COLUMN amount_hi;
+            ALTER TABLE funding_sources DROP COLUMN states_open;
+            CREATE INDEX idx_funding_sources_active ON funding_sources(active);
+            PRAGMA user_version = 0;
+        """)
+        before = query_plans(conn, repeat=1)
+        assert any("TEMP B-TREE" in step for step in before["catalog refresh (catalog.py)"]["plan"])
+        assert migrate(conn) == [1, 2, 3] and migrate(conn) == []
+        after = query_plans(conn, repeat=1)
+        assert after["catalog refresh (catalog.py)"]["plan"] == [
+            "SEARCH funding_sources USING COVERING INDEX idx_funding_sources_rank (active=?)"]
+        assert "idx_funding_sources_amount" in after["amount overlap 5k-25k"]["plan"][0]
+        assert not any("TEMP B-TREE" in step for p in after.values() for step in p["plan"])
+        assert {n: p["rows"] for n, p in before.items()} == {n: p["rows"] for n, p in after.items()}
+        unknown = conn.execute("""
+            SELECT count(*) FROM funding_sources
+            WHERE (amount_hi = 0) != (coalesce(max_amount, 0) <= 0)
+        """).fetchone()[0]
+        # A version 2 database still has the unused fields_open column
+        conn.executescript("""
+            ALTER TABLE funding_sources ADD COLUMN fields_open INTEGER GENERATED ALWAYS AS (eligible_fields = 'ALL') VIRTUAL;
+            PRAGMA user_version = 2;
+        """)
+        assert migrate(conn) == [3]
+        dropped = "fields_open" not in {r[1] for r in conn.execute("PRAGMA table_xinfo(funding_sources)")}
+        conn.close()
+    assert dropped, "Version 3 drops fields_open"
+    assert unknown == 0
+    print(f"✓ Schema migration: {len(ACCESS_PATTERNS)} access patterns on indexes, no sorts")
 
 
 def test_sample_sources():
@@ -43,6 +425,9 @@ def test_sample_sources():
 
 def test_engine_match():
     sys.path.insert(0, str(BASE))
+    from dataclasses import replace
+    from datetime import datetime
+    from catalog import get_catalog
     from engine import FundingMatchEngine, UserProfile
     engine = FundingMatchEngine(DB_PATH)
     profile = UserProfile(
@@ -60,17 +445,639 @@ def test_engine_match():
     m = matches[0]
     assert m.source.source_name and m.source.provider_name
     assert hasattr(m.source, "application_url") or True
+    # Without a catalog the same amount/state prune runs in SQL: same candidates, same ranking
+    cataloged = FundingMatchEngine(DB_PATH, catalog=get_catalog(DB_PATH))
+    now = datetime(2026, 3, 1, 9, 30)
+    for state, needed in (("TN", (10000, 50000)), ("CA", (2000, 500)), ("", (1e6, 5e6))):
+        p = replace(profile, location={**profile.location, "state": state}, funding_needed=needed)
+        pruned = engine._candidates(p, now)
+        assert [s.source_id for s in pruned] == [s.source_id for s in cataloged._candidates(p, now)]
+        assert [(x.source.source_id, x.overall_score) for x in engine.rank(p, now)] == \
+            [(x.source.source_id, x.overall_score) for x in cataloged.rank(p, now)]
+    assert len(pruned) < len(cataloged.catalog), "The amount range should prune without a catalog too"
+    engine.close()
+    cataloged.close()
     print(f"✓ Engine returns {len(matches)} matches; top: {m.source.source_name[:50]}...")
     print(f"  Score: {m.overall_score:.1f}; URL: {getattr(m.source, 'application_url', 'N/A')}")
 
 
+def test_static_assets():
+    sys.path.insert(0, str(BASE))
+    import tempfile
+    from flask import Flask, request
+    from static_assets import LONG_CACHE, REVALIDATE, StaticAssets, publish_asset
+    web = Flask(__name__)
+    with tempfile.TemporaryDirectory() as tmp:
+        out, src = Path(tmp) / "static", Path(tmp) / "app.js"
+        src.write_text("console.log('first');\n" * 200)
+        first = publish_asset(src, out)
+        assets = StaticAssets(out)
+        with web.test_request_context(headers={"Accept-Encoding": "gzip"}):
+            resp = assets.response("app.js", request)
+            etag = resp.headers["ETag"]
+            assert resp.status_code == 200 and resp.headers["Content-Encoding"] == "gzip"
+            assert resp.headers["Cache-Control"] == REVALIDATE and etag == f'"{first["etag"]}-gzip"'
+        with web.test_request_context(headers={"Accept-Encoding": "gzip", "If-None-Match": etag}):
+            assert assets.response("app.js", request).status_code == 304, "Matching ETag should give 304"
+        with web.test_request_context(headers={"If-None-Match": etag}):
+            # Identity has its own ETag, so the gzip one does not match it
+            resp = assets.response("app.js", request)
+            assert resp.status_code == 200 and "Content-Encoding" not in resp.headers
+        src.write_text("console.log('second');\n" * 200)
+        second = publish_asset(src, out)
+        assets.reload()
+        name, old = assets.for_fingerprint(first["fingerprinted"])
+        with web.test_request_context():
+            resp = assets.response(name, request, immutable=True, entry=old)
+            assert resp.status_code == 200 and b"first" in resp.get_data(), \
+                "The previous build's fingerprinted URL should still serve its own bytes"
+            assert resp.headers["Cache-Control"] == LONG_CACHE
+            assert b"second" in assets.response("app.js", request).get_data()
+        src.write_text("console.log('third');\n" * 200)
+        publish_asset(src, out)
+        assets.reload()
+        assert assets.for_fingerprint(first["fingerprinted"]) is None, "Two builds back is dropped"
+        assert assets.for_fingerprint(second["fingerprinted"]) is not None
+        assert not (out / first["fingerprinted"]).exists(), "Dropped generations' files are deleted"
+    print("✓ Static assets: ETag/304 per encoding, previous build's fingerprinted URLs still served")
+
+
+def test_catalog_index():
+    sys.path.insert(0, str(BASE))
+    import json
+    import struct
+    import tempfile
+    from flask import Flask, request
+    import static_assets
+    from catalog import get_catalog
+    from export_catalog import INDEX_NAME, export
+    from static_assets import StaticAssets, publish_asset
+    catalog = get_catalog(DB_PATH)
+    web = Flask(__name__)
+    interval, static_assets.MANIFEST_CHECK_INTERVAL = static_assets.MANIFEST_CHECK_INTERVAL, 0
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp) / "static"
+            worker = StaticAssets(out)  # another worker: never told about the exports below
+            assert worker.manifest().get(INDEX_NAME) is None
+            entry = export(DB_PATH, out)
+            data = (out / entry["encodings"]["identity"]).read_bytes()
+            version, head_len = struct.unpack_from("<II", data, 4)
+            header = json.loads(data[12:12 + head_len])
+            assert data[:4] == b"FFCI" and version == header["format"]
+            assert header["catalog_version"] == entry["catalog_version"] == catalog.version
+            assert header["count"] == len(catalog)
+            assert worker.manifest()[INDEX_NAME]["catalog_version"] == catalog.version, \
+                "Other workers pick up a published index from the manifest's mtime"
+            url = worker.url_for(INDEX_NAME)
+            with web.test_request_context(headers={"Accept-Encoding": "gzip"}):
+                name, gen = worker.for_fingerprint(url.rsplit("/", 1)[1])
+                etag = worker.response(name, request, immutable=True, entry=gen).headers["ETag"]
+            with web.test_request_context(headers={"Accept-Encoding": "gzip", "If-None-Match": etag}):
+                assert worker.response(name, request, immutable=True, entry=gen).status_code == 304
+            src = out.parent / INDEX_NAME
+            for n in (2, 3):
+                src.write_bytes(data + bytes(8 * n))  # stand-ins for later catalog versions
+                publish_asset(src, out, catalog_version=f"v{n}")
+                worker.manifest()
+            assert worker.manifest()[INDEX_NAME]["catalog_version"] == "v3"
+            assert not any(f.startswith(entry["fingerprinted"]) for f, _ in worker._bytes), \
+                "Cached bytes of dropped generations are evicted"
+    finally:
+        static_assets.MANIFEST_CHECK_INTERVAL = interval
+    print(f"✓ Catalog index exports {header['count']} sources; other workers see new versions via the manifest")
+
+
+def test_catalog_matcher_parity():
+    sys.path.insert(0, str(BASE))
+    import json
+    import shutil
+    import subprocess
+    import tempfile
+    from datetime import datetime
+    from app import form_to_profile
+    from catalog import get_catalog
+    from engine import FundingMatchEngine
+    from export_catalog import build_index
+    node = shutil.which("node")
+    if node is None:
+        print("- catalog_matcher.js parity skipped (node not installed)")
+        return
+    forms = [
+        {"state": "WV", "amount": "small", "id": ["veteran"], "stage": "concept",
+         "story": "Veteran opening a rural farm stand and bakery"},
+        {"state": "CA", "amount": "large", "id": ["woman", "minority"], "stage": "growing",
+         "vision": "Expand my tech startup building software for community health clinics"},
+        {"state": "TX", "amount": "medium", "zip": "79830", "story": "Film and music festival for artists"},
+        {"state": "NY", "amount": "medium"},
+    ]
+    now = datetime(2026, 3, 1, 9, 30)
+    catalog = get_catalog(DB_PATH)
+    engine = FundingMatchEngine(DB_PATH, catalog=catalog)
+    script = """
+const fs = require('fs');
+const M = require(process.argv[1]);
+const buf = fs.readFileSync(process.argv[2]);
+const ix = M.decode(buf.buffer.slice(buf.byteOffset, buf.byteOffset + buf.length));
+const out = JSON.parse(fs.readFileSync(0, 'utf8')).map(({ form, rural }) => {
+  const fd = new FormData();
+  for (const [k, v] of Object.entries(form)) [].concat(v).forEach((x) => fd.append(k, x));
+  return M.match(ix, fd, { now: new Date('2026-03-01T09:30:00'), rural, limit: ix.count })
+    .map((m) => [m.source.source_id, m.overall_score]);
+});
+process.stdout.write(JSON.stringify(out));
+"""
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            index = Path(tmp) / "catalog_index.bin"
+            index.write_bytes(build_index(DB_PATH, catalog))
+            cases = [{"form": f, "rural": form_to_profile(f).hidden_eligibility_factors["rural_status"]}
+                     for f in forms]
+            run = subprocess.run([node, "-e", script, str(BASE / "catalog_matcher.js"), str(index)],
+                                 input=json.dumps(cases), capture_output=True, text=True, check=True)
+        for form, js in zip(forms, json.loads(run.stdout)):
+            py = {m.source.source_id: m.overall_score for m in engine.rank(form_to_profile(form), now)}
+            js = dict(js)
+            assert js.keys() == py.keys(), f"Browser and server match different sources for {form}"
+            worst = max((abs(js[sid] - py[sid]) for sid in py), default=0)
+            assert worst <= 0.051, f"Browser scores differ from engine.py by {worst} for {form}"
+    finally:
+        engine.close()
+    print(f"✓ catalog_matcher.js matches engine.py on {len(forms)} fixture profiles")
+
+
+def test_match_cursors():
+    sys.path.insert(0, str(BASE))
+    import json
+    import tempfile
+    from datetime import datetime
+    import app
+    from catalog import get_catalog
+    from engine import FundingMatchEngine
+    from cursors import CursorStore, decode_cursor
+    from serialize import Projection
+    catalog = get_catalog(DB_PATH)
+    engine = FundingMatchEngine(DB_PATH, catalog=catalog)
+    profile = app.form_to_profile({"state": "CA", "amount": "micro", "id": ["woman"]})
+    saved = app._cursors
+    with tempfile.TemporaryDirectory() as tmp:
+        runs_db = str(Path(tmp) / "runs.db")
+        # Two stores on one database stand in for two gunicorn workers
+        app._cursors, other = CursorStore(runs_db), CursorStore(runs_db)
+        try:
+            run, token, _ = app._rank_run(engine, profile, 10)
+        finally:
+            app._cursors = saved
+        full = [sid for sid, _ in engine.rank_ids(profile, run.now)]
+        assert run.total == len(full) > 10 and run.source_ids == full, "A run stores the full ranked order"
+        stored = other.get(token)
+        assert stored is not None and (stored.profile, stored.now, stored.source_ids) == (profile, run.now, full), \
+            "A run stored by one worker should page on another"
+        # Deep pages slice the stored order: the engine never ranks again
+        calls = []
+        engine.top_ids = engine.rank_ids = lambda *a, **kw: calls.append(a) or []
+        pages, cursor = [], app.encode_cursor(token, 10)
+        while cursor:
+            token, offset = decode_cursor(cursor)
+            body = json.loads("".join(app._match_page(engine, stored, token, offset, 25, Projection.parse(None)).response))
+            pages += [m["source"]["source_id"] for m in body["matches"]]
+            cursor = body["next_cursor"]
+        assert not calls and pages == full[10:], "Later pages should cost a lookup, not a ranking"
+        page = [(m.source.source_id, m.overall_score) for m in engine.rescore(profile, full[10:20], run.now)]
+        assert page == [(m.source.source_id, m.overall_score) for m in engine.rescore(stored.profile, full[10:20], stored.now)]
+        assert CursorStore(runs_db, ttl=-1).get(token) is None, "Expired runs are not served"
+        assert other.get("no-such-token") is None
+        assert other._ready, "A store creates its table on first use, not on every connection"
+    assert engine._db is None, "With a catalog the engine never opens a connection"
+    print(f"✓ Match cursors page across workers ({len(full)} ranked ids stored in SQLite, deep pages are lookups)")
+
+
+def test_reason_codes():
+    sys.path.insert(0, str(BASE))
+    import json
+    from catalog import get_catalog
+    from engine import FundingMatchEngine
+    from app import form_to_profile
+    from reasons import decode, encode, explain
+    from serialize import Projection, match_fragment
+    catalog = get_catalog(DB_PATH)
+    engine = FundingMatchEngine(DB_PATH, catalog=catalog)
+    matches = engine.match(form_to_profile({"state": "TN", "amount": "small", "story": "x" * 80}), 50)
+    codes = [r for m in matches for r in m.match_reasons + m.eligibility_gaps + m.competitive_advantages]
+    assert codes and all(isinstance(r, tuple) and isinstance(r[0], str) for r in codes)
+    m = next(m for m in matches if any(r[0] == "amount_fits" for r in m.match_reasons))
+    text = explain(m.match_reasons, m.source.source_name)
+    assert f"({m.source.min_amount:,.0f} - {m.source.max_amount:,.0f})" in " ".join(text)
+    assert explain(m.match_reasons, m.source.source_name, "es") != text
+    assert decode(json.loads(json.dumps(encode(m.match_reasons)))) == m.match_reasons
+    assert explain(decode(["Stored before reason codes"])) == ["Stored before reason codes"]
+    body = json.loads(match_fragment(m, catalog, Projection.parse("match_reasons")))
+    assert body["match_reasons"] == text
+    print(f"✓ Reason codes: {len(set(r[0] for r in codes))} codes, rendered at serialization (en/es)")
+
+
+def test_match_serialization():
+    sys.path.insert(0, str(BASE))
+    import json
+    from catalog import get_catalog
+    from engine import FundingMatchEngine
+    from app import form_to_profile
+    from serialize import (MATCH_FIELDS, MAX_CACHED_PROJECTIONS, SOURCE_FIELDS, Projection,
+                           iter_match_response, source_to_json)
+    catalog = get_catalog(DB_PATH)
+    matches = FundingMatchEngine(DB_PATH, catalog=catalog).match(form_to_profile({"state": "OH"}), 20)
+    full = json.loads("".join(iter_match_response(matches, catalog, Projection.parse(None), count=len(matches))))
+    assert full["ok"] and full["count"] == len(full["matches"]) == len(matches)
+    first = full["matches"][0]
+    assert tuple(first) == ("source",) + MATCH_FIELDS and tuple(first["source"]) == SOURCE_FIELDS
+    assert first["source"] == source_to_json(matches[0].source)
+    assert first["overall_score"] == round(matches[0].overall_score, 1)
+    a = Projection.parse("source.source_name,overall_score,source.source_id,source.source_name")
+    b = Projection.parse("overall_score,source.source_id,source.source_name")
+    assert (a.match_fields, a.source_fields) == (b.match_fields, b.source_fields) == \
+        (("overall_score",), ("source_id", "source_name")), "Order and repeats should not matter"
+    compact = Projection.parse("source", compact=True)
+    assert "requirements_text" not in compact.source_fields and not compact.match_fields
+    body = json.loads("".join(iter_match_response(matches, catalog, compact)))
+    assert "requirements_text" not in body["matches"][0]["source"] and "overall_score" not in body["matches"][0]
+    try:
+        Projection.parse("overall_score,source.password")
+        raise AssertionError("Unknown fields should be rejected")
+    except ValueError:
+        pass
+    for f in SOURCE_FIELDS:
+        "".join(iter_match_response(matches, catalog, Projection.parse(f"source.{f},source.source_id")))
+    assert len(catalog.fragments) == MAX_CACHED_PROJECTIONS, "Fragment caches per snapshot are capped"
+    print(f"✓ Match JSON: streamed, projected (canonical field order), compact; {len(catalog.fragments)} cached projections")
+
+
+def test_amount_index():
+    sys.path.insert(0, str(BASE))
+    from catalog import get_catalog
+    catalog = get_catalog(DB_PATH)
+    for lo, hi in [(0, 5_000), (5_000, 25_000), (25_000, 100_000), (100_000, 1_000_000), (2e6, 2e6)]:
+        expected = {
+            s.source_id for s in catalog.sources
+            if (s.max_amount or 0) > 0 and s.min_amount <= hi and s.max_amount >= lo
+        }
+        got = catalog.amount_index.overlapping(lo, hi, include_unknown=False)
+        assert got == expected, f"Amount index mismatch for {lo}-{hi}"
+    print("✓ Amount interval index agrees with a linear scan")
+
+
+def test_geo_index():
+    sys.path.insert(0, str(BASE))
+    from catalog import get_catalog
+    catalog = get_catalog(DB_PATH)
+    for state in ("TN", "CA", "WV"):
+        expected = {
+            s.source_id for s in catalog.sources
+            if "ALL" in s.eligible_states or state in s.eligible_states
+        }
+        assert catalog.geo_index.eligible_ids(state) == expected, f"Geo index mismatch for {state}"
+    import logging
+    import geo
+    from geo import REGIONS, record_geography
+    assert record_geography({"eligibility": {"regions": "Bay Area"}}) == ["state:CA", "region:BAY_AREA"]
+    both = record_geography({"eligibility": {"regions": ["Appalachian", "Delta Regional Authority"]}})
+    assert {k for k in both if k.startswith("state:")} == {f"state:{c}" for c in REGIONS["ARC"] + REGIONS["DRA"]}
+    warnings = []
+    handler = logging.Handler()
+    handler.emit = warnings.append
+    geo.log.addHandler(handler)
+    try:
+        keys = record_geography({"name": "Shire Fund", "eligibility": {"regions": "The Shire", "states": "TN"}})
+        assert keys == ["state:TN"], "An unknown region adds no key nothing can match"
+        assert record_geography({"eligibility": {"regions": "The Shire"}}) == ["ALL"]
+    finally:
+        geo.log.removeHandler(handler)
+    assert len(warnings) == 2 and "The Shire" in warnings[0].getMessage(), "Unknown regions are logged"
+    print("✓ Geographic index agrees with eligible_states; regions resolve to member states")
+
+
+def test_deadline_sweep():
+    sys.path.insert(0, str(BASE))
+    import tempfile
+    from datetime import datetime
+    from catalog import get_catalog
+    from deadlines import list_upcoming, run_sweep, schedule_sweep
+    from jobs import drain
+    now = datetime(2026, 6, 1, 14, 30)
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = str(Path(tmp) / "sweep.db")
+        src, dst = sqlite3.connect(DB_PATH), sqlite3.connect(copy)
+        src.backup(dst)
+        src.close()
+        dst.close()
+        before = get_catalog(copy)
+        ids = [s.source_id for s in before.sources[:7]]
+        # Two past one-time deadlines, one past rolling, three future ones (out of order), one due today
+        dated = [("2026-05-01", "one-time"), ("2026-01-15", "one-time"), ("2026-05-20", "rolling"),
+                 ("2026-09-01", "one-time"), ("2026-06-15", "one-time"), ("2026-07-04", "annual"),
+                 ("2026-06-01", "one-time")]
+        conn = sqlite3.connect(copy)
+        conn.executemany("""
+            UPDATE funding_sources SET application_deadline = ?, deadline_type = ?, updated_at = '2026-06-01 00:00:01'
+            WHERE source_id = ?
+        """, [(d, t, sid) for (d, t), sid in zip(dated, ids)])
+        conn.commit()
+        catalog = get_catalog(copy)
+        assert catalog.deadline_index == sorted(catalog.deadline_index) and len(catalog.deadline_index) == 7
+        assert catalog.expired_ids(now) == set(ids[:2]), "Only past one-time deadlines are expired, not today's"
+        assert [s.source_id for s in catalog.upcoming(now)] == [ids[4], ids[5], ids[3]]
+        assert catalog.geo_keys == before.geo_keys, "Unchanged sources keep their geography"
+        result = run_sweep(copy, now)
+        assert result == {"deactivated": 2, "upcoming": 4}, f"Unexpected sweep result {result}"
+        swept = get_catalog(copy)
+        assert not set(ids[:2]) & set(swept.by_id) and len(swept) == len(before) - 2
+        assert ids[6] in swept.by_id, "A deadline of today is still open"
+        assert not swept.expired_ids(now)
+        upcoming = list_upcoming(copy, now=now)
+        assert [r["source_id"] for r in upcoming] == [ids[6], ids[4], ids[5], ids[3]]
+        assert upcoming[0]["days_remaining"] == 0
+        active = conn.execute("SELECT count(*) FROM funding_sources WHERE source_id IN (?, ?) AND active = 1",
+                              ids[:2]).fetchone()[0]
+        conn.close()
+        # Every worker schedules; one job per interval gets queued, and the job worker runs it
+        tomorrow = datetime(2026, 6, 2, 9).timestamp()
+        queued = [schedule_sweep(copy, 3600, now=tomorrow + n) for n in (0, 5, 60)]
+        assert queued[0] is not None and queued[1:] == [None, None], "One sweep job per interval"
+        assert schedule_sweep(copy, 3600, now=tomorrow + 3600) is not None, "The next interval queues again"
+        assert drain(copy) == 2
+        assert ids[6] not in get_catalog(copy).by_id, "Once its deadline day is over the source is swept"
+    assert active == 0
+    print("✓ Deadline sweep deactivates expired one-time sources (open through the deadline day), once per interval")
+
+
+def test_segment_scores():
+    sys.path.insert(0, str(BASE))
+    from datetime import datetime
+    from catalog import get_catalog
+    from engine import FundingMatchEngine
+    from app import form_to_profile
+    engine = FundingMatchEngine(DB_PATH, catalog=get_catalog(DB_PATH))
+    now = datetime.now()
+    forms = [
+        {"state": "TN", "amount": "small", "id": ["woman"], "vision": "community bakery"},
+        {"state": "TN", "amount": "small", "id": ["woman"], "vision": "tech startup for rural farms"},
+        {"state": "CA", "amount": "large", "stage": "growing", "cap": "Very limited time"},
+    ]
+    for form in forms:
+        profile = form_to_profile(form)
+        expected = [(m.source.source_id, m.overall_score) for m in engine.rank(profile, now)]
+        assert engine.rank_ids(profile, now) == expected, f"Segment ranking differs for {form}"
+    print("✓ Cached segment components rank exactly like the full engine")
+
+
+def test_top_k_pruning():
+    sys.path.insert(0, str(BASE))
+    from datetime import datetime
+    from catalog import get_catalog
+    from engine import FundingMatchEngine
+    from app import form_to_profile
+    engine = FundingMatchEngine(DB_PATH, catalog=get_catalog(DB_PATH))
+    now = datetime.now()
+    pruned = candidates = 0
+    for form in [
+        {"state": "TN", "amount": "small", "id": ["woman"], "vision": "community bakery"},
+        {"state": "CA", "amount": "large", "stage": "growing", "vision": "research on drought-resistant crops"},
+        {"state": "NY", "amount": "medium", "id": ["veteran", "minority"], "vision": "documentary film"},
+    ]:
+        profile = form_to_profile(form)
+        ranked = engine.rank_ids(profile, now)
+        for k in (1, 50, 200):
+            stats = {}
+            assert engine.top_ids(profile, k, now, stats) == ranked[:k], f"Top {k} differs for {form}"
+            assert stats["total"] == len(ranked) and stats["scored"] + stats["pruned"] == stats["candidates"]
+        pruned += stats["pruned"]
+        candidates += stats["candidates"]
+    assert pruned > 0, "Upper bounds should prune some candidates"
+    print(f"✓ Bounded top-k matches the full ranking ({pruned / candidates:.0%} of candidates pruned at k=200)")
+
+
+def test_zip_rurality():
+    sys.path.insert(0, str(BASE))
+    import tempfile
+    import rurality
+    from app import app as flask_app, form_to_profile
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path, table_path = str(Path(tmp) / "ruca.csv"), str(Path(tmp) / "zip_rurality.bin")
+        Path(csv_path).write_text("ZIP_CODE,STATE,RUCA1,COUNTY\n"
+                                  "37201,TN,1,47037\n37601,TN,4.2,47179\n2134,MA,1,25025\n"
+                                  "59601,MT,1,30049\n82190,WY,10,56029\n99999,AK,99,\n")
+        assert rurality.build(csv_path, table_path) == 6
+        try:
+            rurality.reload(table_path)
+            assert rurality.lookup("37601-1234") == (4, "47179") and rurality.is_rural("02134") is False
+            assert rurality.lookup("12345") is None and rurality.lookup("abc") is None
+            rural = {z: form_to_profile({"state": st, "zip": z}).hidden_eligibility_factors["rural_status"]
+                     for z, st in (("37201", "TN"), ("37601", "TN"), ("59601", "MT"), ("82190", "WY"),
+                                   ("99999", "AK"), ("12345", "NY"), ("", "WV"))}
+            # Table first (Helena is metro though MT is on the state list); unknown ZIPs fall back to the state
+            assert rural == {"37201": False, "37601": True, "59601": False, "82190": True,
+                             "99999": True, "12345": False, "": True}, rural
+            assert "county" not in form_to_profile({"zip": "37601"}).location
+            # The browser matcher takes the same flag from /api/zip/<zip>
+            client = flask_app.test_client()
+            assert [client.get(f"/api/zip/{z}").get_json()["rural"] for z in ("37601", "37201", "12345")] \
+                == [True, False, None]
+        finally:
+            rurality.reload(rurality.DEFAULT_PATH)
+    print("✓ ZIP rurality: RUCA table lookups by binary search, state list only for unknown ZIPs,"
+          " same flag for the browser matcher")
+
+
+def test_intake_session():
+    sys.path.insert(0, str(BASE))
+    from datetime import datetime
+    from catalog import get_catalog
+    from engine import FundingMatchEngine
+    from app import form_to_profile
+    import tempfile
+    from intake import IntakeSession, SessionStore
+    from segments import Segment, cache_for
+    engine = FundingMatchEngine(DB_PATH, catalog=get_catalog(DB_PATH))
+    cache = cache_for(engine)
+    now = datetime.now()
+    session, answers, sizes = IntakeSession(answers={}), {}, []
+    for step in ({"state": "VT", "city": "Burlington"}, {"vision": "maple syrup farm", "amount": "large"},
+                 {"id": ["veteran"], "story": "Intake session test"}):
+        answers.update(step)
+        session.update(engine, form_to_profile(answers), step)
+        sizes.append(session.candidates(engine))
+    assert sizes == sorted(sizes, reverse=True) and sizes[-1] < len(engine.catalog), sizes
+    profile = form_to_profile(answers)
+    assert Segment(engine, profile, now, session.survivors).ids == Segment(engine, profile, now).ids
+    assert session.prewarm(engine, profile, now) and not session.prewarm(engine, profile, now)
+    hits, misses = cache.hits, cache.misses
+    full = engine.top_ids(profile, 50, now)
+    assert engine.top_ids(profile, 50, now, among=session.survivors) == full
+    assert (cache.hits - hits, cache.misses - misses) == (2, 0), "Submit should use the prewarmed segment"
+    # Changing an answer that narrowed the set starts over
+    session.update(engine, form_to_profile({**answers, "state": "TX"}), {"state": "TX"})
+    assert list(session.applied) == ["state", "amount", "id"] and session.applied["state"] == "TX"
+    # Steps may reach different workers: two stores on one database stand in for them
+    with tempfile.TemporaryDirectory() as tmp:
+        sessions_db = str(Path(tmp) / "sessions.db")
+        first, other = SessionStore(sessions_db), SessionStore(sessions_db)
+        token, answers = first.create(), {}
+        for store, step in ((first, {"state": "VT", "city": "Burlington"}),
+                            (other, {"vision": "maple syrup farm", "amount": "large"}),
+                            (first, {"id": ["veteran"], "story": "Intake session test"})):
+            answers.update(step)
+            stored = store.get(token)
+            assert stored is not None, "A session opened on one worker should step on another"
+            stored.update(engine, form_to_profile({**stored.answers, **step}), step)
+            store.save(token, stored)
+        assert stored.answers == answers and stored.candidates(engine) == sizes[-1]
+        moved = other.pop(token)
+        assert moved.survivors == stored.survivors and moved.applied == stored.applied
+        applied = dict(moved.applied)
+        moved.update(engine, form_to_profile(answers), {})
+        assert moved.applied == applied and moved.survivors == stored.survivors, "Reloaded answers do not restart"
+        assert first.get(token) is None, "A submitted session is gone from every worker"
+        assert SessionStore(sessions_db, ttl=-1).get(first.create()) is None, "Expired sessions are not served"
+    print(f"✓ Intake session: candidates narrowed {len(engine.catalog)} -> {' -> '.join(map(str, sizes))},"
+          f" submit ranks from the prewarmed segment")
+
+
+def test_saved_profiles():
+    sys.path.insert(0, str(BASE))
+    import tempfile
+    from datetime import datetime
+    from catalog import get_catalog
+    from engine import FundingMatchEngine
+    from app import form_to_profile
+    from saved_profiles import pending_alerts, profile_matches, rematch_saved, save_profile
+    now = datetime(2026, 1, 1)
+    forms = [
+        {"state": "TN", "amount": "small", "id": ["woman"], "vision": "community bakery"},
+        {"state": "CA", "amount": "large", "stage": "growing", "vision": "research on drought-resistant crops"},
+        {"state": "NY", "amount": "medium", "id": ["veteran"], "vision": "documentary film"},
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = str(Path(tmp) / "saved.db")
+        src, conn = sqlite3.connect(DB_PATH), sqlite3.connect(copy)
+        src.backup(conn)
+        src.close()
+        ids = [save_profile(copy, f"user{i}@example.com", form_to_profile(f), top_k=20) for i, f in enumerate(forms)]
+        first = rematch_saved(copy, now)
+        assert first["ranked"] == 3 and rematch_saved(copy, now)["profiles"] == 0, "Nothing changed: no work"
+
+        def check(label):
+            engine = FundingMatchEngine(copy, catalog=get_catalog(copy))
+            for pid, form in zip(ids, forms):
+                stored = sorted(round(m["overall_score"], 1) for m in profile_matches(copy, pid))
+                full = sorted(round(score, 1) for _, score in engine.top_ids(form_to_profile(form), 20, now))
+                assert stored == full, f"{label}: profile {pid} differs from a full ranking"
+
+        # A new source (copy of profile 1's best match) and a changed one: merged without re-ranking
+        cols = [r[1] for r in conn.execute("PRAGMA table_info(funding_sources)") if r[1] != "source_id"]
+        best = profile_matches(copy, ids[0])[0]["source_id"]
+        new_id = conn.execute(f"INSERT INTO funding_sources ({','.join(cols)}) SELECT {','.join(cols)}"
+                              f" FROM funding_sources WHERE source_id = ?", (best,)).lastrowid
+        conn.execute("UPDATE funding_sources SET requirements_text = requirements_text || ' bakery film',"
+                     " updated_at = '2030-01-01' WHERE source_id = ?",
+                     (profile_matches(copy, ids[2])[-1]["source_id"],))
+        conn.commit()
+        stats = rematch_saved(copy, now)
+        assert stats["delta"] == 2 and stats["scored"] == 3 * 2 and stats["refilled"] == 0, stats
+        check("merge")
+        assert new_id in {a["source_id"] for a in pending_alerts(copy)["user0@example.com"]}
+        # A stored match leaves the catalog: that profile is ranked again
+        conn.execute("UPDATE funding_sources SET active = 0, updated_at = '2030-01-02' WHERE source_id = ?", (best,))
+        conn.commit()
+        stats = rematch_saved(copy, now)
+        assert stats["removed"] == 1 and stats["refilled"] >= 1, stats
+        check("refill")
+        conn.close()
+    print(f"✓ Saved profiles: re-match scored only the changed sources ({first['ranked']} profiles), same as a full ranking")
+
+
+def test_report_render():
+    sys.path.insert(0, str(BASE))
+    import tempfile
+    from datetime import datetime
+    from reports import ensure_report_schema, render_report, iter_report_html, find_report
+    from app import form_to_profile
+    profile = form_to_profile({"state": "TN", "amount": "small", "vision": "Community bakery"})
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = str(Path(tmp) / "reports.db")
+        src, dst = sqlite3.connect(DB_PATH), sqlite3.connect(copy)
+        src.backup(dst)
+        src.close()
+        ensure_report_schema(dst)
+        ids = [dst.execute("INSERT INTO funding_reports (user_id, profile_id) VALUES (1, 1)").lastrowid
+               for _ in range(2)]
+        dst.commit()
+        dst.close()
+        now = datetime(2026, 1, 1)
+        hashes = [render_report(copy, rid, profile, now) for rid in ids]
+        assert hashes[0] and hashes[0] == hashes[1], "Same run should render byte-identical reports"
+        found = find_report(copy, hashes[0])
+        html = b"".join(iter_report_html(copy, found["report_id"]))
+        assert len(html) == found["content_length"] and b"Your Funding Report" in html
+    print(f"✓ Report renders and streams back ({len(html):,} B, hash {hashes[0][:8]})")
+
+
+def test_job_queue():
+    sys.path.insert(0, str(BASE))
+    import tempfile
+    from datetime import datetime, timedelta
+    from jobs import _connect, enqueue, claim, fail, job_status
+    with tempfile.TemporaryDirectory() as tmp:
+        db = str(Path(tmp) / "jobs.db")
+        low = enqueue(db, "x", priority=-10)
+        high = enqueue(db, "x", priority=10, max_attempts=2, visibility_timeout=60)
+        conn = _connect(db)
+        now = datetime.now()
+        job = claim(conn, "w1", now)
+        assert job["job_id"] == high, "Higher priority job should be claimed first"
+        assert claim(conn, "w2", now)["job_id"] == low
+        assert claim(conn, "w2", now) is None, "Running jobs are invisible until their claim expires"
+        job = claim(conn, "w2", now + timedelta(seconds=61))
+        assert job["job_id"] == high and job["attempts"] == 2, "Expired claim should be retaken"
+        fail(conn, job, "w1", "stale worker")
+        assert job_status(db, high)["status"] == "running", "Only the current owner may finish a job"
+        fail(conn, job, "w2", "boom")
+        assert job_status(db, high)["status"] == "failed", "Out of attempts should mark the job failed"
+        conn.close()
+    print("✓ Job queue: priority, visibility timeout, retries")
+
+
 def main():
     print("Funding Finder – database & search test\n")
     try:
         test_db_exists()
         test_source_count()
+        test_dedupe()
+        test_stream_reader()
+        test_foreign_import()
+        test_hot_reload()
+        test_preload_fork()
+        test_request_profiling()
+        test_loadtest_traffic()
+        test_admission()
+        test_single_flight()
+        test_schema_migration()
         test_sample_sources()
         test_engine_match()
+        test_static_assets()
+        test_catalog_index()
+        test_catalog_matcher_parity()
+        test_match_cursors()
+        test_reason_codes()
+        test_match_serialization()
+        test_amount_index()
+        test_geo_index()
+        test_deadline_sweep()
+        test_segment_scores()
+        test_top_k_pruning()
+        test_zip_rurality()
+        test_intake_session()
+        test_saved_profiles()
+        test_report_render()
+        test_job_queue()
         print("\n✓ All tests passed. Complete database ready for rigorous testing.")
     except Exception as e:
         print(f"\n✗ Test failed: {e}")